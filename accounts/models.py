@@ -95,6 +95,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     objects = CustomUserManager()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=["role"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
+    
     def __str__(self) -> str:
         """
         Return the user's name as a string representation.
@@ -5,7 +5,8 @@ from django.db.models import Q
 from graphene import relay
 import graphene
 from graphql import GraphQLError
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import get_integer_id, CountedConnection, CountedConnectionField
+from utils.planner import optimize_queryset
 from accounts.models import User
 
 
@@ -42,22 +43,22 @@ class UserType(DjangoObjectType):
 
 class Query(graphene.ObjectType):
     user = graphene.Field(UserType, id=graphene.String(required=True))
-    users = DjangoFilterConnectionField(UserType)
+    users = CountedConnectionField(UserType)
     
     def resolve_users(self, info, **kwargs):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin"]:
             raise GraphQLError("You don't have permission to read User.", extensions={'code': 403})
         if user.is_superuser:
-            return User.objects.all()
-        return User.objects.all()
+            return optimize_queryset(User.objects.all(), info)
+        return optimize_queryset(User.objects.all(), info)
     
     def resolve_user(self, info, id):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin"]:
             raise GraphQLError("You don't have permission to read User.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
-        return User.objects.get(id=numeric_id)
+        return optimize_queryset(User.objects.all(), info).get(id=numeric_id)
     
 
 class CreateUser(graphene.Mutation):
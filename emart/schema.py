@@ -5,14 +5,20 @@ import accounts.schemas.user
 import products.schemas.categories
 import products.schemas.departments
 import products.schemas.locations
+import products.schemas.margins
 import products.schemas.price_list_details
 import products.schemas.price_list
+import products.schemas.price_list_diff
+import products.schemas.price_simulation
+import products.schemas.effective_prices
+import products.schemas.price_sync
 import products.schemas.products
 import products.schemas.store
 import products.schemas.unit_of_measure
 import products.schemas.vendors
 import products.schemas.countries
 import products.schemas.states
+import jobs.schemas.jobs
 
 
 
@@ -20,14 +26,20 @@ class Query(accounts.schemas.user.Query,
             products.schemas.categories.Query,
             products.schemas.departments.Query,
             products.schemas.locations.Query,
+            products.schemas.margins.Query,
             products.schemas.price_list.Query,
+            products.schemas.price_list_diff.Query,
+            products.schemas.price_simulation.Query,
             products.schemas.price_list_details.Query,
+            products.schemas.effective_prices.Query,
+            products.schemas.price_sync.Query,
             products.schemas.products.Query,
             products.schemas.store.Query,
             products.schemas.unit_of_measure.Query,
             products.schemas.vendors.Query,
             products.schemas.countries.Query,
             products.schemas.states.Query,
+            jobs.schemas.jobs.Query,
             graphene.ObjectType,):
     pass
 
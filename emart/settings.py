@@ -47,6 +47,8 @@ INSTALLED_APPS = [
     'rest_framework',
     'accounts',
     'products',
+    'jobs',
+    'outbox',
 ]
 
 
@@ -105,9 +107,66 @@ WSGI_APPLICATION = 'emart.wsgi.application'
 GRAPHENE = {
     'SCHEMA': 'emart.schema.schema',
     'MIDDLEWARE': [
+        'utils.loaders.LoaderMiddleware',
     ],
+    # Each mutation and the outbox events of its writes commit together.
+    'ATOMIC_MUTATIONS': True,
 }
 
+# Number of parsed and validated GraphQL documents kept by SentryGraphQLView.
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+
+# Automatic persisted queries: in-memory entries per process, the directory
+# shared by all processes, the queries it keeps and the longest query persisted.
+GRAPHQL_PERSISTED_QUERIES_CACHE_SIZE = 1024
+GRAPHQL_PERSISTED_QUERIES_DIR = BASE_DIR / 'persisted_queries'
+GRAPHQL_PERSISTED_QUERIES_MAX_FILES = 10000
+GRAPHQL_PERSISTED_QUERY_MAX_LENGTH = 20000
+
+# Seconds a connection's totalCount is cached per filter signature, 0 disables the cache.
+GRAPHQL_COUNT_CACHE_TTL = 60
+
+# Seconds a user's cached store access index lives. Changes to store and
+# location managers invalidate it right away through the configured cache,
+# which must be shared between processes (e.g. redis) for that to reach all workers.
+STORE_ACCESS_CACHE_TTL = 300
+
+# Uploaded price files are spooled here so their import can stream and resume them.
+PRICE_IMPORT_DIR = BASE_DIR / 'price_imports'
+
+# Background jobs: seconds an idle worker waits before polling the jobs table
+# again, and seconds without a progress heartbeat after which a running job is
+# taken for abandoned and queued again.
+JOB_POLL_INTERVAL = 1.0
+JOB_STALE_AFTER = 600
+
+# In-process price books used for UPC lookups: total bytes kept per process
+# (least recently used locations are evicted first), and seconds between two
+# checks of a location's version in the shared cache.
+PRICE_BOOK_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PRICE_BOOK_CHECK_INTERVAL = 1.0
+
+# Price change feed of store devices: most changes served per page, and
+# seconds a change waits before it is served, which must exceed the longest
+# transaction writing prices.
+SYNC_PAGE_SIZE = 1000
+SYNC_SETTLE_SECONDS = 30
+
+# Compiled price snapshot files served to store devices, see build_price_snapshots.
+PRICE_SNAPSHOT_DIR = BASE_DIR / 'price_snapshots'
+
+# Seconds between two runs of `run_price_schedule --loop`.
+PRICE_SCHEDULE_INTERVAL = 60.0
+
+# Keep the MarginRollup table up to date and answer margin summaries from it
+# once rebuild_margin_rollups completed.
+MARGIN_ROLLUPS = False
+
+# Outbox read by downstream systems: most events served per page, and seconds
+# an event waits before it is served, which must exceed the longest write transaction.
+OUTBOX_PAGE_SIZE = 1000
+OUTBOX_SETTLE_SECONDS = 30
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=60),
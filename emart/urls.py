@@ -22,6 +22,8 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt import views as jwt_views 
 from accounts.views import LogoutAPIView
+from outbox.views import OutboxEventsAPIView
+from products.views import PriceChangesAPIView, PriceImportAPIView, PriceImportDetailAPIView, PriceListDiffAPIView, PriceSnapshotAPIView
 from utils.graph import SentryGraphQLView
 
 urlpatterns = [
@@ -30,6 +32,12 @@ urlpatterns = [
     path('api/login/', jwt_views.TokenObtainPairView.as_view(), name ='login'), 
     path('api/logout/', LogoutAPIView.as_view(), name='logout'),
     path('api/token/refresh/', jwt_views.TokenRefreshView.as_view(), name ='token_refresh'), 
+    path('api/price-imports/', PriceImportAPIView.as_view(), name='price_imports'),
+    path('api/price-imports/<int:pk>/', PriceImportDetailAPIView.as_view(), name='price_import'),
+    path('api/price-changes/', PriceChangesAPIView.as_view(), name='price_changes'),
+    path('api/price-list-diff/', PriceListDiffAPIView.as_view(), name='price_list_diff'),
+    path('api/price-snapshot/', PriceSnapshotAPIView.as_view(), name='price_snapshot'),
+    path('api/outbox/', OutboxEventsAPIView.as_view(), name='outbox'),
     path('api/graphql/', SentryGraphQLView.as_view(graphiql=False), name="graphql"),
     path('api/graphiql/', GraphQLView.as_view(graphiql=True)),
 ]
@@ -0,0 +1,41 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run background job workers against the jobs table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="Number of worker processes to start.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+        parser.add_argument("--poll-interval", type=float, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--max-jobs", type=int, help="Exit after this many jobs per process.")
+
+    def handle(self, *args, **options):
+        worker_options = {
+            "once": options["once"],
+            "poll_interval": options["poll_interval"],
+            "max_jobs": options["max_jobs"],
+        }
+        if options["processes"] <= 1:
+            processed = run_worker(**worker_options)
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs."))
+            return
+
+        # Database connections must not be shared with the forked workers.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=run_worker, kwargs=worker_options) for _ in range(options["processes"])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+        self.stdout.write(self.style.SUCCESS(f"{len(workers)} workers stopped."))
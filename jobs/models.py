@@ -0,0 +1,86 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from accounts.models import CustomManager, User
+
+# Create your models here.
+
+
+
+class JobLost(Exception):
+    """
+    Raised by `Job.set_progress` when the job was given to another worker meanwhile.
+    """
+
+
+class Job(models.Model):
+    """
+    Model representing a unit of background work run by the `run_jobs` workers.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    )
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    checkpoint = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder,
+                                  help_text="What the job already committed, for a retry to resume from.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.IntegerField(default=0)
+    total = models.IntegerField(null=True, blank=True)
+    message = models.TextField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=1)
+    worker = models.CharField(max_length=255, null=True, blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="jobs", null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CustomManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    def set_progress(self, progress, total=None, message=None, checkpoint=None):
+        """
+        Record how far the job got and refresh its heartbeat.
+
+        The row is updated directly so that the job functions can report
+        progress without overwriting the fields the worker manages. A job
+        whose `checkpoint` is set in the transaction that committed its work
+        resumes from there when it is retried.
+
+        Raises:
+            JobLost: If the job was taken for abandoned and queued again, so
+                that this worker stops instead of running it alongside the next.
+        """
+        self.progress = progress
+        values = {"progress": progress, "heartbeat_at": timezone.now(), "updated_at": timezone.now()}
+        if total is not None:
+            self.total = values["total"] = total
+        if message is not None:
+            self.message = values["message"] = message
+        if checkpoint is not None:
+            self.checkpoint = values["checkpoint"] = checkpoint
+        jobs = Job.objects.filter(id=self.id)
+        if self.worker is not None:
+            jobs = jobs.filter(status=Job.RUNNING, worker=self.worker)
+        if not jobs.update(**values):
+            raise JobLost(f"Job {self.id} is no longer run by {self.worker}.")
@@ -0,0 +1,50 @@
+from jobs.models import Job
+
+
+TASKS = {}
+
+
+def task(name):
+    """
+    Register the decorated function as the job named `name`.
+
+    The function is called by a worker as ``function(job, **job.payload)`` and
+    its return value, which must be JSON serializable, is stored as the job's
+    result. Long functions report their progress with `Job.set_progress`,
+    which is also the heartbeat that keeps the job from being taken for
+    abandoned after `JOB_STALE_AFTER` seconds. A retried job starts over, so
+    jobs with several attempts pass what they committed as the `checkpoint`
+    of `set_progress` and resume from `job.checkpoint`.
+    """
+    def register(function):
+        TASKS[name] = function
+        return function
+    return register
+
+
+def get_task(name):
+    if name not in TASKS:
+        raise ValueError(f"No job is registered with this name {name}")
+    return TASKS[name]
+
+
+def enqueue(name, payload=None, user=None, max_attempts=1):
+    """
+    Queue the job `name` and return it right away.
+
+    Args:
+        name (str): The name the job function was registered with.
+        payload (dict): Keyword arguments of the job function.
+        user: The user the job runs for.
+        max_attempts (int): How many times the job is tried before it fails.
+
+    Returns:
+        Job: The queued job.
+    """
+    get_task(name)
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts,
+    )
@@ -0,0 +1,40 @@
+from graphene_django import DjangoObjectType
+from graphene import relay
+import graphene
+from graphql import GraphQLError
+from utils.funct import get_integer_id
+from utils.planner import optimize_queryset
+from jobs.models import Job
+
+
+class JobType(DjangoObjectType):
+    """
+    GraphQL type for the Job model.
+    """
+    class Meta:
+        model = Job
+        fields = ("id", "name", "status", "progress", "total", "message", "result", "attempts",
+                  "created_at", "started_at", "finished_at", "updated_at")
+        interfaces = (relay.Node,)
+
+
+class Query(graphene.ObjectType):
+    """
+    Query class for GraphQL queries related to background jobs.
+    """
+    job = graphene.Field(JobType, id=graphene.String(required=True))
+
+    def resolve_job(self, info, id):
+        user = info.context.user
+        if not user.is_authenticated:
+            raise GraphQLError("You don't have permission to read Job.", extensions={'code': 403})
+        numeric_id = get_integer_id(id)
+        job = optimize_queryset(Job.objects.all(), info).filter(id=numeric_id).first()
+        if job is None:
+            raise GraphQLError("Job not found.", extensions={'code': 404})
+        if not user.is_superuser and user.role != "admin" and job.created_by_id != user.id:
+            raise GraphQLError("You don't have permission to read Job.", extensions={'code': 403})
+        return job
+
+
+jobs_schema = graphene.Schema(query=Query)
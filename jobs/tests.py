@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job, JobLost
+from jobs.registry import enqueue, task
+from jobs.worker import claim_job, execute_job, requeue_stale_jobs, run_worker
+
+
+@task("jobs.tests.add")
+def add(job, a, b):
+    job.set_progress(1, 1)
+    return {"sum": a + b}
+
+
+@task("jobs.tests.fail")
+def fail(job):
+    raise RuntimeError(f"attempt {job.attempts} failed")
+
+
+class ClaimTests(TestCase):
+    def test_job_is_claimed_once(self):
+        job = enqueue("jobs.tests.add", {"a": 1, "b": 2})
+        claimed = claim_job("worker-1")
+        self.assertEqual((claimed.id, claimed.status, claimed.worker, claimed.attempts),
+                         (job.id, Job.RUNNING, "worker-1", 1))
+        self.assertIsNone(claim_job("worker-2"))
+
+    def test_claim_skips_job_taken_meanwhile(self):
+        first = enqueue("jobs.tests.add", {"a": 1, "b": 2})
+        second = enqueue("jobs.tests.add", {"a": 3, "b": 4})
+        # Another worker won the conditional UPDATE after this one read the candidates.
+        Job.objects.filter(id=first.id).update(status=Job.RUNNING, worker="worker-1")
+        self.assertEqual(claim_job("worker-2").id, second.id)
+
+    def test_job_waits_for_run_after(self):
+        enqueue("jobs.tests.add", {"a": 1, "b": 2})
+        Job.objects.update(run_after=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(claim_job("worker-1"))
+
+
+@override_settings(JOB_STALE_AFTER=60)
+class StaleJobTests(TestCase):
+    def claim_and_stop(self, max_attempts):
+        enqueue("jobs.tests.add", {"a": 1, "b": 2}, max_attempts=max_attempts)
+        job = claim_job("worker-1")
+        Job.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(seconds=61))
+        return job
+
+    def test_missed_heartbeat_requeues(self):
+        job = self.claim_and_stop(max_attempts=2)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.QUEUED, None))
+        self.assertEqual(claim_job("worker-2").id, job.id)
+
+    def test_missed_heartbeat_without_attempts_left_fails(self):
+        job = self.claim_and_stop(max_attempts=1)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_recent_heartbeat_is_left_running(self):
+        enqueue("jobs.tests.add", {"a": 1, "b": 2}, max_attempts=2)
+        job = claim_job("worker-1")
+        job.set_progress(0)
+        self.assertEqual(requeue_stale_jobs(), 0)
+
+    def test_slow_worker_stops_at_its_next_heartbeat(self):
+        job = self.claim_and_stop(max_attempts=2)
+        requeue_stale_jobs()
+        claim_job("worker-2")
+        with self.assertRaises(JobLost):
+            job.set_progress(1)
+        # The outcome of the old worker is dropped; the new one owns the job.
+        with self.assertLogs("jobs.worker", "WARNING"):
+            execute_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.progress), (Job.RUNNING, "worker-2", 0))
+
+
+class ExecuteJobTests(TestCase):
+    def test_success_stores_result(self):
+        job = enqueue("jobs.tests.add", {"a": 1, "b": 2})
+        self.assertEqual(run_worker(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress, job.total), (Job.SUCCEEDED, {"sum": 3}, 1, 1))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failure_is_retried_until_attempts_run_out(self):
+        job = enqueue("jobs.tests.fail", max_attempts=2)
+        with self.assertLogs("jobs.worker", "ERROR"):
+            execute_job(claim_job("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.message), (Job.QUEUED, 1, "attempt 1 failed"))
+        with self.assertLogs("jobs.worker", "ERROR"):
+            execute_job(claim_job("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.message), (Job.FAILED, 2, "attempt 2 failed"))
+        self.assertIsNone(claim_job("worker-1"))
+
+    def test_checkpoint_survives_retry(self):
+        job = enqueue("jobs.tests.fail", max_attempts=2)
+        claimed = claim_job("worker-1")
+        claimed.set_progress(5, 10, checkpoint={"rows": 5})
+        with self.assertLogs("jobs.worker", "ERROR"):
+            execute_job(claimed)
+        job = claim_job("worker-2")
+        self.assertEqual((job.checkpoint, job.progress), ({"rows": 5}, 5))
@@ -0,0 +1,126 @@
+from datetime import timedelta
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job, JobLost
+from jobs.registry import get_task
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def requeue_stale_jobs():
+    """
+    Give back the running jobs whose worker stopped sending heartbeats.
+
+    A job is stale when it has not reported progress for `JOB_STALE_AFTER`
+    seconds, which happens when its worker process was killed. It is queued
+    again while it has attempts left and failed otherwise; a worker that was
+    only slow finds out at its next heartbeat and stops.
+
+    Returns:
+        int: The number of jobs recovered.
+    """
+    stale_before = timezone.now() - timedelta(seconds=getattr(settings, "JOB_STALE_AFTER", 600))
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=stale_before)
+    message = "The worker running this job stopped responding."
+    requeued = stale.filter(attempts__lt=F("max_attempts")).update(
+        status=Job.QUEUED, worker=None, message=message, updated_at=timezone.now()
+    )
+    failed = stale.update(
+        status=Job.FAILED, worker=None, message=message, finished_at=timezone.now(), updated_at=timezone.now()
+    )
+    return requeued + failed
+
+
+def claim_job(worker_name):
+    """
+    Take the oldest queued job for `worker_name`, or return None.
+
+    A job is claimed with a conditional UPDATE on its status instead of a row
+    lock, so that concurrent workers never run the same job on SQLite as well
+    as on PostgreSQL.
+    """
+    now = timezone.now()
+    candidates = (Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+                  .order_by("run_after", "id").values_list("id", flat=True)[:10])
+    for job_id in list(candidates):
+        claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker_name, attempts=F("attempts") + 1,
+            started_at=now, heartbeat_at=now, updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def execute_job(job):
+    """
+    Run a claimed job and store its outcome.
+    """
+    try:
+        result = get_task(job.name)(job, **job.payload)
+    except JobLost:
+        logger.warning("Job %s (%s) was requeued while %s ran it", job.id, job.name, job.worker)
+        return job
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed", job.id, job.name)
+        job.refresh_from_db(fields=["attempts", "max_attempts", "progress", "total"])
+        job.message = str(exc)
+        job.worker = None
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.refresh_from_db(fields=["progress", "total", "message"])
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.worker = None
+        job.finished_at = timezone.now()
+        if job.total is not None:
+            job.progress = job.total
+    job.save(update_fields=["status", "result", "message", "worker", "progress", "finished_at", "updated_at"])
+    return job
+
+
+def run_worker(once=False, poll_interval=None, max_jobs=None):
+    """
+    Process queued jobs until stopped.
+
+    Args:
+        once (bool): Stop as soon as the queue is empty.
+        poll_interval (float): Seconds to wait when the queue is empty.
+        max_jobs (int): Stop after this many jobs.
+
+    Returns:
+        int: The number of jobs processed.
+    """
+    worker_name = get_worker_name()
+    if poll_interval is None:
+        poll_interval = getattr(settings, "JOB_POLL_INTERVAL", 1.0)
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        close_old_connections()
+        requeue_stale_jobs()
+        job = claim_job(worker_name)
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        execute_job(job)
+        processed += 1
+    return processed
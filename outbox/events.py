@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import User
+from outbox.models import OutboxEvent
+from products.models import (
+    Category, Country, Department, Location, PriceList, PriceListDetail, Product, State, Store, UnitOfMeasure, Vendor,
+)
+from products.signals import price_details_changed, price_details_deleting
+
+
+OUTBOX_MODELS = (
+    Country, State, Vendor, Department, Category, UnitOfMeasure, Product, Location, Store, PriceList,
+    PriceListDetail, User,
+)
+
+# Never leave the database.
+OUTBOX_EXCLUDED_FIELDS = {"password"}
+
+OUTBOX_BATCH_SIZE = 1000
+
+
+def get_payload_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.name not in OUTBOX_EXCLUDED_FIELDS]
+
+
+def record_event(instance, action):
+    OutboxEvent.objects.create(
+        topic=instance._meta.label_lower, object_id=instance.pk, action=action,
+        payload={field: getattr(instance, field) for field in get_payload_fields(type(instance))},
+    )
+
+
+def record_events(queryset, action):
+    """
+    Record an event for every row of `queryset`, reading and inserting them in batches.
+
+    Bulk writes skip the model signals; they call this with the rows written,
+    or about to be deleted, inside their transaction.
+
+    Returns:
+        int: The number of events recorded.
+    """
+    model = queryset.model
+    fields = get_payload_fields(model)
+    queryset = queryset.order_by("pk").values(*fields)
+    recorded = 0
+    last_pk = None
+    while True:
+        rows = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:OUTBOX_BATCH_SIZE])
+        if not rows:
+            return recorded
+        OutboxEvent.objects.bulk_create([
+            OutboxEvent(topic=model._meta.label_lower, object_id=row[model._meta.pk.attname], action=action,
+                        payload=row)
+            for row in rows
+        ])
+        recorded += len(rows)
+        last_pk = rows[-1][model._meta.pk.attname]
+
+
+def record_saved(sender, instance, update_fields=None, **kwargs):
+    if sender is User and update_fields is not None and set(update_fields) <= {"last_login"}:
+        # Every sign-in saves it; downstream systems do not care.
+        return
+    record_event(instance, OutboxEvent.UPSERT)
+
+
+def record_deleted(sender, instance, **kwargs):
+    record_event(instance, OutboxEvent.DELETE)
+
+
+def record_price_details_cascade(sender, instance, **kwargs):
+    # Price list details are deleted by the cascade without signals, to keep large lists fast.
+    for field in PriceListDetail._meta.concrete_fields:
+        if field.is_relation and field.related_model is sender:
+            record_events(PriceListDetail.objects.filter(**{field.attname: instance.pk}), OutboxEvent.DELETE)
+
+
+for model in OUTBOX_MODELS:
+    post_save.connect(record_saved, sender=model, dispatch_uid=f"outbox_saved_{model._meta.label_lower}")
+    if model is not PriceListDetail:
+        post_delete.connect(record_deleted, sender=model, dispatch_uid=f"outbox_deleted_{model._meta.label_lower}")
+for field in PriceListDetail._meta.concrete_fields:
+    if field.is_relation:
+        pre_delete.connect(record_price_details_cascade, sender=field.related_model,
+                           dispatch_uid=f"outbox_cascade_{field.related_model._meta.label_lower}")
+
+
+@receiver(price_details_changed)
+def record_price_details_changed(sender, details=None, **kwargs):
+    if details is not None:
+        record_events(details, OutboxEvent.UPSERT)
+
+
+@receiver(price_details_deleting)
+def record_price_details_deleting(sender, details, **kwargs):
+    record_events(details, OutboxEvent.DELETE)
+
+
+class OutboxPage:
+    """
+    The events recorded after a sequence number, in sequence order.
+
+    `reset` tells the consumer the events it missed were compacted away: it
+    must copy the tables again before tailing from `last_id`.
+    """
+    def __init__(self, events, last_id, has_more=False, reset=False):
+        self.events = list(events)
+        self.last_id = last_id
+        self.has_more = has_more
+        self.reset = reset
+
+
+def get_outbox_events(after=0, limit=None, topics=None):
+    """
+    Return the events after sequence number `after`, optionally of some `topics` only.
+
+    Events younger than `OUTBOX_SETTLE_SECONDS` are held back: an id is taken
+    when the event is written, not when its transaction commits, so a slower
+    transaction holding a lower id must commit before a consumer moves past it.
+
+    Args:
+        after (int): The last sequence number processed, 0 for the first read.
+        limit (int): The number of events per page, capped at `OUTBOX_PAGE_SIZE`.
+        topics (list): Model labels such as `products.product`.
+
+    Returns:
+        OutboxPage: The events; read the next page after its `last_id` while `has_more`.
+    """
+    max_limit = getattr(settings, "OUTBOX_PAGE_SIZE", 1000)
+    limit = min(limit or max_limit, max_limit)
+    oldest = OutboxEvent.objects.aggregate(oldest=Min("id"))["oldest"]
+    reset = after > 0 and oldest is not None and after < oldest - 1
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "OUTBOX_SETTLE_SECONDS", 30))
+    events = OutboxEvent.objects.filter(id__gt=after, created_at__lte=cutoff).order_by("id")
+    if topics:
+        events = events.filter(topic__in=topics)
+    events = list(events[:limit + 1])
+    has_more = len(events) > limit
+    events = events[:limit]
+    return OutboxPage(events, events[-1].id if events else after, has_more=has_more, reset=reset)
+
+
+def compact_outbox(keep_days):
+    """
+    Delete the events older than `keep_days` days, always keeping the latest one.
+
+    Consumers behind the oldest event left are told to reset.
+
+    Returns:
+        int: The number of events deleted.
+    """
+    head = OutboxEvent.objects.aggregate(head=Max("id"))["head"]
+    if head is None:
+        return 0
+    return OutboxEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=keep_days),
+                                      id__lt=head).delete()[0]
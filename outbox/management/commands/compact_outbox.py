@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from outbox.events import compact_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the outbox events older than --keep-days. Consumers that did not read them since then "
+        "copy the tables again. Schedule it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=int, default=7, help="Keep the events of the last N days (default 7).")
+
+    def handle(self, *args, **options):
+        deleted = compact_outbox(options["keep_days"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} outbox events deleted."))
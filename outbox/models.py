@@ -0,0 +1,33 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class OutboxEvent(models.Model):
+    """
+    Model recording a row written or deleted, in the transaction that did it.
+
+    Downstream systems read the events in id order from the outbox API, so
+    they only fetch what changed since the last id they processed. `payload`
+    holds the row's fields as written, or as they were before a delete.
+    """
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTION_CHOICES = (
+        (UPSERT, "Upsert"),
+        (DELETE, "Delete"),
+    )
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=100, help_text="The model label, e.g. products.pricelistdetail.")
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["topic", "id"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.action} {self.topic} {self.object_id}"
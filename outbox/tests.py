@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from outbox.events import compact_outbox, get_outbox_events
+from outbox.models import OutboxEvent
+from products.models import (
+    Category, Department, Location, PriceList, PriceListDetail, Product, UnitOfMeasure, Vendor,
+)
+from products.price_lists import bulk_create_price_details
+
+
+class OutboxRecordingTests(TestCase):
+    def setUp(self):
+        self.vendor = Vendor.objects.create(name="Dairy Co", vendor_no="100")
+        self.location = Location.objects.create(location_name="Main", location_code="1", email="main@example.com")
+        self.uom = UnitOfMeasure.objects.create(code="EA", name="Each")
+        self.product = Product.objects.create(
+            department=Department.objects.create(department_no="1", department_name="Dairy"),
+            category=Category.objects.create(category="Milk"), uom=self.uom, upc="000000000001",
+            full_description="Whole milk", pack="1", size="1",
+        )
+        self.price_list = PriceList.objects.create(name="Base", vendor=self.vendor, location=self.location,
+                                                   status=PriceList.ACTIVE)
+        OutboxEvent.objects.all().delete()
+
+    def get_events(self):
+        return list(OutboxEvent.objects.order_by("id").values_list("topic", "object_id", "action"))
+
+    def make_rows(self, count):
+        return [{
+            "product_id": self.product.id, "uom_id": self.uom.id, "vendor_id": self.vendor.id,
+            "location_id": self.location.id, "upc": self.product.upc, "item_number": index, "pricing_method": "unit",
+            "quantity": 1, "case_qty": 1, "pack": "1", "size": "1", "net_cost": 1.0, "base_retail": "2.50",
+            "store_retail": "2.50", "base_gp_pct": "30", "store_gp_pct": "30", "vendor_movement": 1,
+            "store_movement": 1, "name": "Milk", "description": "Whole milk", "status": PriceListDetail.ACTIVE,
+            "effective_start_date": None, "effective_end_date": None,
+        } for index in range(count)]
+
+    def test_save_and_delete_record_one_event(self):
+        uom = UnitOfMeasure.objects.create(code="CS", name="Case")
+        uom.name = "Cases"
+        uom.save()
+        uom_id = uom.id
+        uom.delete()
+        self.assertEqual(self.get_events(), [
+            ("products.unitofmeasure", uom_id, OutboxEvent.UPSERT),
+            ("products.unitofmeasure", uom_id, OutboxEvent.UPSERT),
+            ("products.unitofmeasure", uom_id, OutboxEvent.DELETE),
+        ])
+        self.assertEqual(OutboxEvent.objects.last().payload["name"], "Cases")
+
+    def test_bulk_write_records_one_event_per_row(self):
+        bulk_create_price_details(self.price_list.id, self.make_rows(3), batch_size=2)
+        detail_ids = list(PriceListDetail.objects.order_by("id").values_list("id", flat=True))
+        self.assertEqual(self.get_events(),
+                         [("products.pricelistdetail", detail_id, OutboxEvent.UPSERT) for detail_id in detail_ids])
+
+    def test_cascade_records_one_delete_per_detail(self):
+        bulk_create_price_details(self.price_list.id, self.make_rows(2))
+        detail_ids = set(PriceListDetail.objects.values_list("id", flat=True))
+        OutboxEvent.objects.all().delete()
+        price_list_id = self.price_list.id
+        self.price_list.delete()
+        events = self.get_events()
+        self.assertEqual({object_id for topic, object_id, action in events
+                          if topic == "products.pricelistdetail" and action == OutboxEvent.DELETE}, detail_ids)
+        self.assertEqual(len(events), len(detail_ids) + 1)
+        self.assertIn(("products.pricelist", price_list_id, OutboxEvent.DELETE), events)
+
+    def test_sign_in_and_password_stay_out(self):
+        user = User.objects.create_user(email="clerk@example.com", password="secret", name="clerk", role="admin")
+        self.assertNotIn("password", OutboxEvent.objects.get(topic="accounts.user").payload)
+        user.last_login = timezone.now()
+        user.save(update_fields=["last_login"])
+        self.assertEqual(OutboxEvent.objects.filter(topic="accounts.user").count(), 1)
+
+
+@override_settings(OUTBOX_SETTLE_SECONDS=0, OUTBOX_PAGE_SIZE=2)
+class OutboxDispatchTests(TestCase):
+    def setUp(self):
+        OutboxEvent.objects.all().delete()
+        self.uoms = [UnitOfMeasure.objects.create(code=code, name=code) for code in ("EA", "CS", "PK")]
+        Vendor.objects.create(name="Dairy Co", vendor_no="100")
+
+    def test_pages_follow_sequence(self):
+        first = get_outbox_events(0)
+        self.assertEqual(([event.object_id for event in first.events], first.has_more),
+                         ([uom.id for uom in self.uoms[:2]], True))
+        second = get_outbox_events(first.last_id)
+        self.assertEqual(len(second.events), 2)
+        self.assertFalse(second.has_more)
+        self.assertEqual(get_outbox_events(second.last_id).events, [])
+
+    def test_topics_filter(self):
+        page = get_outbox_events(0, topics=["products.vendor"])
+        self.assertEqual([event.topic for event in page.events], ["products.vendor"])
+
+    @override_settings(OUTBOX_SETTLE_SECONDS=60)
+    def test_recent_events_are_held_back(self):
+        self.assertEqual(get_outbox_events(0).events, [])
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(len(get_outbox_events(0).events), 2)
+
+    def test_compacted_events_reset_consumer(self):
+        first = get_outbox_events(0, limit=1)
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(compact_outbox(keep_days=1), 3)
+        self.assertTrue(get_outbox_events(first.last_id).reset)
+
+    def test_api_requires_admin(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(email="clerk@example.com", password="x", name="clerk",
+                                                           role="store_manager"))
+        self.assertEqual(client.get("/api/outbox/").status_code, 403)
+        client.force_authenticate(User.objects.create_superuser(email="admin@example.com", password="x",
+                                                                name="admin", role="admin"))
+        response = client.get("/api/outbox/", {"after": 0, "topics": "products.unitofmeasure"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event["object_id"] for event in response.json()["events"]],
+                         [uom.id for uom in self.uoms[:2]])
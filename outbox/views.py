@@ -0,0 +1,48 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from outbox.events import get_outbox_events
+
+
+def serialize_outbox_event(event):
+    return {
+        "id": event.id,
+        "topic": event.topic,
+        "object_id": event.object_id,
+        "action": event.action,
+        "payload": event.payload,
+        "created_at": event.created_at,
+    }
+
+
+class OutboxEventsAPIView(APIView):
+    """
+    API view for downstream systems tailing the rows written and deleted, in sequence order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Handle GET request with the last processed sequence number `after`, an optional `limit`
+        and optional comma separated `topics`.
+        """
+        user = request.user
+        if not user.is_superuser and user.role != "admin":
+            return Response({"detail": "You don't have permission to read the Outbox."},
+                            status=status.HTTP_403_FORBIDDEN)
+        try:
+            after = int(request.query_params.get("after") or 0)
+            limit = request.query_params.get("limit")
+            limit = int(limit) if limit else None
+        except ValueError:
+            return Response({"detail": "after and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        topics = [topic for topic in request.query_params.get("topics", "").split(",") if topic]
+        page = get_outbox_events(after, limit, topics)
+        return Response({
+            "events": [serialize_outbox_event(event) for event in page.events],
+            "last_id": page.last_id,
+            "has_more": page.has_more,
+            "reset": page.reset,
+        }, status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import State, Country, Vendor, PriceList, Category, Department, Product, PriceListDetail, Location, Store
+from .models import State, Country, Vendor, PriceList, Category, Department, Product, PriceListDetail, Location, Store, PriceImport, CurrentPrice, CurrentPriceRebuild, PriceSnapshot, PriceScheduleRun, MarginRollup, MarginRollupRebuild
 # Register your models here.
 
 
@@ -13,4 +13,11 @@ admin.site.register(Country)
 admin.site.register(Vendor)
 admin.site.register(PriceList)
 admin.site.register(Category)
-admin.site.register(Department)
\ No newline at end of file
+admin.site.register(Department)
+admin.site.register(PriceImport)
+admin.site.register(CurrentPrice)
+admin.site.register(CurrentPriceRebuild)
+admin.site.register(PriceSnapshot)
+admin.site.register(PriceScheduleRun)
+admin.site.register(MarginRollup)
+admin.site.register(MarginRollupRebuild)
@@ -0,0 +1,202 @@
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import CurrentPrice, CurrentPriceRebuild, Location, PriceListDetail
+from products.price_lists import chunked
+from products.pricing import FIRST_DAY, LAST_DAY, EffectivePrice, build_price_timelines, resolve_effective_prices
+from products.signals import price_details_changed
+
+
+REFRESH_BATCH_SIZE = 1000
+
+CURRENT_PRICE_FIELDS = ("price_list_detail", "upc", "store_retail", "base_retail", "net_cost",
+                        "effective_start_date", "effective_end_date", "next_change_date", "refreshed_at")
+
+
+def refresh_current_prices(location_id, product_ids=None, day=None):
+    """
+    Recompute the current prices of products at a location.
+
+    The timelines of the products are rebuilt from the price lists, then every
+    product priced on `day`, or with a later price, gets its row upserted and
+    the other products lose theirs.
+
+    Args:
+        location_id (int): The location to refresh.
+        product_ids (iterable): The products to refresh, None for every product
+            of the location; this also drops rows of products that lost all prices.
+        day (date): The day the prices are in effect, today by default.
+
+    Returns:
+        tuple: The number of rows written and deleted.
+    """
+    day = day or timezone.localdate()
+    current_prices = CurrentPrice.objects.filter(location_id=location_id)
+    deleted = 0
+    if product_ids is None:
+        timelines = build_price_timelines(location_id)
+        stale = set(current_prices.values_list("product_id", flat=True)) - set(timelines)
+        for chunk in chunked(stale, REFRESH_BATCH_SIZE):
+            deleted += current_prices.filter(product_id__in=chunk).delete()[0]
+        batches = chunked(timelines.items(), REFRESH_BATCH_SIZE)
+    else:
+        batches = (build_price_timelines(location_id, chunk).items()
+                   for chunk in chunked(set(product_ids), REFRESH_BATCH_SIZE))
+
+    written = 0
+    for batch in batches:
+        found, removed = {}, []
+        for product_id, timeline in batch:
+            match = timeline.lookup(day)
+            next_change = timeline.next_change(day)
+            if match is None and next_change is None:
+                removed.append(product_id)
+            else:
+                found[product_id] = (match, next_change)
+        details = {
+            detail_id: values for detail_id, *values in PriceListDetail.objects.order_by().filter(
+                id__in=[match[0] for match, _ in found.values() if match is not None]
+            ).values_list("id", "upc", "store_retail", "base_retail", "net_cost")
+        }
+        rows = []
+        for product_id, (match, next_change) in found.items():
+            if match is not None and match[0] in details:
+                detail_id, start, end = match
+                upc, store_retail, base_retail, net_cost = details[detail_id]
+                rows.append(CurrentPrice(
+                    location_id=location_id, product_id=product_id, price_list_detail_id=detail_id, upc=upc,
+                    store_retail=store_retail, base_retail=base_retail, net_cost=net_cost,
+                    effective_start_date=start if start != FIRST_DAY else None,
+                    effective_end_date=end if end != LAST_DAY else None, next_change_date=next_change,
+                ))
+            else:
+                # Not priced today, kept so the rollover picks up its next price.
+                rows.append(CurrentPrice(location_id=location_id, product_id=product_id, next_change_date=next_change))
+        with transaction.atomic():
+            CurrentPrice.objects.bulk_create(rows, update_conflicts=True, unique_fields=["location", "product"],
+                                             update_fields=CURRENT_PRICE_FIELDS)
+            if removed:
+                deleted += current_prices.filter(product_id__in=removed).delete()[0]
+        written += len(rows)
+    return written, deleted
+
+
+def get_priced_location_ids():
+    """
+    Return the locations with price list details, and those with current prices left over.
+    """
+    return sorted(set(Location.objects.filter(
+        Q(id__in=PriceListDetail.objects.order_by().values("location_id"))
+        | Q(id__in=CurrentPrice.objects.order_by().values("location_id"))
+    ).order_by().values_list("id", flat=True)))
+
+
+def rebuild_current_prices(on_location=None):
+    """
+    Recompute the current prices of every location, recording the rebuild in a `CurrentPriceRebuild`.
+
+    Args:
+        on_location (callable): Called with the location id and the rows
+            written and deleted after each location.
+
+    Returns:
+        CurrentPriceRebuild: The completed rebuild.
+    """
+    rebuild = CurrentPriceRebuild.objects.create(started_at=timezone.now())
+    try:
+        for location_id in get_priced_location_ids():
+            written, deleted = refresh_current_prices(location_id)
+            rebuild.locations += 1
+            rebuild.written += written
+            rebuild.deleted += deleted
+            if on_location is not None:
+                on_location(location_id, written, deleted)
+    except Exception as exc:
+        rebuild.status = CurrentPriceRebuild.FAILED
+        rebuild.message = str(exc)
+        rebuild.finished_at = timezone.now()
+        rebuild.save()
+        raise
+    rebuild.status = CurrentPriceRebuild.COMPLETED
+    rebuild.finished_at = timezone.now()
+    rebuild.save()
+    return rebuild
+
+
+def rollover_current_prices(day=None):
+    """
+    Refresh the current prices whose effective dates crossed into `day`.
+
+    Run daily after midnight; rows that were not rolled over yet are also
+    refreshed on read by `get_current_prices`.
+
+    Returns:
+        int: The number of rows refreshed.
+    """
+    day = day or timezone.localdate()
+    outdated = {}
+    for location_id, product_id in (CurrentPrice.objects.filter(next_change_date__lte=day)
+                                    .values_list("location_id", "product_id").iterator(chunk_size=REFRESH_BATCH_SIZE)):
+        outdated.setdefault(location_id, []).append(product_id)
+    refreshed = 0
+    for location_id, product_ids in outdated.items():
+        refreshed += refresh_current_prices(location_id, product_ids, day)[0]
+    return refreshed
+
+
+def get_current_prices(location_id, product_ids):
+    """
+    Return today's `EffectivePrice` of `product_ids` at a location from the current prices.
+
+    Rows whose effective dates rolled over since they were written are
+    refreshed first, so the answer is right even before the daily rollover ran.
+    Until `rebuild_current_prices` completed once the table may miss products,
+    and the prices are resolved from the price lists instead.
+
+    Returns:
+        dict: An `EffectivePrice` per product id, or None when it has no price today.
+    """
+    day = timezone.localdate()
+    product_ids = set(product_ids)
+    if not CurrentPriceRebuild.objects.filter(status=CurrentPriceRebuild.COMPLETED).exists():
+        return {product_id: price if price.price is not None else None
+                for product_id, price in resolve_effective_prices(location_id, product_ids, day).items()}
+    current_prices = CurrentPrice.objects.filter(location_id=location_id)
+    rows = {row.product_id: row for row in current_prices.filter(product_id__in=product_ids)}
+    outdated = [product_id for product_id, row in rows.items()
+                if row.next_change_date is not None and row.next_change_date <= day]
+    if outdated:
+        refresh_current_prices(location_id, outdated, day)
+        for product_id in outdated:
+            del rows[product_id]
+        rows.update((row.product_id, row) for row in current_prices.filter(product_id__in=outdated))
+    return {
+        product_id: EffectivePrice.from_current_price(rows[product_id], day)
+        if product_id in rows and rows[product_id].store_retail is not None else None
+        for product_id in product_ids
+    }
+
+
+def schedule_current_price_refresh(location_ids, product_ids=None):
+    """
+    Refresh the current prices of `location_ids` once the current transaction commits.
+
+    A failed refresh is logged and leaves the rows to the next change, the
+    rollover or `rebuild_current_prices`.
+    """
+    location_ids = {location_id for location_id in location_ids if location_id is not None}
+    product_ids = None if product_ids is None else set(product_ids)
+
+    def refresh():
+        for location_id in location_ids:
+            refresh_current_prices(location_id, product_ids)
+
+    if location_ids:
+        transaction.on_commit(refresh, robust=True)
+
+
+@receiver(price_details_changed)
+def refresh_current_prices_on_change(sender, location_ids, product_ids=None, **kwargs):
+    schedule_current_price_refresh(location_ids, product_ids)
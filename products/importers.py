@@ -0,0 +1,418 @@
+import csv
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from outbox.events import record_events
+from outbox.models import OutboxEvent
+from products.models import PriceImport, PriceList, PriceListDetail, Product, UnitOfMeasure, Vendor
+from products.price_lists import PRICE_DETAIL_FIELDS, bulk_create_price_details
+from products.price_windows import find_price_window_conflicts, find_price_window_overlaps
+from products.scheduling import get_dated_status
+from products.signals import price_details_changed
+from products.utils import get_price_list_scope
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Only the first errors, and warnings, of an import are kept on its record.
+MAX_IMPORT_ERRORS = 1000
+
+# Header spellings found in vendor files, mapped to the field they fill.
+PRICE_FILE_COLUMNS = {
+    "upc": "upc",
+    "vendor_no": "vendor_no",
+    "vendor_number": "vendor_no",
+    "item_number": "item_number",
+    "item_no": "item_number",
+    "pricing_method": "pricing_method",
+    "uom": "uom",
+    "uom_code": "uom",
+    "quantity": "quantity",
+    "qty": "quantity",
+    "case_qty": "case_qty",
+    "case_quantity": "case_qty",
+    "pack": "pack",
+    "size": "size",
+    "net_cost": "net_cost",
+    "cost": "net_cost",
+    "base_retail": "base_retail",
+    "store_retail": "store_retail",
+    "base_gp_pct": "base_gp_pct",
+    "store_gp_pct": "store_gp_pct",
+    "vendor_movement": "vendor_movement",
+    "store_movement": "store_movement",
+    "name": "name",
+    "description": "description",
+    "status": "status",
+    "effective_start_date": "effective_start_date",
+    "effective_end_date": "effective_end_date",
+}
+
+INTEGER_COLUMNS = ("item_number", "quantity", "case_qty", "vendor_movement", "store_movement")
+DECIMAL_COLUMNS = ("base_retail", "store_retail", "base_gp_pct", "store_gp_pct")
+TEXT_COLUMNS = ("pricing_method", "pack", "size", "name", "description")
+DATE_COLUMNS = ("effective_start_date", "effective_end_date")
+
+
+class PriceFileError(ValueError):
+    """
+    Raised when a price file cannot be read at all.
+    """
+
+
+def normalize_header(header):
+    return str(header or "").strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def get_column_map(header):
+    """
+    Map the positions of a file's header row to the fields they fill.
+    """
+    columns = {}
+    for position, name in enumerate(header):
+        field = PRICE_FILE_COLUMNS.get(normalize_header(name))
+        if field and field not in columns.values():
+            columns[position] = field
+    if "upc" not in columns.values():
+        raise PriceFileError("The price file has no UPC column.")
+    return columns
+
+
+def read_csv_rows(path):
+    """
+    Yield ``(line number, values)`` for the data rows of a CSV file.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as price_file:
+        reader = csv.reader(price_file)
+        columns = get_column_map(next(reader, None) or [])
+        for values in reader:
+            if not any(values):
+                continue
+            yield reader.line_num, {field: values[position] for position, field in columns.items()
+                                    if position < len(values)}
+
+
+def read_xlsx_rows(path):
+    """
+    Yield ``(row number, values)`` for the data rows of the first sheet of an XLSX file.
+
+    The workbook is opened in read-only mode, which streams the sheet instead
+    of loading every cell.
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise PriceFileError("Reading .xlsx price files requires openpyxl.")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = get_column_map(next(rows, None) or [])
+        for line, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            yield line, {field: values[position] for position, field in columns.items()
+                         if position < len(values)}
+    finally:
+        workbook.close()
+
+
+def read_price_file(path):
+    """
+    Stream the rows of a CSV or XLSX price file, chosen by its extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return read_csv_rows(path)
+    if extension in (".xlsx", ".xlsm"):
+        return read_xlsx_rows(path)
+    raise PriceFileError(f"Unsupported price file type {extension or path}.")
+
+
+def to_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def get_check_digit(digits):
+    """
+    Return the GS1 check digit of a code given without it.
+    """
+    total = sum(int(digit) * (3 if index % 2 == 0 else 1) for index, digit in enumerate(reversed(digits)))
+    return str(-total % 10)
+
+
+def expand_upc_e(code):
+    """
+    Return the UPC-A an 8-digit UPC-E code stands for, or None when `code` is not one.
+
+    Only number system 0 is read as UPC-E, and only with a valid check digit:
+    other 8-digit codes are EAN-8 codes or UPC-As whose zeros were dropped.
+    """
+    if len(code) != 8 or code[0] != "0":
+        return None
+    digits, last = code[1:7], code[6]
+    if last in "012":
+        body = f"{digits[:2]}{last}0000{digits[2:5]}"
+    elif last == "3":
+        body = f"{digits[:3]}00000{digits[3:5]}"
+    elif last == "4":
+        body = f"{digits[:4]}00000{digits[4]}"
+    else:
+        body = f"{digits[:5]}0000{last}"
+    upc = f"0{body}"
+    return upc + code[7] if get_check_digit(upc) == code[7] else None
+
+
+def normalize_upc(upc):
+    """
+    Return the key of a UPC in the product map: its 14-digit GTIN form.
+
+    Spreadsheets store UPCs as numbers and drop their leading zeros, and codes
+    are written with spaces or dashes, so numeric codes are padded to 14
+    digits, which keeps their check digit, and UPC-E codes are expanded
+    first. Other codes are compared as written, without spaces and dashes.
+    """
+    code = "".join(upc.split()).replace("-", "")
+    if not code.isdigit() or len(code) > 14:
+        return code
+    return (expand_upc_e(code) or code).zfill(14)
+
+
+def to_decimal(value):
+    """
+    Parse a price or percentage, ignoring currency and percent signs and thousands separators.
+    """
+    number = Decimal(to_text(value).replace("$", "").replace("%", "").replace(",", "").strip())
+    if not number.is_finite():
+        raise ValueError
+    return number
+
+
+def to_integer(value):
+    number = to_decimal(value)
+    if number != number.to_integral_value():
+        raise ValueError
+    return int(number)
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(to_text(value))
+
+
+class PriceFileImporter:
+    """
+    Load a vendor price file into the price list of a `PriceImport`.
+
+    Rows are streamed from the file and resolved against in-memory maps of
+    product UPCs, vendor numbers and unit of measure codes, built once per
+    import. Valid rows are written in chunks of `chunk_size`; each chunk is
+    committed together with the import's checkpoint, so an interrupted import
+    resumes after the last committed row and memory use is bounded by the
+    chunk size rather than the file size.
+
+    The price list stays inactive until the whole file has been imported.
+    `on_chunk`, when given, is called with the import after every chunk.
+    """
+    def __init__(self, price_import, chunk_size=IMPORT_CHUNK_SIZE, on_chunk=None):
+        self.price_import = price_import
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.products = {}
+        self.vendors = {}
+        self.uoms = {}
+
+    def load_lookups(self):
+        # Products sharing a UPC go to the oldest one, the same the price book picks.
+        self.products = {
+            normalize_upc(upc): (product_id, uom_id, upc)
+            for upc, product_id, uom_id in Product.objects.order_by("-id").values_list("upc", "id", "uom_id").iterator()
+        }
+        self.vendors = {
+            vendor_no.strip(): vendor_id
+            for vendor_no, vendor_id in Vendor.objects.order_by().values_list("vendor_no", "id").iterator()
+        }
+        self.uoms = {
+            code.strip().lower(): uom_id
+            for code, uom_id in UnitOfMeasure.objects.order_by().values_list("code", "id").iterator()
+        }
+
+    def build_row(self, line, values):
+        """
+        Convert the values of one file row into a price list detail row.
+
+        Returns:
+            tuple: The row dict, or None, and a list of error dicts.
+        """
+        price_import = self.price_import
+        errors = []
+
+        def error(field, message):
+            errors.append({"row": line, "field": field, "value": to_text(values.get(field)), "message": message})
+
+        row = {"row": line, "location_id": price_import.location_id, "vendor_id": price_import.vendor_id}
+        row["upc"] = to_text(values.get("upc"))
+        product = self.products.get(normalize_upc(row["upc"]))
+        if product is None:
+            error("upc", f"Product not found. with this upc {row['upc']}")
+        else:
+            row["product_id"], row["uom_id"], row["upc"] = product
+
+        vendor_no = to_text(values.get("vendor_no"))
+        if vendor_no:
+            row["vendor_id"] = self.vendors.get(vendor_no)
+            if row["vendor_id"] is None:
+                error("vendor_no", f"Vendor not found. with this vendor number {vendor_no}")
+
+        uom = to_text(values.get("uom")).lower()
+        if uom:
+            row["uom_id"] = self.uoms.get(uom)
+            if row["uom_id"] is None:
+                error("uom", f"Unit Of Measure not found. with this code {uom}")
+
+        for field in INTEGER_COLUMNS:
+            try:
+                row[field] = to_integer(values.get(field))
+            except (InvalidOperation, ValueError):
+                error(field, f"{field} must be a whole number.")
+        try:
+            row["net_cost"] = float(to_decimal(values.get("net_cost")))
+        except (InvalidOperation, ValueError):
+            error("net_cost", "net_cost must be a number.")
+        for field in DECIMAL_COLUMNS:
+            try:
+                row[field] = to_decimal(values.get(field))
+            except (InvalidOperation, ValueError):
+                error(field, f"{field} must be a number.")
+        for field in TEXT_COLUMNS:
+            row[field] = to_text(values.get(field))
+        for field in DATE_COLUMNS:
+            default = getattr(price_import, field)
+            try:
+                row[field] = to_date(values[field]) if to_text(values.get(field)) else default
+            except ValueError:
+                error(field, f"{field} must be a date (YYYY-MM-DD).")
+        try:
+            row["status"] = get_dated_status(PriceListDetail, to_text(values.get("status")).lower() or
+                                             PriceListDetail.ACTIVE, row.get("effective_start_date"),
+                                             row.get("effective_end_date"))
+        except ValueError as exc:
+            error("status", str(exc))
+
+        if errors:
+            return None, errors
+        return {field: row[field] for field in ("row", "product_id", "uom_id", "vendor_id", "location_id",
+                                                *PRICE_DETAIL_FIELDS)}, []
+
+    def get_price_list(self):
+        price_import = self.price_import
+        if price_import.price_list_id is None:
+            price_import.price_list = PriceList.objects.create(
+                vendor_id=price_import.vendor_id,
+                location_id=price_import.location_id,
+                name=price_import.name,
+                status=PriceList.INACTIVE,
+                effective_start_date=price_import.effective_start_date,
+                effective_end_date=price_import.effective_end_date,
+            )
+            price_import.save(update_fields=["price_list", "updated_at"])
+        return price_import.price_list_id
+
+    def commit_chunk(self, price_list_id, rows, failed, errors, line):
+        """
+        Write one chunk of rows and move the checkpoint past it, atomically.
+        """
+        price_import = self.price_import
+        conflicts = find_price_window_conflicts(rows, price_list_id, price_import.effective_start_date,
+                                                price_import.effective_end_date)
+        if conflicts:
+            rejected = set()
+            for row, message in conflicts:
+                rejected.add(row["row"])
+                errors.append({"row": row["row"], "field": "effective_start_date",
+                               "value": to_text(row["effective_start_date"]), "message": message})
+            errors.sort(key=lambda error: error["row"])
+            rows = [row for row in rows if row["row"] not in rejected]
+            failed += len(rejected)
+        warnings = [{"row": row["row"], "field": "effective_start_date", "value": to_text(row["effective_start_date"]),
+                     "message": message}
+                    for row, message in find_price_window_overlaps(rows, price_list_id, price_import.effective_start_date,
+                                                                   price_import.effective_end_date)]
+        with transaction.atomic():
+            bulk_create_price_details(price_list_id, rows, batch_size=self.chunk_size)
+            price_import.rows_imported += len(rows)
+            price_import.rows_failed += failed
+            room = MAX_IMPORT_ERRORS - len(price_import.errors)
+            if room > 0:
+                price_import.errors.extend(errors[:room])
+            room = MAX_IMPORT_ERRORS - len(price_import.warnings)
+            if room > 0:
+                price_import.warnings.extend(warnings[:room])
+            price_import.checkpoint_row = line
+            price_import.save(update_fields=["rows_imported", "rows_failed", "errors", "warnings", "checkpoint_row",
+                                             "updated_at"])
+        if self.on_chunk is not None:
+            self.on_chunk(price_import)
+
+    def run(self):
+        """
+        Import the file, resuming after the checkpoint of an earlier attempt.
+
+        Returns:
+            PriceImport: The updated import record.
+        """
+        price_import = self.price_import
+        price_import.status = PriceImport.RUNNING
+        price_import.message = None
+        price_import.save(update_fields=["status", "message", "updated_at"])
+        try:
+            # Compared with the dates of the rows and stored details.
+            for field in DATE_COLUMNS:
+                value = getattr(price_import, field)
+                setattr(price_import, field, to_date(value) if value else None)
+            self.load_lookups()
+            price_list_id = self.get_price_list()
+            rows, failed, errors, line = [], 0, [], price_import.checkpoint_row
+            for line, values in read_price_file(price_import.file_path):
+                if line <= price_import.checkpoint_row:
+                    continue
+                row, row_errors = self.build_row(line, values)
+                if row is None:
+                    failed += 1
+                    errors.extend(row_errors)
+                else:
+                    rows.append(row)
+                if len(rows) + failed >= self.chunk_size:
+                    self.commit_chunk(price_list_id, rows, failed, errors, line)
+                    rows, failed, errors = [], 0, []
+            self.commit_chunk(price_list_id, rows, failed, errors, line)
+        except Exception as exc:
+            price_import.status = PriceImport.FAILED
+            price_import.message = str(exc)
+            price_import.save(update_fields=["status", "message", "updated_at"])
+            raise
+
+        with transaction.atomic():
+            price_list = price_import.price_list
+            PriceList.objects.filter(id=price_list_id).update(
+                status=get_dated_status(PriceList, price_import.price_list_status, price_list.effective_start_date,
+                                        price_list.effective_end_date),
+                updated_at=timezone.now(),
+            )
+            record_events(PriceList.objects.filter(id=price_list_id), OutboxEvent.UPSERT)
+            location_ids, product_ids = get_price_list_scope(price_import.price_list)
+            # The chunks passed their rows already; only the scope of the list's status is sent again.
+            price_details_changed.send(sender=PriceList, location_ids=location_ids, product_ids=product_ids)
+            price_import.status = PriceImport.COMPLETED
+            price_import.save(update_fields=["status", "updated_at"])
+        return price_import
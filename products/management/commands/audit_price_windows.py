@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import PriceListDetail
+from products.price_windows import audit_price_windows
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the price list details of the same product and location whose effective dates overlap. "
+        "Overlaps within one price list are conflicts; across lists the detail starting last takes over."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--location", type=int, action="append", dest="locations", metavar="ID",
+                            help="Only audit this location. Can be repeated.")
+        parser.add_argument("--limit", type=int, default=20, help="Overlaps listed.")
+        parser.add_argument("--conflicts-only", action="store_true",
+                            help="Only report overlaps within one price list.")
+        parser.add_argument("--fail", action="store_true", help="Exit with an error when conflicts exist.")
+
+    def handle(self, *args, **options):
+        queryset = PriceListDetail.objects.all()
+        if options["locations"]:
+            queryset = queryset.filter(location_id__in=options["locations"])
+        total = conflicts = 0
+        for location_id, product_id, detail_id, other_id, conflict in audit_price_windows(queryset):
+            if options["conflicts_only"] and not conflict:
+                continue
+            total += 1
+            conflicts += conflict
+            if total <= options["limit"]:
+                kind = "conflict within one price list" if conflict else "overlap across price lists"
+                self.stdout.write(f"location {location_id} product {product_id}: "
+                                  f"details {detail_id} and {other_id} overlap ({kind})")
+        if not total:
+            self.stdout.write(self.style.SUCCESS("No overlapping price windows."))
+            return
+        if total > options["limit"]:
+            self.stdout.write("...")
+        self.stdout.write(self.style.WARNING(
+            f"{total} overlapping price windows found, {conflicts} of them conflicting."
+        ))
+        if options["fail"] and conflicts:
+            raise CommandError("Conflicting price windows found.")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from products.snapshots import build_price_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the price snapshot files of the locations whose prices or products changed. "
+        "Schedule it every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--location", type=int, action="append", dest="locations", metavar="ID",
+                            help="Only build this location. Can be repeated.")
+        parser.add_argument("--force", action="store_true", help="Rebuild even when nothing changed.")
+
+    def handle(self, *args, **options):
+        written = build_price_snapshots(options["locations"], options["force"])
+        self.stdout.write(self.style.SUCCESS(f"{written} price snapshots written."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.sync import compact_sync_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the recorded price changes older than --keep-days. Devices that did not sync since then "
+        "download their prices again. Schedule it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=int, default=30, help="Keep the changes of the last N days (default 30).")
+
+    def handle(self, *args, **options):
+        deleted = compact_sync_changes(options["keep_days"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} price changes deleted."))
@@ -0,0 +1,139 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from utils.funct import CountedConnectionField, get_default_ordering
+
+
+# (pattern, how the index is used)
+INDEX_PATTERNS = (
+    # sqlite: "SEARCH t USING INDEX name (...)" seeks, "SCAN t USING INDEX name" walks the whole index
+    (re.compile(r"SEARCH \w+ USING (?:COVERING )?INDEX (\w+)"), "seek"),
+    (re.compile(r"SCAN \w+ USING (?:COVERING )?INDEX (\w+)"), "walk"),
+    # postgres: "Index Scan using name on t", "Bitmap Index Scan on name"
+    (re.compile(r"Index (?:Only )?Scan(?: Backward)? using (\w+)"), "scan"),
+    (re.compile(r"Bitmap Index Scan on (\w+)"), "bitmap"),
+)
+FULL_SCAN_PATTERNS = (
+    re.compile(r"\bSCAN (\w+)(?!\w| USING)"),
+    re.compile(r"Seq Scan on (\w+)"),
+)
+SORT_PATTERNS = (
+    re.compile(r"USE TEMP B-TREE FOR ORDER BY"),
+    re.compile(r"^\s*(?:->\s*)?(?:Incremental )?Sort\b", re.MULTILINE),
+)
+
+
+def get_list_fields():
+    """
+    Return the `CountedConnectionField`s of the root query type by GraphQL name.
+    """
+    from graphene.utils.str_converters import to_camel_case
+
+    from emart.schema import Query
+
+    return {
+        to_camel_case(name): field
+        for name, field in Query._meta.fields.items()
+        if isinstance(field, CountedConnectionField)
+    }
+
+
+def get_sample_value(model, list_filter):
+    """
+    Return a value to filter `model` with, taken from its first row.
+    """
+    if list_filter.method:
+        return "a"
+    if list_filter.lookup_expr == "isnull":
+        return "false"
+    value = model._default_manager.order_by().values_list(list_filter.field_name, flat=True).first()
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def read_plan(plan):
+    """
+    Return the indexes a query plan uses, the tables it scans in full and whether it sorts.
+    """
+    indexes = [f"{name} ({usage})" for pattern, usage in INDEX_PATTERNS for name in pattern.findall(plan)]
+    scans = [table for pattern in FULL_SCAN_PATTERNS for table in pattern.findall(plan)]
+    sorts = any(pattern.search(plan) for pattern in SORT_PATTERNS)
+    return indexes, scans, sorts
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the first page of every GraphQL list query, unfiltered and with each of its filters, "
+        "and report the indexes it uses and the tables it scans in full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--field", action="append", dest="fields", metavar="NAME",
+                            help="Only explain this list field (e.g. priceListDetails). Can be repeated.")
+        parser.add_argument("--page-size", type=int, default=20, help="Rows in the explained page.")
+        parser.add_argument("--analyze", action="store_true",
+                            help="Refresh the planner statistics with ANALYZE first.")
+        parser.add_argument("--verbose-plans", action="store_true", help="Print the full plans.")
+        parser.add_argument("--fail-on-scan", action="store_true",
+                            help="Exit with an error when a query scans a table in full.")
+
+    def handle(self, *args, **options):
+        list_fields = get_list_fields()
+        names = options["fields"] or sorted(list_fields)
+        unknown = [name for name in names if name not in list_fields]
+        if unknown:
+            raise CommandError(f"Unknown list fields: {', '.join(unknown)}. Known: {', '.join(sorted(list_fields))}")
+        if options["analyze"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        full_scans = 0
+        for name in names:
+            field = list_fields[name]
+            model = field.model
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({model._meta.db_table})"))
+            if getattr(field.node_type._meta.connection, "keyset", False):
+                ordering = ("-created_at", "-pk")
+            else:
+                ordering = get_default_ordering(model)
+            queryset = model._default_manager.all()
+            if not queryset.ordered:
+                queryset = queryset.order_by(*ordering)
+
+            cases = [("(default order)", queryset)]
+            for filter_name, list_filter in field.filterset_class.base_filters.items():
+                value = get_sample_value(model, list_filter)
+                if value is None:
+                    self.stdout.write(f"  {filter_name:<32} skipped, no sample value")
+                    continue
+                filterset = field.filterset_class(data={filter_name: value}, queryset=queryset)
+                if not filterset.is_valid():
+                    self.stdout.write(f"  {filter_name:<32} skipped, {value!r} is not a valid value")
+                    continue
+                cases.append((filter_name, filterset.qs))
+
+            for label, case in cases:
+                plan = case[:options["page_size"]].explain()
+                indexes, scans, sorts = read_plan(plan)
+                notes = []
+                if indexes:
+                    notes.append("index " + ", ".join(dict.fromkeys(indexes)))
+                if scans:
+                    notes.append("FULL SCAN " + ", ".join(dict.fromkeys(scans)))
+                    full_scans += 1
+                if sorts:
+                    notes.append("sorts rows")
+                line = f"  {label:<32} {'; '.join(notes) or 'no index'}"
+                self.stdout.write(self.style.WARNING(line) if scans else line)
+                if options["verbose_plans"]:
+                    for plan_line in plan.splitlines():
+                        self.stdout.write(f"      {plan_line}")
+
+        self.stdout.write(f"{full_scans} explained queries scan a table in full.")
+        if options["fail_on_scan"] and full_scans:
+            raise CommandError("Some list queries scan a table in full.")
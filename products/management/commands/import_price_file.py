@@ -0,0 +1,65 @@
+from datetime import date
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importers import IMPORT_CHUNK_SIZE, PriceFileError, PriceFileImporter
+from products.models import Location, PriceImport, PriceList, Vendor
+
+
+class Command(BaseCommand):
+    help = "Import a vendor CSV/XLSX price file into a new price list, or resume an earlier import."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="CSV or XLSX price file.")
+        parser.add_argument("--vendor", type=int, help="Id of the vendor of the price list.")
+        parser.add_argument("--location", type=int, help="Id of the location of the price list.")
+        parser.add_argument("--name", help="Name of the price list, the file name by default.")
+        parser.add_argument("--status", default=PriceList.ACTIVE, choices=[choice for choice, _ in PriceList.STATUS_CHOICES],
+                            help="Status of the price list once the import completes.")
+        parser.add_argument("--start-date", type=date.fromisoformat, help="Default effective start date (YYYY-MM-DD).")
+        parser.add_argument("--end-date", type=date.fromisoformat, help="Default effective end date (YYYY-MM-DD).")
+        parser.add_argument("--resume", type=int, metavar="IMPORT_ID",
+                            help="Resume the import with this id after its last checkpoint.")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                            help="Rows written per transaction.")
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            price_import = PriceImport.objects.filter(id=options["resume"]).first()
+            if price_import is None:
+                raise CommandError(f"Price import not found. with this id {options['resume']}")
+            if price_import.status == PriceImport.COMPLETED:
+                raise CommandError(f"Price import {price_import.id} is already completed.")
+        else:
+            price_import = self.create_import(options)
+
+        try:
+            PriceFileImporter(price_import, chunk_size=options["chunk_size"]).run()
+        except (OSError, PriceFileError) as exc:
+            raise CommandError(f"Price import {price_import.id} failed: {exc}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Price import {price_import.id}: {price_import.rows_imported} rows imported into price list "
+            f"{price_import.price_list_id}, {price_import.rows_failed} rows rejected."
+        ))
+        for error in price_import.errors[:20]:
+            self.stdout.write(f"  row {error['row']} {error['field']}: {error['message']}")
+        for warning in price_import.warnings[:20]:
+            self.stdout.write(f"  row {warning['row']} {warning['field']} (warning): {warning['message']}")
+
+    def create_import(self, options):
+        if not options["path"] or not options["vendor"] or not options["location"]:
+            raise CommandError("path, --vendor and --location are required for a new import.")
+        if not Vendor.objects.filter(id=options["vendor"]).exists():
+            raise CommandError(f"Vendor not found. with this id {options['vendor']}")
+        if not Location.objects.filter(id=options["location"]).exists():
+            raise CommandError(f"Location not found. with this id {options['location']}")
+        return PriceImport.objects.create(
+            file_path=options["path"],
+            name=options["name"] or os.path.basename(options["path"]),
+            vendor_id=options["vendor"],
+            location_id=options["location"],
+            price_list_status=options["status"],
+            effective_start_date=options["start_date"],
+            effective_end_date=options["end_date"],
+        )
@@ -0,0 +1,77 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from products.models import PriceListDetail
+
+
+NUMERIC_FIELDS = ("base_retail", "store_retail", "base_gp_pct", "store_gp_pct", "vendor_movement", "store_movement")
+
+
+def normalize_number(value, field):
+    """
+    Return the canonical text of a stored value for `field`, or None if it is not a number.
+    """
+    text = str(value if value is not None else "").replace("$", "").replace("%", "").replace(",", "").strip()
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not number.is_finite():
+        return None
+    if isinstance(field, models.DecimalField):
+        return str(number.quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP))
+    return str(number.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite the retail, gp pct and movement values of price list details as plain numbers, "
+        "so that migrating these text columns to numeric columns can cast every row. "
+        "Run it before `migrate`; values that are not numbers are reported and set to 0."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows read and written per batch.")
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(PriceListDetail._meta.db_table)
+        fields = [PriceListDetail._meta.get_field(name) for name in NUMERIC_FIELDS]
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        assignments = ", ".join(f"{connection.ops.quote_name(field.column)} = %s" for field in fields)
+        select = f"SELECT id, {columns} FROM {table} WHERE id > %s ORDER BY id LIMIT %s"
+        update = f"UPDATE {table} SET {assignments} WHERE id = %s"
+
+        # The columns are read and written as raw text, whatever type they have at this point.
+        last_id, checked, changed, invalid = 0, 0, 0, 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(select, [last_id, options["batch_size"]])
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = []
+            for row_id, *values in rows:
+                normalized = []
+                for field, value in zip(fields, values):
+                    number = normalize_number(value, field)
+                    if number is None:
+                        invalid += 1
+                        self.stdout.write(f"price list detail {row_id} {field.name}: {value!r} is not a number, set to 0")
+                        number = "0"
+                    normalized.append(number)
+                if normalized != [str(value) for value in values]:
+                    updates.append([*normalized, row_id])
+            if updates and not options["dry_run"]:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.executemany(update, updates)
+            checked += len(rows)
+            changed += len(updates)
+            last_id = rows[-1][0]
+
+        action = "would be rewritten" if options["dry_run"] else "rewritten"
+        self.stdout.write(self.style.SUCCESS(
+            f"{checked} price list details checked, {changed} {action}, {invalid} values were not numbers."
+        ))
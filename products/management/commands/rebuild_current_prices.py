@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from products.current_prices import rebuild_current_prices, refresh_current_prices
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the current prices of every product from the price lists. "
+        "Use it to fill the table the first time or to recover from missed refreshes; "
+        "dateless price reads use the table once a full rebuild completed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--location", type=int, action="append", dest="locations", metavar="ID",
+                            help="Only rebuild this location. Can be repeated.")
+
+    def handle(self, *args, **options):
+        def report(location_id, written, deleted):
+            self.stdout.write(f"location {location_id}: {written} current prices written, {deleted} removed")
+
+        if options["locations"]:
+            locations = total_written = total_deleted = 0
+            for location_id in options["locations"]:
+                written, deleted = refresh_current_prices(location_id)
+                report(location_id, written, deleted)
+                locations += 1
+                total_written += written
+                total_deleted += deleted
+        else:
+            rebuild = rebuild_current_prices(report)
+            locations, total_written, total_deleted = rebuild.locations, rebuild.written, rebuild.deleted
+        self.stdout.write(self.style.SUCCESS(
+            f"{locations} locations rebuilt: {total_written} current prices written, {total_deleted} removed."
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from products.margins import rebuild_margin_rollups, refresh_margin_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the margin rollups from the price list details. "
+        "Use it to fill the table the first time or to recover from missed refreshes; "
+        "margin summaries read the rollups once a full rebuild completed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--location", type=int, action="append", dest="locations", metavar="ID",
+                            help="Only rebuild this location. Can be repeated.")
+
+    def handle(self, *args, **options):
+        if options["locations"]:
+            written = refresh_margin_rollups(options["locations"])
+        else:
+            written = rebuild_margin_rollups().rollups
+        self.stdout.write(self.style.SUCCESS(f"{written} margin rollups written."))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.models import PriceList, PriceListDetail, Product, UnitOfMeasure, Vendor
+
+
+# (model, id column, referenced model)
+PRICE_REFERENCES = (
+    (PriceList, "vendor_id", Vendor),
+    (PriceListDetail, "product_id", Product),
+    (PriceListDetail, "vendor_id", Vendor),
+    (PriceListDetail, "uom_id", UnitOfMeasure),
+)
+
+
+def get_orphaned_rows(model, column, referenced_model):
+    """
+    Return the rows of `model` whose `column` matches no row of `referenced_model`.
+
+    The check is a NOT IN subquery on the id column itself, so it gives the
+    same answer before and after the column becomes a foreign key.
+    """
+    return model._base_manager.order_by().exclude(**{f"{column}__in": referenced_model._base_manager.values("id")})
+
+
+class Command(BaseCommand):
+    help = (
+        "Report price lists and price list details whose vendor, product or unit of measure id "
+        "points to no row. Run it before migrating these ids to foreign keys: the constraints "
+        "cannot be created while such rows exist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Ids listed per reference.")
+        parser.add_argument("--delete", action="store_true", help="Delete the orphaned rows.")
+        parser.add_argument("--fail", action="store_true", help="Exit with an error when orphaned rows exist.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, column, referenced_model in PRICE_REFERENCES:
+            orphans = get_orphaned_rows(model, column, referenced_model)
+            count = orphans.count()
+            total += count
+            label = f"{model._meta.db_table}.{column} -> {referenced_model._meta.db_table}"
+            if not count:
+                self.stdout.write(f"{label}: no orphaned rows")
+                continue
+            rows = list(orphans.values_list("id", column)[:options["limit"]])
+            self.stdout.write(self.style.WARNING(f"{label}: {count} orphaned rows"))
+            self.stdout.write("  " + ", ".join(f"id {row_id} ({column}={value})" for row_id, value in rows)
+                              + (" ..." if count > len(rows) else ""))
+            if options["delete"]:
+                with transaction.atomic():
+                    deleted, _ = orphans.delete()
+                self.stdout.write(f"  deleted {deleted} rows")
+
+        if total and not options["delete"]:
+            self.stdout.write(f"{total} orphaned rows found, rerun with --delete to remove them.")
+        if options["fail"] and total and not options["delete"]:
+            raise CommandError("Orphaned price references found.")
@@ -0,0 +1,19 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from products.current_prices import rollover_current_prices
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the current prices whose effective dates ended or started since they were written. "
+        "Schedule it daily, shortly after midnight."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, help="Roll over to this day (YYYY-MM-DD) instead of today.")
+
+    def handle(self, *args, **options):
+        refreshed = rollover_current_prices(options["date"])
+        self.stdout.write(self.style.SUCCESS(f"{refreshed} current prices rolled over."))
@@ -0,0 +1,37 @@
+from datetime import date
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from products.scheduling import run_price_schedule
+
+
+class Command(BaseCommand):
+    help = (
+        "Set the status of the price lists and details whose effective dates started or ended: "
+        "scheduled, active or expired. Schedule it shortly after midnight, or keep it running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, help="Run for this day (YYYY-MM-DD) instead of today.")
+        parser.add_argument("--loop", action="store_true", help="Keep running, once every --interval seconds.")
+        parser.add_argument("--interval", type=float, help="Seconds between two runs with --loop.")
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            run = run_price_schedule(options["date"])
+            self.stdout.write(self.style.SUCCESS(f"Price schedule {run.day}: {run.changes or 'nothing to change'}."))
+            return
+        interval = options["interval"] or getattr(settings, "PRICE_SCHEDULE_INTERVAL", 60.0)
+        try:
+            while True:
+                close_old_connections()
+                # Runs that changed nothing are not recorded, the loop would fill the table.
+                run = run_price_schedule(options["date"], record_empty=False)
+                if run.changes:
+                    self.stdout.write(f"Price schedule {run.day}: {run.changes}.")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Price schedule stopped."))
@@ -0,0 +1,295 @@
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, ExpressionWrapper, F, Max, Min, Sum
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import MarginRollup, MarginRollupRebuild, PriceList, PriceListDetail, Product
+from products.price_lists import BULK_BATCH_SIZE, chunked
+from products.signals import price_details_changed
+
+
+# The groupBy values, with the field of a detail and of a rollup they group on.
+MARGIN_DIMENSIONS = {
+    "location": ("location_id", "location_id"),
+    "vendor": ("vendor_id", "vendor_id"),
+    "department": ("product__department_id", "department_id"),
+    "category": ("product__category_id", "category_id"),
+}
+
+# The filters, with the field of a detail and of a rollup they apply to; rollups have no price list.
+MARGIN_FILTERS = {
+    "price_list_id": ("price_list_id", None),
+    "location_id": ("location_id", "location_id"),
+    "vendor_id": ("vendor_id", "vendor_id"),
+    "department_id": ("product__department_id", "department_id"),
+    "category_id": ("product__category_id", "category_id"),
+}
+
+
+class MarginSummary:
+    """
+    The margin totals of one group of price list details.
+
+    Revenue and cost are the store retail and the net cost times the store
+    movement; the gp pct averages are per detail, unweighted.
+    """
+    def __init__(self, rows=0, revenue=None, cost=None, store_gp_pct_sum=None, base_gp_pct_sum=None,
+                 min_store_gp_pct=None, max_store_gp_pct=None, location_id=None, vendor_id=None,
+                 department_id=None, category_id=None):
+        self.location_id = location_id
+        self.vendor_id = vendor_id
+        self.department_id = department_id
+        self.category_id = category_id
+        self.rows = rows or 0
+        self.revenue = float(revenue or 0)
+        self.cost = float(cost or 0)
+        self.gross_profit = round(self.revenue - self.cost, 2)
+        self.gp_pct = round(self.gross_profit * 100 / self.revenue, 2) if self.revenue else None
+        self.avg_store_gp_pct = round(float(store_gp_pct_sum) / self.rows, 2) if self.rows else None
+        self.avg_base_gp_pct = round(float(base_gp_pct_sum) / self.rows, 2) if self.rows else None
+        self.min_store_gp_pct = min_store_gp_pct
+        self.max_store_gp_pct = max_store_gp_pct
+
+
+def get_margin_details(location_ids=None, department_ids=None, category_ids=None):
+    """
+    Return the details margins are computed over: the active details of active lists.
+
+    Scheduled and expired windows are left out, so a product is counted once
+    for the prices in effect rather than for every past and future one.
+    """
+    queryset = PriceListDetail.objects.order_by().filter(status=PriceListDetail.ACTIVE,
+                                                         price_list__status=PriceList.ACTIVE)
+    if location_ids is not None:
+        queryset = queryset.filter(location_id__in=location_ids)
+    if department_ids is not None:
+        queryset = queryset.filter(product__department_id__in=department_ids)
+    if category_ids is not None:
+        queryset = queryset.filter(product__category_id__in=category_ids)
+    return queryset
+
+
+def get_detail_measures():
+    return {
+        "rows": Count("id"),
+        "revenue": Sum(ExpressionWrapper(F("store_retail") * F("store_movement"),
+                                         output_field=models.DecimalField(max_digits=18, decimal_places=2))),
+        "cost": Sum(ExpressionWrapper(F("net_cost") * F("store_movement"), output_field=models.FloatField())),
+        "store_gp_pct_sum": Sum("store_gp_pct"),
+        "base_gp_pct_sum": Sum("base_gp_pct"),
+        "min_store_gp_pct": Min("store_gp_pct"),
+        "max_store_gp_pct": Max("store_gp_pct"),
+    }
+
+
+def get_rollup_measures():
+    return {
+        "rows": Sum("rows"),
+        "revenue": Sum("revenue"),
+        "cost": Sum("cost"),
+        "store_gp_pct_sum": Sum("store_gp_pct_sum"),
+        "base_gp_pct_sum": Sum("base_gp_pct_sum"),
+        "min_store_gp_pct": Min("min_store_gp_pct"),
+        "max_store_gp_pct": Max("max_store_gp_pct"),
+    }
+
+
+def use_margin_rollups(filters):
+    return (getattr(settings, "MARGIN_ROLLUPS", False) and all(MARGIN_FILTERS[name][1] for name in filters)
+            and MarginRollupRebuild.objects.filter(status=MarginRollupRebuild.COMPLETED).exists())
+
+
+def get_margin_summary(group_by=(), filters=None):
+    """
+    Aggregate the margins of the price list details in SQL, grouped by `group_by`.
+
+    The rollups are read instead of the details when they are enabled, were
+    rebuilt at least once and no price list filter is given.
+
+    Args:
+        group_by (iterable): `MARGIN_DIMENSIONS` keys; none for a single total.
+        filters (dict): Ids keyed by `MARGIN_FILTERS` entries.
+
+    Returns:
+        tuple: A list of `MarginSummary` by decreasing revenue, and whether the rollups were read.
+
+    Raises:
+        ValueError: If a dimension or filter is unknown.
+    """
+    filters = {name: value for name, value in (filters or {}).items() if value is not None}
+    unknown = [dimension for dimension in group_by if dimension not in MARGIN_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"groupBy values must be among {', '.join(MARGIN_DIMENSIONS)}.")
+    unknown = [name for name in filters if name not in MARGIN_FILTERS]
+    if unknown:
+        raise ValueError(f"Unknown margin filters: {', '.join(unknown)}.")
+    group_by = list(dict.fromkeys(group_by))
+
+    rollups = use_margin_rollups(filters)
+    if rollups:
+        queryset = MarginRollup.objects.order_by().filter(**{MARGIN_FILTERS[name][1]: value
+                                                             for name, value in filters.items()})
+        measures = get_rollup_measures()
+        fields = {MARGIN_DIMENSIONS[dimension][1]: MARGIN_DIMENSIONS[dimension][1] for dimension in group_by}
+    else:
+        queryset = get_margin_details().filter(**{MARGIN_FILTERS[name][0]: value for name, value in filters.items()})
+        measures = get_detail_measures()
+        fields = {MARGIN_DIMENSIONS[dimension][0]: MARGIN_DIMENSIONS[dimension][1] for dimension in group_by}
+
+    if not fields:
+        return [MarginSummary(**queryset.aggregate(**measures))], rollups
+    rows = queryset.values(*fields).annotate(**measures).order_by("-revenue", *fields)
+    return [
+        MarginSummary(**{fields.get(key, key): value for key, value in row.items()}) for row in rows
+    ], rollups
+
+
+def refresh_margin_rollups(location_ids=None, department_ids=None, category_ids=None):
+    """
+    Recompute the rollups of the given locations, departments and categories.
+
+    Every group of the scope is aggregated again in one statement and its
+    rollups replaced, so the rollups of groups whose details were all removed
+    go as well. None means every location, department or category.
+
+    Returns:
+        int: The number of rollups written.
+    """
+    details = get_margin_details(location_ids, department_ids, category_ids)
+    rollups = MarginRollup.objects.all()
+    if location_ids is not None:
+        rollups = rollups.filter(location_id__in=location_ids)
+    if department_ids is not None:
+        rollups = rollups.filter(department_id__in=department_ids)
+    if category_ids is not None:
+        rollups = rollups.filter(category_id__in=category_ids)
+    rows = details.values("location_id", "vendor_id", "product__department_id", "product__category_id").annotate(
+        **get_detail_measures()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        written = 0
+        for chunk in chunked(rows.iterator(chunk_size=BULK_BATCH_SIZE), BULK_BATCH_SIZE):
+            MarginRollup.objects.bulk_create([
+                MarginRollup(department_id=row.pop("product__department_id"),
+                             category_id=row.pop("product__category_id"), **row)
+                for row in chunk
+            ])
+            written += len(chunk)
+    return written
+
+
+def rebuild_margin_rollups():
+    """
+    Recompute every rollup, recording the rebuild in a `MarginRollupRebuild`.
+
+    Returns:
+        MarginRollupRebuild: The completed rebuild.
+    """
+    rebuild = MarginRollupRebuild.objects.create(started_at=timezone.now())
+    try:
+        rebuild.rollups = refresh_margin_rollups()
+    except Exception as exc:
+        rebuild.status = MarginRollupRebuild.FAILED
+        rebuild.message = str(exc)
+        rebuild.finished_at = timezone.now()
+        rebuild.save()
+        raise
+    rebuild.status = MarginRollupRebuild.COMPLETED
+    rebuild.finished_at = timezone.now()
+    rebuild.save()
+    return rebuild
+
+
+def schedule_margin_rollup_refresh(location_ids=None, department_ids=None, category_ids=None):
+    """
+    Refresh the rollups of a scope once the current transaction commits, when rollups are enabled.
+    """
+    if not getattr(settings, "MARGIN_ROLLUPS", False):
+        return
+    transaction.on_commit(lambda: refresh_margin_rollups(location_ids, department_ids, category_ids), robust=True)
+
+
+def get_detail_groups(details):
+    """
+    Return the locations, departments and categories of `details`.
+    """
+    location_ids, department_ids, category_ids = set(), set(), set()
+    for location_id, department_id, category_id in details.order_by().values_list(
+            "location_id", "product__department_id", "product__category_id").distinct():
+        location_ids.add(location_id)
+        department_ids.add(department_id)
+        category_ids.add(category_id)
+    return location_ids, department_ids, category_ids
+
+
+def get_product_groups(product_ids):
+    """
+    Return the departments and categories of `product_ids`.
+    """
+    department_ids, category_ids = set(), set()
+    for chunk in chunked(set(product_ids), BULK_BATCH_SIZE):
+        for department_id, category_id in Product.objects.order_by().filter(id__in=chunk).values_list(
+                "department_id", "category_id").distinct():
+            department_ids.add(department_id)
+            category_ids.add(category_id)
+    return department_ids, category_ids
+
+
+@receiver(price_details_changed)
+def refresh_margin_rollups_on_change(sender, location_ids, product_ids=None, details=None, **kwargs):
+    if not getattr(settings, "MARGIN_ROLLUPS", False):
+        return
+    location_ids = {location_id for location_id in location_ids if location_id is not None}
+    if not location_ids:
+        if details is not None:
+            # The price schedule only passes the details whose status it moved, which changes the margins.
+            location_ids, department_ids, category_ids = get_detail_groups(details)
+            if location_ids:
+                schedule_margin_rollup_refresh(location_ids, department_ids, category_ids)
+        return
+    if product_ids is None:
+        schedule_margin_rollup_refresh(location_ids)
+        return
+    department_ids, category_ids = get_product_groups(product_ids)
+    if department_ids:
+        # Every (department, category) pair of the sets is refreshed, a few more than changed at most.
+        schedule_margin_rollup_refresh(location_ids, department_ids, category_ids)
+
+
+@receiver(pre_save, sender=Product)
+def detect_product_group_change(sender, instance, **kwargs):
+    previous = None
+    if instance.pk is not None and getattr(settings, "MARGIN_ROLLUPS", False):
+        previous = sender._base_manager.filter(pk=instance.pk).values_list("department_id", "category_id").first()
+    instance._previous_group = previous
+
+
+@receiver(post_save, sender=Product)
+def refresh_margin_rollups_on_product_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_group", None)
+    if previous is None or previous == (instance.department_id, instance.category_id):
+        return
+    # Its details move from one group to the other.
+    schedule_margin_rollup_refresh(None, {previous[0], instance.department_id}, {previous[1], instance.category_id})
+
+
+def refresh_margin_rollups_on_cascade(sender, instance, **kwargs):
+    if not getattr(settings, "MARGIN_ROLLUPS", False):
+        return
+    # The details the cascade deletes send no signal; their groups are read while they still exist.
+    for field in PriceListDetail._meta.concrete_fields:
+        if field.is_relation and field.related_model is sender:
+            location_ids, department_ids, category_ids = get_detail_groups(
+                PriceListDetail.objects.filter(**{field.attname: instance.pk}))
+            if location_ids:
+                schedule_margin_rollup_refresh(location_ids, department_ids, category_ids)
+
+
+for field in PriceListDetail._meta.concrete_fields:
+    # Deleting a price list already sends `price_details_changed`.
+    if field.is_relation and field.related_model is not PriceList:
+        pre_delete.connect(refresh_margin_rollups_on_cascade, sender=field.related_model,
+                           dispatch_uid=f"margins_cascade_{field.related_model._meta.label_lower}")
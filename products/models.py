@@ -52,6 +52,12 @@ class Vendor(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     objects = CustomManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["vendor_no"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
     
     def __str__(self) -> str:
         return self.name
@@ -133,6 +139,12 @@ class Product(models.Model):
     
     objects = CustomManager()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=["upc"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
+    
     def __str__(self) -> str:
         return self.upc
 
@@ -186,6 +198,11 @@ class Store(models.Model):
     
     objects = CustomManager()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+        ]
+    
     def __str__(self) -> str:
         return self.name
     
@@ -197,13 +214,21 @@ class PriceList(models.Model):
     """
     ACTIVE = "active"
     INACTIVE = "inactive"
+    SCHEDULED = "scheduled"
+    EXPIRED = "expired"
     STATUS_CHOICES = (
         (ACTIVE, "Active"),
         (INACTIVE, "Inactive"),
+        (SCHEDULED, "Scheduled"),
+        (EXPIRED, "Expired"),
     )
+    # Statuses kept in line with the effective dates by `products.scheduling`;
+    # only inactive is set by hand and switches prices off.
+    DATED_STATUSES = (SCHEDULED, ACTIVE, EXPIRED)
     name = models.CharField(max_length=255)
     description = models.CharField(max_length=255, null=True, blank=True)
-    vendor_id = models.IntegerField()
+    vendor = models.ForeignKey(Vendor, on_delete=models.PROTECT, db_constraint=True, db_index=True,
+                               related_name="price_lists", verbose_name="VendorDetails")
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="price_lists", verbose_name="LocationDetails")
     effective_start_date = models.DateField(null=True, blank=True)
     effective_end_date = models.DateField(null=True, blank=True)
@@ -211,6 +236,13 @@ class PriceList(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=["location", "status"]),
+            models.Index(fields=["status", "effective_start_date", "effective_end_date"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
+    
     def __str__(self) -> str:
         return self.name
 
@@ -222,29 +254,38 @@ class PriceListDetail(models.Model):
     """
     ACTIVE = "active"
     INACTIVE = "inactive"
+    SCHEDULED = "scheduled"
+    EXPIRED = "expired"
     STATUS_CHOICES = (
         (ACTIVE, "Active"),
         (INACTIVE, "Inactive"),
+        (SCHEDULED, "Scheduled"),
+        (EXPIRED, "Expired"),
     )
+    DATED_STATUSES = (SCHEDULED, ACTIVE, EXPIRED)
     price_list = models.ForeignKey(PriceList, on_delete=models.CASCADE, related_name="price_list_details")
-    product_id = models.IntegerField()
+    # Price history is never deleted with the master data it refers to.
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, db_constraint=True, db_index=True,
+                                related_name="price_list_details", verbose_name="ProductDetails")
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="price_list_details", verbose_name="LocationDetails")
-    vendor_id = models.IntegerField()
+    vendor = models.ForeignKey(Vendor, on_delete=models.PROTECT, db_constraint=True, db_index=True,
+                               related_name="price_list_details", verbose_name="VendorDetails")
     upc = models.CharField(max_length=255)
     item_number = models.IntegerField()
     pricing_method = models.CharField(max_length=255)   
-    uom_id = models.IntegerField()
+    uom = models.ForeignKey(UnitOfMeasure, on_delete=models.PROTECT, db_constraint=True, db_index=True,
+                            related_name="price_list_details", verbose_name="UnitOfMeasure")
     quantity = models.IntegerField()
     case_qty = models.IntegerField()
     pack = models.CharField(max_length=255)
     size = models.CharField(max_length=255)
     net_cost = models.FloatField()
-    base_retail = models.CharField(max_length=255)
-    store_retail = models.CharField(max_length=255)
-    base_gp_pct = models.CharField(max_length=255)
-    store_gp_pct = models.CharField(max_length=255)
-    vendor_movement = models.CharField(max_length=255)
-    store_movement = models.CharField(max_length=255)
+    base_retail = models.DecimalField(max_digits=12, decimal_places=2)
+    store_retail = models.DecimalField(max_digits=12, decimal_places=2)
+    base_gp_pct = models.DecimalField(max_digits=7, decimal_places=2)
+    store_gp_pct = models.DecimalField(max_digits=7, decimal_places=2)
+    vendor_movement = models.IntegerField()
+    store_movement = models.IntegerField()
     name = models.CharField(max_length=255)
     description = models.CharField(max_length=255)
     status = models.CharField(max_length=255, choices=STATUS_CHOICES)
@@ -255,5 +296,271 @@ class PriceListDetail(models.Model):
     
     objects = CustomManager()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=["upc"]),
+            # Current price of a product at a location.
+            models.Index(fields=["location", "product", "effective_start_date"]),
+            models.Index(fields=["status", "effective_start_date", "effective_end_date"]),
+            # Details of one price list in the connection order.
+            models.Index(fields=["price_list", "created_at"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
+    
+    def __str__(self) -> str:
+        return self.name
+
+
+
+class PriceImport(models.Model):
+    """
+    Model representing the import of a vendor price file into a price list.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+    )
+    file_path = models.CharField(max_length=1024)
+    name = models.CharField(max_length=255)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="price_imports")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="price_imports")
+    price_list = models.ForeignKey(PriceList, on_delete=models.SET_NULL, related_name="imports", null=True, blank=True)
+    price_list_status = models.CharField(max_length=255, choices=PriceList.STATUS_CHOICES, default=PriceList.ACTIVE)
+    effective_start_date = models.DateField(null=True, blank=True)
+    effective_end_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    checkpoint_row = models.IntegerField(default=0)
+    rows_imported = models.IntegerField(default=0)
+    rows_failed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    warnings = models.JSONField(default=list, blank=True)
+    message = models.TextField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="price_imports", null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CustomManager()
+
+    def __str__(self) -> str:
+        return self.name
+
+
+
+class CurrentPrice(models.Model):
+    """
+    Model holding the price in effect today for a product at a location.
+
+    Rows are kept up to date by `products.current_prices` whenever price lists
+    or their details change and when effective dates roll over, so reads are
+    a single lookup on (location, product). A row without a price marks a
+    product whose next price has not started yet.
+    """
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="current_prices")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="current_prices")
+    # Refreshed right after the detail changes; no constraint so that deleting
+    # a price list can still remove its details with a single statement.
+    price_list_detail = models.ForeignKey(PriceListDetail, on_delete=models.DO_NOTHING, db_constraint=False,
+                                          related_name="+", null=True, blank=True)
+    upc = models.CharField(max_length=255, null=True, blank=True)
+    store_retail = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    base_retail = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    net_cost = models.FloatField(null=True, blank=True)
+    effective_start_date = models.DateField(null=True, blank=True)
+    effective_end_date = models.DateField(null=True, blank=True)
+    # First day the row is outdated, null when no later change is known.
+    next_change_date = models.DateField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["location", "product"], name="unique_current_price"),
+        ]
+        indexes = [
+            models.Index(fields=["next_change_date"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.location_id}:{self.product_id}"
+
+
+
+class CurrentPriceRebuild(models.Model):
+    """
+    Model representing one rebuild of the current prices of every location.
+
+    Until one completed, the table may only hold the products refreshed since
+    it was added, so today's prices are resolved from the price lists instead.
+    """
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (RUNNING, "Running"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    locations = models.PositiveIntegerField(default=0)
+    written = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    message = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.started_at} {self.status}"
+
+
+
+class SyncChange(models.Model):
+    """
+    Model recording that a row copied to store devices was written or deleted.
+
+    The change feed of `products.sync` replays these in id order, so a device
+    only downloads what changed since its last sync. Product changes have no
+    location, they reach every store.
+    """
+    PRICE_LIST_DETAIL = "price_list_detail"
+    PRODUCT = "product"
+    MODEL_CHOICES = (
+        (PRICE_LIST_DETAIL, "Price list detail"),
+        (PRODUCT, "Product"),
+    )
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTION_CHOICES = (
+        (UPSERT, "Upsert"),
+        (DELETE, "Delete"),
+    )
+    id = models.BigAutoField(primary_key=True)
+    location = models.ForeignKey(Location, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name="+", null=True, blank=True)
+    model = models.CharField(max_length=32, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["location", "id"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.action} {self.model} {self.object_id}"
+
+
+
+class PriceSnapshot(models.Model):
+    """
+    Model representing the price snapshot file store devices of a location start from.
+
+    The file is named after the hash of its content, which is also its ETag.
+    `sync_change_id` is the last change the snapshot includes: devices sync
+    the changes after it from the change feed.
+    """
+    location = models.OneToOneField(Location, on_delete=models.CASCADE, related_name="price_snapshot")
+    file_path = models.CharField(max_length=1024)
+    etag = models.CharField(max_length=64)
+    size = models.PositiveIntegerField(help_text="Size of the compressed file in bytes.")
+    products = models.PositiveIntegerField(default=0)
+    prices = models.PositiveIntegerField(default=0)
+    sync_change_id = models.BigIntegerField(default=0)
+    built_on = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.location_id} {self.etag}"
+
+
+
+class PriceScheduleRun(models.Model):
+    """
+    Model representing one run of the price schedule, with the statuses it changed.
+    """
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (RUNNING, "Running"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+    )
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    # e.g. {"price_list": {"active": 2}, "price_list_detail": {"expired": 120}}
+    changes = models.JSONField(default=dict, blank=True)
+    message = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.status}"
+
+
+
+class MarginRollup(models.Model):
+    """
+    Model holding the margin totals of the price list details of a location, vendor, department and category.
+
+    Rows are recomputed by `products.margins` for the groups whose details
+    change, so margin summaries add up a few rows instead of every detail.
+    Averages are kept as sums, so groups of rollups still average correctly.
+    """
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="+")
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="+")
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name="+")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="+")
+    rows = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    cost = models.FloatField(default=0)
+    store_gp_pct_sum = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    base_gp_pct_sum = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    min_store_gp_pct = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    max_store_gp_pct = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["location", "vendor", "department", "category"],
+                                    name="unique_margin_rollup"),
+        ]
+        indexes = [
+            models.Index(fields=["department", "category"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.location_id}:{self.vendor_id}:{self.department_id}:{self.category_id}"
+
+
+
+class MarginRollupRebuild(models.Model):
+    """
+    Model representing one full rebuild of the margin rollups.
+
+    Margin summaries only read the rollups once a rebuild completed, before
+    that the table may hold only the groups refreshed so far.
+    """
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (RUNNING, "Running"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    rollups = models.PositiveIntegerField(default=0)
+    message = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self) -> str:
-        return self.name
\ No newline at end of file
+        return f"{self.started_at} {self.status}"
@@ -0,0 +1,281 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+import sys
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from products.importers import normalize_upc
+from products.models import PriceListDetail, Product
+from products.pricing import CANDIDATE_FIELDS, EffectivePrice, PriceTimeline, get_candidate, get_candidate_details
+from products.signals import price_details_changed
+
+
+PRICE_BOOK_VERSION_KEY = "price-book:version:{location_id}"
+
+
+class PriceBook:
+    """
+    The timelines of every product priced at one location, in compact arrays.
+
+    The product ids are kept sorted in `product_ids`; the segments of the i-th
+    product are the entries `offsets[i]` to `offsets[i + 1]` of the parallel
+    segment arrays, sorted by their first day. UPCs are mapped to products
+    through `Product.upc`, by their `normalize_upc` key kept sorted in `upcs`.
+    A lookup is therefore a few binary searches, and a book holds a few dozen
+    bytes per segment instead of a model instance per detail. Retails are
+    stored in cents and days as ordinals.
+    """
+    __slots__ = ("location_id", "product_ids", "offsets", "starts", "ends", "detail_ids", "upcs",
+                 "upc_product_ids", "store_retails", "base_retails", "net_costs", "size")
+
+    def __init__(self, location_id, candidates, values, upcs):
+        """
+        Args:
+            location_id (int): The location the book prices.
+            candidates (dict): `PriceTimeline.build` candidates per product id.
+            values (dict): `(store_retail, base_retail, net_cost)` per detail id.
+            upcs (dict): The product id per UPC key.
+        """
+        self.location_id = location_id
+        self.product_ids = array("q", sorted(candidates))
+        self.offsets = array("q", [0])
+        self.starts, self.ends = array("l"), array("l")
+        self.detail_ids = array("q")
+        self.store_retails, self.base_retails = array("q"), array("q")
+        self.net_costs = array("d")
+        for product_id in self.product_ids:
+            timeline = PriceTimeline.build(candidates[product_id])
+            for start, end, detail_id in zip(timeline.starts, timeline.ends, timeline.detail_ids):
+                store_retail, base_retail, net_cost = values[detail_id]
+                self.starts.append(start.toordinal())
+                self.ends.append(end.toordinal())
+                self.detail_ids.append(detail_id)
+                self.store_retails.append(int(store_retail.scaleb(2)))
+                self.base_retails.append(int(base_retail.scaleb(2)))
+                self.net_costs.append(net_cost)
+            self.offsets.append(len(self.starts))
+        self.upcs = sorted(upcs)
+        self.upc_product_ids = array("q", [upcs[upc] for upc in self.upcs])
+        self.size = (sys.getsizeof(self.upcs) + sum(sys.getsizeof(upc) for upc in self.upcs)
+                     + sum(column.itemsize * len(column) for column in (
+                         self.product_ids, self.offsets, self.starts, self.ends, self.detail_ids,
+                         self.upc_product_ids, self.store_retails, self.base_retails, self.net_costs)))
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def get_product_id(self, upc):
+        """
+        Return the id of the priced product whose UPC is `upc`, or None.
+        """
+        key = normalize_upc(upc)
+        index = bisect_left(self.upcs, key)
+        if index == len(self.upcs) or self.upcs[index] != key:
+            return None
+        return self.upc_product_ids[index]
+
+    def lookup(self, upc, day):
+        """
+        Return the `EffectivePrice` of `upc` on `day`, or None when it has no price then.
+        """
+        product_id = self.get_product_id(upc)
+        if product_id is None:
+            return None
+        return self.lookup_product(product_id, day, upc)
+
+    def lookup_product(self, product_id, day, upc=None):
+        """
+        Return the `EffectivePrice` of a product on `day`, or None when it has no price then.
+        """
+        index = bisect_left(self.product_ids, product_id)
+        if index == len(self.product_ids) or self.product_ids[index] != product_id:
+            return None
+        first, last = self.offsets[index], self.offsets[index + 1]
+        ordinal = day.toordinal()
+        position = bisect_right(self.starts, ordinal, first, last) - 1
+        if position < first or self.ends[position] < ordinal:
+            return None
+        return EffectivePrice(
+            product_id, self.location_id, day, upc, self.detail_ids[position],
+            Decimal(self.store_retails[position]).scaleb(-2), Decimal(self.base_retails[position]).scaleb(-2),
+            self.net_costs[position], date.fromordinal(self.starts[position]), date.fromordinal(self.ends[position]),
+        )
+
+
+def build_price_book(location_id):
+    """
+    Read the candidate details of a location with one streamed query and build its book.
+
+    The UPCs come from the products, the oldest one wins a UPC several share.
+    """
+    details = get_candidate_details(PriceListDetail.objects.filter(location_id=location_id))
+    rows = details.values_list("product_id", "store_retail", "base_retail", "net_cost", *CANDIDATE_FIELDS)
+    candidates = {}
+    values = {}
+    for product_id, store_retail, base_retail, net_cost, *candidate_row in rows.iterator(chunk_size=2000):
+        candidate = get_candidate(*candidate_row)
+        if candidate is None:
+            continue
+        candidates.setdefault(product_id, []).append(candidate)
+        values[candidate[3]] = (store_retail, base_retail, net_cost)
+    upcs = {}
+    products = Product.objects.filter(id__in=details.values("product_id")).order_by("id").values_list("id", "upc")
+    for product_id, upc in products.iterator(chunk_size=2000):
+        if product_id in candidates:
+            upcs.setdefault(normalize_upc(upc), product_id)
+    return PriceBook(location_id, candidates, values, upcs)
+
+
+def get_price_book_version(location_id):
+    """
+    Return the current version of the price book of a location, shared by all processes.
+    """
+    key = PRICE_BOOK_VERSION_KEY.format(location_id=location_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+class PriceBookCache:
+    """
+    A per-process LRU cache of price books, bounded by their size in bytes.
+
+    A cached book is served as long as the version of its location in the
+    shared cache is unchanged. The version is read at most once every
+    `check_interval` seconds per location, which bounds how long another
+    process's price change can go unnoticed here.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, check_interval=1.0):
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        # location id -> [version, monotonic time of the last version check, book]
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, location_id):
+        """
+        Return the price book of a location, building it when missing or outdated.
+        """
+        checked_at = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(location_id)
+            if entry is not None and checked_at - entry[1] < self.check_interval:
+                self.entries.move_to_end(location_id)
+                self.hits += 1
+                return entry[2]
+        version = get_price_book_version(location_id)
+        with self.lock:
+            entry = self.entries.get(location_id)
+            if entry is not None and entry[0] == version:
+                entry[1] = checked_at
+                self.entries.move_to_end(location_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        book = build_price_book(location_id)
+        self.set(location_id, version, checked_at, book)
+        return book
+
+    def set(self, location_id, version, checked_at, book):
+        with self.lock:
+            previous = self.entries.pop(location_id, None)
+            if previous is not None:
+                self.size -= previous[2].size
+            if book.size > self.max_bytes:
+                # Served to the caller but never kept, it would evict everything else.
+                return
+            self.entries[location_id] = [version, checked_at, book]
+            self.size += book.size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+
+    def invalidate(self, location_ids):
+        """
+        Drop the books of `location_ids` here and give them a new version for every process.
+        """
+        with self.lock:
+            for location_id in location_ids:
+                entry = self.entries.pop(location_id, None)
+                if entry is not None:
+                    self.size -= entry[2].size
+        for location_id in location_ids:
+            cache.set(PRICE_BOOK_VERSION_KEY.format(location_id=location_id), uuid.uuid4().hex, None)
+
+    def stats(self):
+        """
+        Return the hit, miss and eviction counters and the current size.
+        """
+        with self.lock:
+            return {
+                "books": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+price_books = PriceBookCache(getattr(settings, "PRICE_BOOK_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+                             getattr(settings, "PRICE_BOOK_CHECK_INTERVAL", 1.0))
+
+
+def invalidate_price_books(location_ids):
+    """
+    Outdate the price books of `location_ids` once the current transaction commits.
+
+    Bumping the version before the commit would let a concurrent reader
+    rebuild a book from the old rows and keep it under the new version.
+    """
+    location_ids = {location_id for location_id in location_ids if location_id is not None}
+    if location_ids:
+        transaction.on_commit(lambda: price_books.invalidate(location_ids))
+
+
+@receiver(price_details_changed)
+def invalidate_price_books_on_change(sender, location_ids, **kwargs):
+    invalidate_price_books(location_ids)
+
+
+@receiver(pre_save, sender=Product)
+def detect_product_upc_change(sender, instance, **kwargs):
+    previous = None
+    if instance.pk is not None:
+        previous = sender._base_manager.filter(pk=instance.pk).values_list("upc", flat=True).first()
+    instance._previous_upc = previous
+
+
+@receiver(post_save, sender=Product)
+def invalidate_price_books_on_upc_change(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_upc", None)
+    if previous is None or previous == instance.upc:
+        return
+    # The books map UPCs to products, so those pricing it must read the new one.
+    invalidate_price_books(PriceListDetail.objects.order_by().filter(product_id=instance.pk).values_list(
+        "location_id", flat=True).distinct())
+
+
+def lookup_prices_by_upc(location_id, upcs, day):
+    """
+    Return the `EffectivePrice` of every UPC of `upcs` at a location on `day`, or None per UPC.
+    """
+    book = price_books.get(location_id)
+    return [book.lookup(upc, day) for upc in upcs]
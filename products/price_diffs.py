@@ -0,0 +1,112 @@
+import hashlib
+
+from products.models import PriceListDetail
+from products.price_lists import BULK_BATCH_SIZE, PRICE_DETAIL_FIELDS
+
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+# Compared between the two versions of a row; upc and location are the join key.
+PRICE_DIFF_FIELDS = ("product_id", "vendor_id", "uom_id") + tuple(
+    field for field in PRICE_DETAIL_FIELDS if field != "upc"
+)
+START_DATE_INDEX = PRICE_DIFF_FIELDS.index("effective_start_date")
+
+
+def get_values_digest(values):
+    return hashlib.blake2b(repr(values).encode(), digest_size=16).digest()
+
+
+class PriceListDiffRow:
+    """
+    A row added to, removed from or changed between two price lists.
+
+    `values` holds the compared fields of an added row; `changes` maps each
+    changed field of a changed row to its `(old, new)` values.
+    """
+    def __init__(self, change, upc, location_id, from_id=None, to_id=None, values=None, changes=None):
+        self.change = change
+        self.upc = upc
+        self.location_id = location_id
+        self.from_id = from_id
+        self.to_id = to_id
+        self.values = values or {}
+        self.changes = changes or {}
+
+
+class PriceListDiff:
+    """
+    The rows of price list `to_id` that differ from price list `from_id`, joined on (upc, location).
+
+    Iterating hash-joins the lists: the details of `from_id` are read once
+    into a table holding their id and a digest of their values per key, then
+    the details of `to_id` are streamed against it. Only the rows whose digest
+    differs are read again, in batches, for their field deltas, so memory
+    grows with the keys of the older list and not with the rows' values.
+    Rows sharing a key within a list are paired by effective start date, then
+    in id order. `counts` is complete once the iteration ends.
+    """
+    def __init__(self, from_id, to_id):
+        self.from_id = from_id
+        self.to_id = to_id
+        self.counts = {ADDED: 0, REMOVED: 0, CHANGED: 0, "unchanged": 0}
+
+    def get_rows(self, price_list_id):
+        return PriceListDetail.objects.filter(price_list_id=price_list_id).order_by("id").values_list(
+            "id", "location_id", "upc", *PRICE_DIFF_FIELDS
+        )
+
+    def build(self):
+        table = {}
+        for detail_id, location_id, upc, *values in self.get_rows(self.from_id).iterator(chunk_size=2000):
+            table.setdefault((location_id, upc), []).append(
+                (values[START_DATE_INDEX], detail_id, get_values_digest(tuple(values)))
+            )
+        return table
+
+    def __iter__(self):
+        table = self.build()
+        pending = []
+        for detail_id, location_id, upc, *values in self.get_rows(self.to_id).iterator(chunk_size=2000):
+            entries = table.get((location_id, upc))
+            if not entries:
+                self.counts[ADDED] += 1
+                yield PriceListDiffRow(ADDED, upc, location_id, to_id=detail_id,
+                                       values=dict(zip(PRICE_DIFF_FIELDS, values)))
+                continue
+            match = next((index for index, entry in enumerate(entries) if entry[0] == values[START_DATE_INDEX]), 0)
+            _, from_id, digest = entries.pop(match)
+            if digest == get_values_digest(tuple(values)):
+                self.counts["unchanged"] += 1
+                continue
+            pending.append((from_id, detail_id, location_id, upc, values))
+            if len(pending) == BULK_BATCH_SIZE:
+                yield from self.get_changed_rows(pending)
+                pending = []
+        yield from self.get_changed_rows(pending)
+
+        for (location_id, upc), entries in table.items():
+            for _, from_id, _ in entries:
+                self.counts[REMOVED] += 1
+                yield PriceListDiffRow(REMOVED, upc, location_id, from_id=from_id)
+
+    def get_changed_rows(self, pending):
+        previous = {
+            detail_id: values for detail_id, *values in PriceListDetail.objects.order_by().filter(
+                id__in=[from_id for from_id, *_ in pending]
+            ).values_list("id", *PRICE_DIFF_FIELDS)
+        }
+        for from_id, to_id, location_id, upc, values in pending:
+            if from_id not in previous:
+                # Deleted since the join read it.
+                self.counts[ADDED] += 1
+                yield PriceListDiffRow(ADDED, upc, location_id, to_id=to_id,
+                                       values=dict(zip(PRICE_DIFF_FIELDS, values)))
+                continue
+            self.counts[CHANGED] += 1
+            yield PriceListDiffRow(CHANGED, upc, location_id, from_id=from_id, to_id=to_id, changes={
+                field: (old, new) for field, old, new in zip(PRICE_DIFF_FIELDS, previous[from_id], values)
+                if old != new
+            })
@@ -0,0 +1,144 @@
+from itertools import islice
+
+from products.models import Location, PriceListDetail, Product, UnitOfMeasure, Vendor
+from products.scheduling import get_dated_status
+from products.signals import price_details_changed
+from utils.funct import get_integer_id
+
+
+BULK_BATCH_SIZE = 1000
+
+# (input field, model, label used in error messages)
+PRICE_DETAIL_REFERENCES = (
+    ("vendor_id", Vendor, "Vendor"),
+    ("location_id", Location, "Location"),
+    ("product_id", Product, "Product"),
+    ("uom_id", UnitOfMeasure, "Unit Of Measure"),
+)
+
+PRICE_DETAIL_FIELDS = (
+    "upc", "item_number", "pricing_method", "quantity", "case_qty", "pack", "size", "net_cost",
+    "base_retail", "store_retail", "base_gp_pct", "store_gp_pct", "vendor_movement", "store_movement",
+    "name", "description", "status", "effective_start_date", "effective_end_date",
+)
+
+
+class PriceDetailError:
+    """
+    A problem found in one row of a price list.
+    """
+    def __init__(self, row, field, value, message):
+        self.row = row
+        self.field = field
+        self.value = value
+        self.message = message
+
+
+def chunked(iterable, size):
+    """
+    Yield lists of at most `size` items from `iterable`.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_existing_ids(model, ids):
+    """
+    Return the subset of `ids` that exist for `model`, one `id__in` query per chunk.
+    """
+    existing = set()
+    for chunk in chunked(ids, BULK_BATCH_SIZE):
+        existing.update(model._default_manager.filter(id__in=chunk).order_by().values_list("id", flat=True))
+    return existing
+
+
+def validate_price_details(price_list_details, first_row=0):
+    """
+    Validate price list detail rows with one query per referenced model.
+
+    The referenced ids of every row are collected first and checked with a
+    single `id__in` query per model instead of four `.exists()` per row.
+
+    Args:
+        price_list_details (list): `PriceDetailInput` values or plain dicts.
+        first_row (int): Index reported for the first row.
+
+    Returns:
+        tuple: The rows as dicts with integer ids, and a list of `PriceDetailError`.
+    """
+    rows = []
+    errors = []
+    referenced = {field: set() for field, _, _ in PRICE_DETAIL_REFERENCES}
+    for index, price_list_detail in enumerate(price_list_details, start=first_row):
+        row = {field: price_list_detail.get(field) for field in PRICE_DETAIL_FIELDS}
+        row["row"] = index
+        for field, _, label in PRICE_DETAIL_REFERENCES:
+            value = price_list_detail.get(field)
+            try:
+                row[field] = get_integer_id(value)
+            except Exception:
+                row[field] = None
+                errors.append(PriceDetailError(index, field, value, f"Invalid {label} id {value}"))
+                continue
+            referenced[field].add(row[field])
+        try:
+            row["status"] = get_dated_status(PriceListDetail, row["status"], row["effective_start_date"],
+                                             row["effective_end_date"])
+        except ValueError as exc:
+            errors.append(PriceDetailError(index, "status", row["status"], str(exc)))
+        rows.append(row)
+
+    for field, model, label in PRICE_DETAIL_REFERENCES:
+        existing = get_existing_ids(model, referenced[field])
+        for row in rows:
+            if row[field] is not None and row[field] not in existing:
+                errors.append(PriceDetailError(row["row"], field, str(row[field]),
+                                               f"{label} not found. with this id {row[field]}"))
+    errors.sort(key=lambda error: error.row)
+    return rows, errors
+
+
+def build_price_detail(price_list_id, row):
+    """
+    Return an unsaved `PriceListDetail` for a validated row.
+    """
+    return PriceListDetail(
+        price_list_id=price_list_id,
+        product_id=row["product_id"],
+        uom_id=row["uom_id"],
+        vendor_id=row["vendor_id"],
+        location_id=row["location_id"],
+        **{field: row[field] for field in PRICE_DETAIL_FIELDS},
+    )
+
+
+def bulk_create_price_details(price_list_id, rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Insert validated rows into price list `price_list_id` in chunks.
+
+    Callers wrap this in `transaction.atomic()` so that a failing chunk leaves
+    no partial price list behind.
+
+    Returns:
+        int: The number of details created.
+    """
+    created = 0
+    first_id = None
+    location_ids, product_ids = set(), set()
+    for chunk in chunked(rows, batch_size):
+        details = PriceListDetail.objects.bulk_create([build_price_detail(price_list_id, row) for row in chunk])
+        if first_id is None and details:
+            first_id = details[0].id
+        location_ids.update(row["location_id"] for row in chunk)
+        product_ids.update(row["product_id"] for row in chunk)
+        created += len(chunk)
+    details = PriceListDetail.objects.filter(price_list_id=price_list_id)
+    if first_id is not None:
+        details = details.filter(id__gte=first_id)
+    price_details_changed.send(sender=PriceListDetail, location_ids=location_ids, product_ids=product_ids,
+                               details=details)
+    return created
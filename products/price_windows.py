@@ -0,0 +1,240 @@
+from products.models import PriceList, PriceListDetail
+from products.price_lists import BULK_BATCH_SIZE, chunked
+from products.pricing import get_effective_range
+
+
+class IntervalTree:
+    """
+    A static interval tree over closed ranges of days.
+
+    The ranges are sorted by their first day and laid out as an implicit
+    balanced tree over that array: the middle of every slice is a node, and
+    `max_ends` holds the last day reached by any range of the node's slice.
+    A query skips every slice ending before it and every right half starting
+    after it, so it costs O(log n + k) for k overlapping ranges, and building
+    costs one sort.
+    """
+    __slots__ = ("starts", "ends", "items", "max_ends")
+
+    def __init__(self, ranges=()):
+        """
+        Args:
+            ranges (iterable): `(start, end, item)` triples.
+        """
+        ranges = sorted(ranges, key=lambda entry: (entry[0], entry[1]))
+        self.starts = [start for start, _, _ in ranges]
+        self.ends = [end for _, end, _ in ranges]
+        self.items = [item for _, _, item in ranges]
+        self.max_ends = list(self.ends)
+        if ranges:
+            self._build(0, len(ranges))
+
+    def _build(self, low, high):
+        middle = (low + high) // 2
+        max_end = self.ends[middle]
+        if low < middle:
+            max_end = max(max_end, self._build(low, middle))
+        if middle + 1 < high:
+            max_end = max(max_end, self._build(middle + 1, high))
+        self.max_ends[middle] = max_end
+        return max_end
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start, end):
+        """
+        Return the items of the ranges sharing at least one day with `start`-`end`.
+        """
+        found = []
+        slices = [(0, len(self.starts))]
+        while slices:
+            low, high = slices.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            if self.max_ends[middle] < start:
+                continue
+            slices.append((low, middle))
+            if self.starts[middle] <= end:
+                if self.ends[middle] >= start:
+                    found.append(self.items[middle])
+                slices.append((middle + 1, high))
+        return found
+
+
+def is_conflict(price_list_id, other_price_list_id):
+    """
+    Tell whether two overlapping details of a product leave its price undecided.
+
+    Across lists the detail starting last wins, then the newest list, which
+    is how promotions and new vendor lists take over. Two details of one list
+    have no such order: the list contradicts itself.
+    """
+    return price_list_id == other_price_list_id
+
+
+def load_price_windows(keys, price_list_id=None, exclude_price_list_id=None):
+    """
+    Build the interval trees of stored details for `(location_id, product_id)` keys.
+
+    Args:
+        keys (iterable): The `(location_id, product_id)` keys to load.
+        price_list_id (int): Only load the details of this list; by default
+            the details of every list not switched off.
+        exclude_price_list_id (int): Leave out the details of this list.
+
+    Returns:
+        dict: An `IntervalTree` of `(detail_id, price_list_id)` items per key.
+    """
+    ranges = {key: [] for key in keys}
+    queryset = PriceListDetail.objects.order_by().filter(
+        status__in=PriceListDetail.DATED_STATUSES, location_id__in={location_id for location_id, _ in ranges},
+    )
+    if price_list_id is not None:
+        queryset = queryset.filter(price_list_id=price_list_id)
+    else:
+        queryset = queryset.filter(price_list__status__in=PriceList.DATED_STATUSES)
+    if exclude_price_list_id is not None:
+        queryset = queryset.exclude(price_list_id=exclude_price_list_id)
+    for chunk in chunked({product_id for _, product_id in ranges}, BULK_BATCH_SIZE):
+        rows = queryset.filter(product_id__in=chunk).values_list(
+            "location_id", "product_id", "id", "price_list_id", "effective_start_date", "effective_end_date",
+            "price_list__effective_start_date", "price_list__effective_end_date",
+        )
+        for location_id, product_id, detail_id, detail_price_list_id, *dates in rows.iterator(chunk_size=2000):
+            key = (location_id, product_id)
+            if key not in ranges:
+                continue
+            start, end = get_effective_range(*dates)
+            if start <= end:
+                ranges[key].append((start, end, (detail_id, detail_price_list_id)))
+    return {key: IntervalTree(key_ranges) for key, key_ranges in ranges.items()}
+
+
+def get_row_windows(rows, list_start=None, list_end=None):
+    """
+    Return the effective ranges of the rows not switched off, as `(start, end, index)` per key.
+    """
+    windows = {}
+    for index, row in enumerate(rows):
+        if row.get("status") == PriceListDetail.INACTIVE:
+            continue
+        start, end = get_effective_range(row.get("effective_start_date"), row.get("effective_end_date"),
+                                         list_start, list_end)
+        if start <= end:
+            windows.setdefault((row["location_id"], row["product_id"]), []).append((start, end, index))
+    return windows
+
+
+def find_price_window_conflicts(rows, price_list_id=None, list_start=None, list_end=None, exclude_ids=()):
+    """
+    Find the rows whose effective range overlaps a stored detail of their list or another row.
+
+    The stored details of the rows' products are loaded once into interval
+    trees, and the rows get trees of their own, so checking n rows against m
+    details costs O((n + m) log(n + m)) instead of a join of every pair.
+
+    Args:
+        rows (list): Detail dicts with `location_id`, `product_id`, `status`,
+            `effective_start_date` and `effective_end_date`, all going to one list.
+        price_list_id (int): The list of the rows, None for a list not created yet.
+        list_start (date): The effective start date of that list.
+        list_end (date): The effective end date of that list.
+        exclude_ids (iterable): Stored details the rows replace.
+
+    Returns:
+        list: `(row, message)` pairs, in the order of `rows`.
+    """
+    exclude_ids = set(exclude_ids)
+    windows = get_row_windows(rows, list_start, list_end)
+    stored = load_price_windows(windows, price_list_id) if price_list_id is not None else {}
+
+    conflicts = []
+    for key, key_windows in windows.items():
+        pending = IntervalTree(key_windows) if len(key_windows) > 1 else None
+        for start, end, index in key_windows:
+            message = None
+            overlapping = [detail_id for detail_id, _ in stored[key].overlapping(start, end)
+                           if detail_id not in exclude_ids] if stored else []
+            if overlapping:
+                message = f"Overlaps price list detail {min(overlapping)} of the same price list."
+            if message is None and pending is not None:
+                others = [other for other in pending.overlapping(start, end) if other != index]
+                if others:
+                    message = f"Overlaps row {rows[min(others)].get('row', min(others))} of the same price list."
+            if message is not None:
+                conflicts.append((index, message))
+    conflicts.sort()
+    return [(rows[index], message) for index, message in conflicts]
+
+
+def find_price_window_overlaps(rows, price_list_id=None, list_start=None, list_end=None):
+    """
+    Find the rows whose effective range overlaps a detail of another list.
+
+    These are not conflicts, the detail starting last takes over, but a new
+    vendor list shadowing or being shadowed by another one is worth a warning.
+
+    Args:
+        rows (list): Detail dicts as for `find_price_window_conflicts`.
+        price_list_id (int): The list of the rows, None for a list not created yet.
+        list_start (date): The effective start date of that list.
+        list_end (date): The effective end date of that list.
+
+    Returns:
+        list: `(row, message)` pairs, in the order of `rows`.
+    """
+    windows = get_row_windows(rows, list_start, list_end)
+    stored = load_price_windows(windows, exclude_price_list_id=price_list_id)
+    overlaps = []
+    for key, key_windows in windows.items():
+        for start, end, index in key_windows:
+            overlapping = stored[key].overlapping(start, end)
+            if overlapping:
+                detail_id, other_price_list_id = min(overlapping)
+                overlaps.append((index, f"Overlaps price list detail {detail_id} of price list {other_price_list_id}; "
+                                        f"the detail starting last takes over."))
+    overlaps.sort()
+    return [(rows[index], message) for index, message in overlaps]
+
+
+def audit_price_windows(queryset=None):
+    """
+    Yield every pair of stored details whose effective ranges overlap.
+
+    The details are streamed in (location, product) order and one interval
+    tree is built per product, so the audit runs in O(n log n) and holds one
+    product's details at a time.
+
+    Yields:
+        tuple: `(location_id, product_id, detail_id, other_detail_id, conflict)`,
+        each pair once; `conflict` tells a pair leaving the price undecided,
+        see `is_conflict`, from one where the later detail takes over.
+    """
+    if queryset is None:
+        queryset = PriceListDetail.objects.all()
+    rows = queryset.filter(status__in=PriceListDetail.DATED_STATUSES,
+                           price_list__status__in=PriceList.DATED_STATUSES).order_by(
+        "location_id", "product_id", "id"
+    ).values_list("location_id", "product_id", "id", "price_list_id", "effective_start_date", "effective_end_date",
+                  "price_list__effective_start_date", "price_list__effective_end_date")
+    key, ranges = None, []
+    for location_id, product_id, detail_id, price_list_id, *dates in rows.iterator(chunk_size=2000):
+        if (location_id, product_id) != key:
+            yield from get_window_overlaps(key, ranges)
+            key, ranges = (location_id, product_id), []
+        start, end = get_effective_range(*dates)
+        if start <= end:
+            ranges.append((start, end, (detail_id, price_list_id)))
+    yield from get_window_overlaps(key, ranges)
+
+
+def get_window_overlaps(key, ranges):
+    if len(ranges) < 2:
+        return
+    tree = IntervalTree(ranges)
+    for start, end, (detail_id, price_list_id) in ranges:
+        for other_id, other_price_list_id in sorted(tree.overlapping(start, end)):
+            if other_id > detail_id:
+                yield (*key, detail_id, other_id, is_conflict(price_list_id, other_price_list_id))
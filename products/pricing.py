@@ -0,0 +1,274 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+import heapq
+
+from django.db.models import Q
+
+from products.models import PriceList, PriceListDetail
+
+
+# Open effective dates stand for "since always" and "until further notice".
+FIRST_DAY = date.min
+LAST_DAY = date.max
+
+
+class PriceTimeline:
+    """
+    The price list detail in effect for one product at one location, over time.
+
+    The effective ranges of the active details usually overlap: a base list
+    runs without end while promotions override it for a few weeks. The
+    timeline flattens them into sorted, disjoint segments that each hold the
+    detail winning there, so `lookup` is a binary search over the segment
+    starts instead of a scan over every detail of the product.
+    """
+    __slots__ = ("starts", "ends", "detail_ids")
+
+    def __init__(self, segments=()):
+        self.starts = [start for start, _, _ in segments]
+        self.ends = [end for _, end, _ in segments]
+        self.detail_ids = [detail_id for _, _, detail_id in segments]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, day):
+        """
+        Return the id of the detail in effect on `day` and the range it holds, or None.
+        """
+        index = bisect_right(self.starts, day) - 1
+        if index < 0 or self.ends[index] < day:
+            return None
+        return self.detail_ids[index], self.starts[index], self.ends[index]
+
+    def next_change(self, day):
+        """
+        Return the first day after `day` on which `lookup` gives another answer, or None.
+        """
+        index = bisect_right(self.starts, day) - 1
+        if index >= 0 and day <= self.ends[index]:
+            end = self.ends[index]
+            return end + timedelta(days=1) if end < LAST_DAY else None
+        return self.starts[index + 1] if index + 1 < len(self.starts) else None
+
+    @classmethod
+    def build(cls, candidates):
+        """
+        Flatten candidate `(start, end, rank, detail_id)` ranges into a timeline.
+
+        Where ranges overlap the highest `rank`, a tuple of integers, wins.
+        The boundaries are swept in order with a heap of the ranges started so
+        far; ranges that ended are only dropped once they reach the top.
+        """
+        candidates = sorted(candidates)
+        boundaries = {start for start, _, _, _ in candidates}
+        boundaries.update(end + timedelta(days=1) for _, end, _, _ in candidates if end < LAST_DAY)
+        boundaries = sorted(boundaries)
+
+        segments = []
+        heap = []
+        position = 0
+        for index, boundary in enumerate(boundaries):
+            while position < len(candidates) and candidates[position][0] <= boundary:
+                start, end, rank, detail_id = candidates[position]
+                heapq.heappush(heap, (tuple(-part for part in rank), end, detail_id))
+                position += 1
+            while heap and heap[0][1] < boundary:
+                heapq.heappop(heap)
+            if not heap:
+                continue
+            detail_id = heap[0][2]
+            end = boundaries[index + 1] - timedelta(days=1) if index + 1 < len(boundaries) else LAST_DAY
+            if segments and segments[-1][2] == detail_id and segments[-1][1] + timedelta(days=1) == boundary:
+                segments[-1] = (segments[-1][0], end, detail_id)
+            else:
+                segments.append((boundary, end, detail_id))
+        return cls(segments)
+
+
+def get_effective_range(detail_start, detail_end, list_start, list_end):
+    """
+    Return the days a detail is in effect: its own range within its price list's.
+    """
+    start = max(detail_start or FIRST_DAY, list_start or FIRST_DAY)
+    end = min(detail_end or LAST_DAY, list_end or LAST_DAY)
+    return start, end
+
+
+# Values read for each candidate detail, in the order `get_candidate` takes them.
+CANDIDATE_FIELDS = ("id", "price_list_id", "effective_start_date", "effective_end_date",
+                    "price_list__effective_start_date", "price_list__effective_end_date")
+
+
+def get_candidate_details(queryset):
+    """
+    Restrict `queryset` to the details that can be in effect: those not switched off, of lists not switched off.
+
+    Scheduled and expired entries stay candidates, their dates alone decide
+    when they apply, so prices do not wait for the schedule to run.
+    """
+    return queryset.order_by().filter(status__in=PriceListDetail.DATED_STATUSES,
+                                      price_list__status__in=PriceList.DATED_STATUSES)
+
+
+def get_candidate(detail_id, price_list_id, detail_start, detail_end, list_start, list_end):
+    """
+    Return the `PriceTimeline.build` candidate of a detail, or None if it is never in effect.
+
+    Where ranges overlap, the detail that took effect last wins, so that a
+    promotion overrides the list it runs on top of; a tie goes to the newest
+    price list and then to the newest detail.
+    """
+    start, end = get_effective_range(detail_start, detail_end, list_start, list_end)
+    if start > end:
+        return None
+    return start, end, (start.toordinal(), price_list_id, detail_id), detail_id
+
+
+def build_price_timelines(location_id, product_ids=None):
+    """
+    Build the timelines of `product_ids` at a location with one query.
+
+    Args:
+        location_id (int): The location the prices apply to.
+        product_ids (iterable): The products to build, None for every product
+            with a price list detail at the location.
+
+    Returns:
+        dict: A `PriceTimeline` per product id, empty for products without prices.
+    """
+    queryset = PriceListDetail.objects.filter(location_id=location_id)
+    if product_ids is None:
+        candidates = {}
+    else:
+        candidates = {product_id: [] for product_id in product_ids}
+        queryset = queryset.filter(product_id__in=candidates)
+    rows = get_candidate_details(queryset).values_list("product_id", *CANDIDATE_FIELDS)
+    for product_id, *candidate_row in rows.iterator(chunk_size=2000):
+        candidate = get_candidate(*candidate_row)
+        if candidate is not None:
+            candidates.setdefault(product_id, []).append(candidate)
+    return {product_id: PriceTimeline.build(ranges) for product_id, ranges in candidates.items()}
+
+
+def in_effect_on(day):
+    """
+    Return the filter of the details whose own dates and price list's dates contain `day`.
+    """
+    return ((Q(effective_start_date__lte=day) | Q(effective_start_date__isnull=True))
+            & (Q(effective_end_date__gte=day) | Q(effective_end_date__isnull=True))
+            & (Q(price_list__effective_start_date__lte=day) | Q(price_list__effective_start_date__isnull=True))
+            & (Q(price_list__effective_end_date__gte=day) | Q(price_list__effective_end_date__isnull=True)))
+
+
+def find_effective_details(location_id, product_ids, day):
+    """
+    Return the detail in effect on `day` per product, as `PriceTimeline.lookup` would.
+
+    Only the details containing `day` can win, so they are read through the
+    `(location, product, effective_start_date)` index and the highest rank is
+    kept. A second query reads the details outranking the winner on other
+    days of its range: those ending before `day` move the start of the range
+    past them, those starting after it end the range the day before.
+
+    Returns:
+        dict: `(detail_id, start, end)` per product id with a price on `day`.
+    """
+    details = get_candidate_details(PriceListDetail.objects.filter(location_id=location_id,
+                                                                   product_id__in=product_ids))
+    winners = {}
+    for product_id, *candidate_row in details.filter(in_effect_on(day)).values_list("product_id", *CANDIDATE_FIELDS):
+        candidate = get_candidate(*candidate_row)
+        if candidate is not None and (product_id not in winners or candidate[2] > winners[product_id][2]):
+            winners[product_id] = candidate
+    if not winners:
+        return {}
+
+    ranges = {product_id: [start, end] for product_id, (start, end, _, _) in winners.items()}
+    first = min(start for start, _ in ranges.values())
+    last = max(end for _, end in ranges.values())
+    others = details.filter(
+        Q(product_id__in=winners),
+        Q(effective_start_date__gt=day) | Q(price_list__effective_start_date__gt=day)
+        | Q(effective_end_date__lt=day) | Q(price_list__effective_end_date__lt=day),
+        Q(effective_start_date__lte=last) | Q(effective_start_date__isnull=True),
+        Q(price_list__effective_start_date__lte=last) | Q(price_list__effective_start_date__isnull=True),
+        Q(effective_end_date__gte=first) | Q(effective_end_date__isnull=True),
+        Q(price_list__effective_end_date__gte=first) | Q(price_list__effective_end_date__isnull=True),
+    )
+    for product_id, *candidate_row in others.values_list("product_id", *CANDIDATE_FIELDS):
+        candidate = get_candidate(*candidate_row)
+        if candidate is None or candidate[2] < winners[product_id][2]:
+            continue
+        start, end, _, _ = candidate
+        if start > day:
+            ranges[product_id][1] = min(ranges[product_id][1], start - timedelta(days=1))
+        elif end < day:
+            ranges[product_id][0] = max(ranges[product_id][0], end + timedelta(days=1))
+    return {product_id: (winners[product_id][3], start, end) for product_id, (start, end) in ranges.items()}
+
+
+class EffectivePrice:
+    """
+    The price of a product at a location on a day.
+
+    `price_list_detail` holds the detail instance when the price was read
+    from the database; prices served from a `PriceBook` only carry its id.
+    """
+    __slots__ = ("product_id", "location_id", "date", "upc", "price_list_detail_id", "price", "base_retail",
+                 "net_cost", "effective_start_date", "effective_end_date", "price_list_detail")
+
+    def __init__(self, product_id, location_id, day, upc=None, price_list_detail_id=None, price=None,
+                 base_retail=None, net_cost=None, start=None, end=None, price_list_detail=None):
+        self.product_id = product_id
+        self.location_id = location_id
+        self.date = day
+        self.upc = upc
+        self.price_list_detail_id = price_list_detail_id
+        self.price = price
+        self.base_retail = base_retail
+        self.net_cost = net_cost
+        self.effective_start_date = start if start != FIRST_DAY else None
+        self.effective_end_date = end if end != LAST_DAY else None
+        self.price_list_detail = price_list_detail
+
+    @classmethod
+    def from_detail(cls, detail, day, start, end):
+        return cls(detail.product_id, detail.location_id, day, detail.upc, detail.id, detail.store_retail,
+                   detail.base_retail, detail.net_cost, start, end, price_list_detail=detail)
+
+    @classmethod
+    def from_current_price(cls, current_price, day):
+        return cls(current_price.product_id, current_price.location_id, day, current_price.upc,
+                   current_price.price_list_detail_id, current_price.store_retail, current_price.base_retail,
+                   current_price.net_cost, current_price.effective_start_date or FIRST_DAY,
+                   current_price.effective_end_date or LAST_DAY)
+
+
+def resolve_effective_prices(location_id, product_ids, day):
+    """
+    Return the effective price of every product of `product_ids` on `day`.
+
+    Args:
+        location_id (int): The location the prices apply to.
+        product_ids (list): Product ids, duplicates are resolved once.
+        day (date): The day the prices are in effect.
+
+    Returns:
+        dict: An `EffectivePrice` per product id; its `price` is None when no
+        price is in effect.
+    """
+    product_ids = set(product_ids)
+    found = find_effective_details(location_id, product_ids, day)
+    details = PriceListDetail.objects.order_by().select_related(
+        "price_list", "product", "location", "vendor", "uom"
+    ).in_bulk([detail_id for detail_id, _, _ in found.values()])
+
+    prices = {}
+    for product_id in product_ids:
+        detail_id, start, end = found.get(product_id, (None, None, None))
+        if detail_id in details:
+            prices[product_id] = EffectivePrice.from_detail(details[detail_id], day, start, end)
+        else:
+            prices[product_id] = EffectivePrice(product_id, location_id, day)
+    return prices
@@ -0,0 +1,178 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Ceil, Now, Round
+from django.db.models.lookups import GreaterThan
+
+from products.models import PriceListDetail, Product
+from products.signals import price_details_changed
+
+
+NUMBER = models.DecimalField(max_digits=14, decimal_places=4)
+
+# Fields a rule can change, with the decimals their new value is rounded to.
+REPRICE_FIELDS = {
+    "net_cost": 4,
+    "base_retail": 2,
+    "store_retail": 2,
+}
+
+# The margin column kept in line with each retail column.
+MARGIN_FIELDS = {
+    "base_retail": "base_gp_pct",
+    "store_retail": "store_gp_pct",
+}
+
+REPRICE_OPERATIONS = ("percent", "amount", "target_gp_pct", "round_to")
+
+
+def as_number(name):
+    """
+    Return column `name` as a decimal expression.
+
+    `net_cost` is a float column, so it is cast to combine it with the
+    decimal retail columns in one expression.
+    """
+    if isinstance(PriceListDetail._meta.get_field(name), models.DecimalField):
+        return F(name)
+    return Cast(F(name), NUMBER)
+
+
+def number(value):
+    return Value(Decimal(str(value)), output_field=NUMBER)
+
+
+def get_reprice_queryset(price_list_id=None, location_id=None, vendor_id=None, department_id=None, category_id=None):
+    """
+    Return the price list details a repricing applies to.
+
+    Every given argument narrows the scope. Departments and categories are
+    matched through a subquery on the products, so the scope stays a single
+    statement.
+    """
+    queryset = PriceListDetail.objects.order_by()
+    if price_list_id is not None:
+        queryset = queryset.filter(price_list_id=price_list_id)
+    if location_id is not None:
+        queryset = queryset.filter(location_id=location_id)
+    if vendor_id is not None:
+        queryset = queryset.filter(vendor_id=vendor_id)
+    products = Product.objects.order_by()
+    if department_id is not None:
+        products = products.filter(department_id=department_id)
+    if category_id is not None:
+        products = products.filter(category_id=category_id)
+    if department_id is not None or category_id is not None:
+        queryset = queryset.filter(product_id__in=products.values("id"))
+    return queryset
+
+
+def validate_reprice_rule(rule):
+    """
+    Check a rule and return the name of its operation.
+
+    A rule names the `field` it changes and exactly one operation:
+    `percent` (e.g. 3 for +3%), `amount` (added), `target_gp_pct` (the
+    retail that yields this gross margin on the net cost) or `round_to`
+    (the cents every price ends with, e.g. 0.99).
+    """
+    field = rule.get("field")
+    if field not in REPRICE_FIELDS:
+        raise ValueError(f"field must be one of {', '.join(REPRICE_FIELDS)}.")
+    operations = [operation for operation in REPRICE_OPERATIONS if rule.get(operation) is not None]
+    if len(operations) != 1:
+        raise ValueError(f"A rule needs exactly one of {', '.join(REPRICE_OPERATIONS)}.")
+    operation = operations[0]
+    value = Decimal(str(rule[operation]))
+    if operation == "percent" and value <= -100:
+        raise ValueError("percent must be greater than -100.")
+    if operation == "target_gp_pct" and (field not in MARGIN_FIELDS or not 0 <= value < 100):
+        raise ValueError("target_gp_pct applies to base_retail or store_retail and must be between 0 and 100.")
+    if operation == "round_to" and not 0 <= value < 1:
+        raise ValueError("round_to must be between 0 and 1, e.g. 0.99.")
+    return operation
+
+
+def get_rule_expression(field, operation, value):
+    """
+    Return the SQL expression computing the new value of `field`.
+    """
+    current = as_number(field)
+    if operation == "percent":
+        expression = current * number(1 + Decimal(str(value)) / 100)
+    elif operation == "amount":
+        expression = current + number(value)
+    elif operation == "target_gp_pct":
+        expression = as_number("net_cost") / number(1 - Decimal(str(value)) / 100)
+    else:
+        # The smallest price ending in `value` that is not below the current one.
+        ending = number(value)
+        return Ceil(current - ending) + ending
+    return Round(expression, REPRICE_FIELDS[field])
+
+
+def get_margin_expression(retail_field):
+    """
+    Return the SQL expression of the gross margin percentage of `retail_field`.
+    """
+    retail = as_number(retail_field)
+    return Round((retail - as_number("net_cost")) * number(100) / retail, 2)
+
+
+def reprice_price_details(queryset, rules, recompute_margins=True, dry_run=False):
+    """
+    Apply repricing rules to every detail of `queryset` with set-based UPDATEs.
+
+    Each rule runs as one UPDATE over the whole scope, in the given order, so
+    that e.g. a cost increase can be followed by a margin target and a
+    rounding rule. Afterwards the margin columns of the changed retails, or of
+    both retails when the cost changed, are recomputed with one more UPDATE
+    each. Everything runs in one transaction, rolled back for a dry run.
+
+    Args:
+        queryset (QuerySet): The details to reprice, see `get_reprice_queryset`.
+        rules (list): Dicts with a `field` and one operation.
+        recompute_margins (bool): Keep the gp pct columns in line with the new prices.
+        dry_run (bool): Report the affected rows without changing them.
+
+    Returns:
+        dict: The number of `matched` rows and the rows of every `steps` statement.
+    """
+    if not rules:
+        raise ValueError("At least one rule is required.")
+    operations = [validate_reprice_rule(rule) for rule in rules]
+
+    steps = []
+    with transaction.atomic():
+        matched = queryset.count()
+        changed = set()
+        for rule, operation in zip(rules, operations):
+            field = rule["field"]
+            if operation == "target_gp_pct":
+                # The gp pct column is set to the target as part of the same statement.
+                values = {field: get_rule_expression(field, operation, rule[operation]),
+                          MARGIN_FIELDS[field]: number(rule[operation])}
+            else:
+                values = {field: get_rule_expression(field, operation, rule[operation])}
+            rows = queryset.update(updated_at=Now(), **values)
+            steps.append({"field": field, "operation": operation, "rows": rows})
+            changed.add(field)
+
+        if recompute_margins:
+            retail_fields = MARGIN_FIELDS if "net_cost" in changed else [field for field in MARGIN_FIELDS
+                                                                         if field in changed]
+            for retail_field in retail_fields:
+                margin_field = MARGIN_FIELDS[retail_field]
+                rows = queryset.filter(GreaterThan(as_number(retail_field), 0)).update(
+                    **{margin_field: get_margin_expression(retail_field)}
+                )
+                steps.append({"field": margin_field, "operation": "recompute", "rows": rows})
+
+        if dry_run:
+            transaction.set_rollback(True)
+        else:
+            scope = set(queryset.values_list("location_id", "product_id").distinct())
+            price_details_changed.send(sender=PriceListDetail, location_ids={location_id for location_id, _ in scope},
+                                       product_ids={product_id for _, product_id in scope}, details=queryset)
+    return {"matched": matched, "steps": steps, "dry_run": dry_run}
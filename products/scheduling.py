@@ -0,0 +1,132 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from outbox.events import record_events
+from outbox.models import OutboxEvent
+from products.models import PriceList, PriceListDetail, PriceScheduleRun
+from products.signals import price_details_changed
+
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_BATCH_SIZE = 1000
+
+
+def get_status_transitions(model, day):
+    """
+    Return `(status, condition)` pairs giving the dated entries of `model` their status on `day`.
+
+    Each condition only matches entries that do not have their status yet, so
+    applying the transitions again changes nothing.
+    """
+    started = Q(effective_start_date__isnull=True) | Q(effective_start_date__lte=day)
+    ended = Q(effective_end_date__lt=day)
+    return (
+        (model.SCHEDULED, Q(status__in=[model.ACTIVE, model.EXPIRED]) & ~started),
+        (model.ACTIVE, Q(status__in=[model.SCHEDULED, model.EXPIRED]) & started & ~ended),
+        (model.EXPIRED, Q(status__in=[model.SCHEDULED, model.ACTIVE]) & started & ended),
+    )
+
+
+def get_dated_status(model, status, effective_start_date=None, effective_end_date=None, day=None):
+    """
+    Return the status an entry of `model` written with `status` and these effective dates gets.
+
+    Inactive is kept as given; any dated status is replaced by the one the
+    dates give on `day`, the one the price schedule would set.
+
+    Raises:
+        ValueError: If `status` is not a status of `model`.
+    """
+    statuses = [choice for choice, _ in model.STATUS_CHOICES]
+    if status not in statuses:
+        raise ValueError(f"status value must be one of {', '.join(statuses)}.")
+    if status == model.INACTIVE:
+        return status
+    day = day or timezone.localdate()
+    start, end = (parse_date(value) if isinstance(value, str) else value
+                  for value in (effective_start_date, effective_end_date))
+    if start is not None and start > day:
+        return model.SCHEDULED
+    if end is not None and end < day:
+        return model.EXPIRED
+    return model.ACTIVE
+
+
+def get_changed_details(model, ids):
+    """
+    Return the details whose devices must hear about a status change of `ids`.
+    """
+    if model is PriceList:
+        return PriceListDetail.objects.filter(price_list_id__in=ids)
+    return PriceListDetail.objects.filter(id__in=ids)
+
+
+def apply_status_transition(model, status, condition, batch_size=SCHEDULE_BATCH_SIZE):
+    """
+    Set `status` on the entries of `model` matching `condition`, one batch of ids per transaction.
+
+    Every committed batch is done for good: a run that stops half-way is
+    finished by the next one.
+
+    Returns:
+        int: The number of entries changed.
+    """
+    queryset = model.objects.order_by().filter(condition)
+    changed = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return changed
+        with transaction.atomic():
+            # The condition is checked again in case an entry changed since it was read.
+            rows = queryset.filter(id__in=ids).update(status=status, updated_at=timezone.now())
+            # Only the label changes, the dates already decide which prices are in effect;
+            # the change feed still tells the devices.
+            price_details_changed.send(sender=model, location_ids=set(), product_ids=set(),
+                                       details=get_changed_details(model, ids))
+            if model is PriceList:
+                record_events(model.objects.filter(id__in=ids, status=status), OutboxEvent.UPSERT)
+        changed += rows
+        last_id = ids[-1]
+
+
+def run_price_schedule(day=None, batch_size=SCHEDULE_BATCH_SIZE, record_empty=True):
+    """
+    Schedule, activate and expire the price lists and details whose effective dates passed.
+
+    Lists and details set to inactive by hand are left alone. The run and the
+    number of entries it moved to each status are recorded in a `PriceScheduleRun`.
+
+    Args:
+        day (date): The day the statuses must be right for, today by default.
+        batch_size (int): Entries updated per transaction.
+        record_empty (bool): Record the run even when it changed nothing.
+
+    Returns:
+        PriceScheduleRun: The run, unsaved when it changed nothing and `record_empty` is False.
+    """
+    run = PriceScheduleRun(day=day or timezone.localdate(), started_at=timezone.now())
+    try:
+        for model, key in ((PriceList, "price_list"), (PriceListDetail, "price_list_detail")):
+            for status, condition in get_status_transitions(model, run.day):
+                changed = apply_status_transition(model, status, condition, batch_size)
+                if changed:
+                    run.changes.setdefault(key, {})[status] = changed
+                    logger.info("Price schedule %s: %s %s set to %s", run.day, changed, key, status)
+    except Exception as exc:
+        run.status = PriceScheduleRun.FAILED
+        run.message = str(exc)
+        run.finished_at = timezone.now()
+        run.save()
+        raise
+    run.status = PriceScheduleRun.COMPLETED
+    run.finished_at = timezone.now()
+    if run.changes or record_empty:
+        run.save()
+    return run
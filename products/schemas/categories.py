@@ -4,7 +4,8 @@ from graphene_django import DjangoObjectType
 from django.db.models import Q
 from graphene import relay
 import graphene
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import delete_instance, get_integer_id, CountedConnection, CountedConnectionField
+from utils.planner import optimize_queryset
 from graphql import GraphQLError
 from django.db import connections
 
@@ -49,21 +50,21 @@ class Query(graphene.ObjectType):
     """
     Query class for GraphQL.
     """
-    categories = DjangoFilterConnectionField(CategoryType)
+    categories = CountedConnectionField(CategoryType)
     category = graphene.Field(CategoryType, id=graphene.String())
     
     def resolve_categories(self, info, **kwargs):
         """
         Resolve categories query.
         """
-        return Category.objects.all()
+        return optimize_queryset(Category.objects.all(), info)
     
     def resolve_category(self, info, id):
         """
         Resolve category query.
         """
         numeric_id = get_integer_id(id)
-        return Category.objects.get(id=numeric_id)
+        return optimize_queryset(Category.objects.all(), info).get(id=numeric_id)
 
 
 class CreateCategory(graphene.Mutation):
@@ -140,7 +141,7 @@ class DeleteCategory(graphene.Mutation):
         """
         numeric_id = get_integer_id(id)
         category_instance = Category.objects.get(id=numeric_id)
-        category_instance.delete()
+        delete_instance(category_instance)
         return DeleteCategory(success=True)
 
 
@@ -6,7 +6,8 @@ from graphene import relay
 from graphql import GraphQLError
 import graphene
 from django.db import connections
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import delete_instance, get_integer_id, CountedConnection, CountedConnectionField
+from utils.planner import optimize_queryset
 
 from products.models import Country
 
@@ -48,21 +49,21 @@ class Query(graphene.ObjectType):
     """
     Query class for GraphQL.
     """
-    countries = DjangoFilterConnectionField(CountryType)
+    countries = CountedConnectionField(CountryType)
     country = graphene.Field(CountryType, id=graphene.String())
     
     def resolve_countries(self, info, *args, **kwargs):
         """
         Resolve countries query.
         """
-        return Country.objects.all()
+        return optimize_queryset(Country.objects.all(), info)
     
     def resolve_country(self, info, id):
         """
         Resolve country query.
         """
         numeric_id = get_integer_id(id)
-        return Country.objects.get(id=numeric_id)
+        return optimize_queryset(Country.objects.all(), info).get(id=numeric_id)
 
 
 class CreateCountry(graphene.Mutation):
@@ -129,7 +130,7 @@ class DeleteCountry(graphene.Mutation):
         """
         numeric_id = get_integer_id(id)
         country_instance = Country.objects.get(id=numeric_id)
-        country_instance.delete()
+        delete_instance(country_instance)
         return DeleteCountry(success=True)
 
 
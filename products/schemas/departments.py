@@ -5,7 +5,9 @@ from django.db.models import Q
 from graphene import relay
 from django.db import connections
 import graphene
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import delete_instance, get_integer_id, CountedConnection, CountedConnectionField
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 
 from graphql import GraphQLError
 from products.models import Department
@@ -53,11 +55,11 @@ class DepartmentType(DjangoObjectType):
         filterset_class = DepartmentFilterSet
         connection_class = CountedConnection
     
-    def resolve_parent_department_details(self, infp):
+    def resolve_parent_department_details(self, info):
         """
         Resolve parent department details.
         """
-        return self.parent_department
+        return load_related(info, self, "parent_department")
 
 
 class Query(graphene.ObjectType):
@@ -65,20 +67,20 @@ class Query(graphene.ObjectType):
     Query class for GraphQL.
     """
     department = graphene.Field(DepartmentType, id = graphene.String())
-    departments = DjangoFilterConnectionField(DepartmentType)
+    departments = CountedConnectionField(DepartmentType)
     
     def resolve_departments(self, info, **kwargs):
         """
         Resolve departments query.
         """
-        return Department.objects.all()
+        return optimize_queryset(Department.objects.all(), info)
     
     def resolve_department(self, info, id):
         """
         Resolve department query.
         """
         numeric_id = get_integer_id(id)
-        return Department.objects.get(id = numeric_id)
+        return optimize_queryset(Department.objects.all(), info).get(id = numeric_id)
 
 
 class CreateDepartment(graphene.Mutation):
@@ -153,7 +155,7 @@ class DeleteDepartment(graphene.Mutation):
         """
         numeric_id = get_integer_id(id)
         department = Department.objects.get(id=numeric_id)
-        department.delete()
+        delete_instance(department)
         return DeleteDepartment(success=True)
 
 
@@ -0,0 +1,126 @@
+from django.utils import timezone
+import graphene
+from graphql import GraphQLError
+from graphql_relay import to_global_id
+from utils.funct import get_integer_id
+from utils.planner import get_selected_fields, plan_selection
+from products.current_prices import get_current_prices
+from products.models import PriceListDetail
+from products.price_book import lookup_prices_by_upc
+from products.pricing import EffectivePrice, resolve_effective_prices
+from products.schemas.price_list_details import PriceListDetailType
+
+
+PRICE_READ_ROLES = ["admin", "store_manager", "location_manager", "staff"]
+
+
+def load_price_list_details(info, prices):
+    """
+    Attach the details of `prices` with one query when the client selects `priceListDetail`.
+
+    Prices read from the current prices or a price book only carry the id of
+    their detail.
+    """
+    selection_sets = [field.selection_set for node in info.field_nodes
+                      for field in get_selected_fields(info, node.selection_set)
+                      if field.name.value == "priceListDetail"]
+    missing = {price.price_list_detail_id for price in prices
+               if price is not None and price.price_list_detail is None and price.price_list_detail_id is not None}
+    if not selection_sets or not missing:
+        return prices
+    queryset = plan_selection(info, PriceListDetailType, PriceListDetail, selection_sets).apply(
+        PriceListDetail.objects.order_by()
+    )
+    details = queryset.in_bulk(missing)
+    for price in prices:
+        if price is not None and price.price_list_detail is None:
+            price.price_list_detail = details.get(price.price_list_detail_id)
+    return prices
+
+
+class EffectivePriceType(graphene.ObjectType):
+    """
+    ObjectType for the price of a product at a location on a day.
+    """
+    product_id = graphene.ID()
+    location_id = graphene.ID()
+    date = graphene.Date()
+    upc = graphene.String()
+    price = graphene.Decimal(description="The store retail in effect.")
+    base_retail = graphene.Decimal()
+    net_cost = graphene.Float()
+    effective_start_date = graphene.Date(description="First day of this price, null when open.")
+    effective_end_date = graphene.Date(description="Last day of this price, null when open.")
+    price_list_detail = graphene.Field(PriceListDetailType)
+
+    def resolve_product_id(self, info):
+        return to_global_id("ProductType", self.product_id)
+
+    def resolve_location_id(self, info):
+        return to_global_id("LocationType", self.location_id)
+
+    def resolve_price_list_detail(self, info):
+        return self.price_list_detail
+
+
+class Query(graphene.ObjectType):
+    """
+    Query class for GraphQL queries resolving the prices in effect.
+    """
+    effective_price = graphene.Field(EffectivePriceType, product_id=graphene.String(required=True),
+                                     location_id=graphene.String(required=True), date=graphene.Date())
+    effective_prices = graphene.List(EffectivePriceType,
+                                     product_ids=graphene.List(graphene.NonNull(graphene.String), required=True),
+                                     location_id=graphene.String(required=True), date=graphene.Date())
+    price_by_upc = graphene.Field(EffectivePriceType, upc=graphene.String(required=True),
+                                  location_id=graphene.String(required=True), date=graphene.Date())
+    prices_by_upc = graphene.List(EffectivePriceType,
+                                  upcs=graphene.List(graphene.NonNull(graphene.String), required=True),
+                                  location_id=graphene.String(required=True), date=graphene.Date())
+
+    def resolve_effective_price(self, info, product_id, location_id, date=None):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
+        product_id = get_integer_id(product_id)
+        if date is None:
+            effective_price = get_current_prices(get_integer_id(location_id), [product_id])[product_id]
+        else:
+            effective_price = resolve_effective_prices(get_integer_id(location_id), [product_id], date)[product_id]
+            if effective_price.price is None:
+                effective_price = None
+        return load_price_list_details(info, [effective_price])[0]
+
+    def resolve_effective_prices(self, info, product_ids, location_id, date=None):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
+        product_ids = [get_integer_id(product_id) for product_id in product_ids]
+        location_id = get_integer_id(location_id)
+        if date is None:
+            prices = get_current_prices(location_id, product_ids)
+            # Products without a price today are still listed.
+            prices = {product_id: prices[product_id] or EffectivePrice(product_id, location_id, timezone.localdate())
+                      for product_id in prices}
+        else:
+            prices = resolve_effective_prices(location_id, product_ids, date)
+        # One entry per requested product, in the requested order.
+        return load_price_list_details(info, [prices[product_id] for product_id in product_ids])
+
+    def resolve_price_by_upc(self, info, upc, location_id, date=None):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
+        prices = lookup_prices_by_upc(get_integer_id(location_id), [upc], date or timezone.localdate())
+        return load_price_list_details(info, prices)[0]
+
+    def resolve_prices_by_upc(self, info, upcs, location_id, date=None):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
+        # One entry per requested UPC, null when it has no price.
+        prices = lookup_prices_by_upc(get_integer_id(location_id), upcs, date or timezone.localdate())
+        return load_price_list_details(info, prices)
+
+
+effective_prices_schema = graphene.Schema(query=Query)
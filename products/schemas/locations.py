@@ -7,7 +7,9 @@ from graphene import relay
 import graphene
 from graphql import GraphQLError
 from accounts.models import User
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import get_integer_id, CountedConnection, CountedConnectionField
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 
 from products.models import Country, State
 from products.models import Location
@@ -52,27 +54,27 @@ class LocationType(DjangoObjectType):
         connection_class = CountedConnection
     
     def resolve_state_details(self, info):
-        return self.state
+        return load_related(info, self, "state")
     
     def resolve_country_details(self, info):
-        return self.country
+        return load_related(info, self, "country")
     
     def resolve_location_manager_details(self, info):
-        return self.location_manager
+        return load_related(info, self, "location_manager")
 
 class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to locations.
     """
-    locations = DjangoFilterConnectionField(LocationType)
+    locations = CountedConnectionField(LocationType)
     location = graphene.Field(LocationType, id=graphene.String())
     
     def resolve_locations(self, info, *args, **kwargs):
-        return Location.objects.all()
+        return optimize_queryset(Location.objects.all(), info)
     
     def resolve_location(self, info, id):
         numeric_id = get_integer_id(id)
-        return Location.objects.get(id = numeric_id)
+        return optimize_queryset(Location.objects.all(), info).get(id = numeric_id)
     
 
 class CreateLocation(graphene.Mutation):
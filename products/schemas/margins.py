@@ -0,0 +1,79 @@
+import graphene
+from graphql import GraphQLError
+from graphql_relay import to_global_id
+from utils.funct import get_integer_id
+from products.margins import get_margin_summary
+from products.schemas.effective_prices import PRICE_READ_ROLES
+
+
+class MarginFilterInput(graphene.InputObjectType):
+    """
+    InputObjectType narrowing the price list details of a margin summary.
+    """
+    price_list_id = graphene.String(description="Read the details, the rollups add up every price list.")
+    location_id = graphene.String()
+    vendor_id = graphene.String()
+    department_id = graphene.String()
+    category_id = graphene.String()
+
+
+class MarginGroupType(graphene.ObjectType):
+    """
+    ObjectType for the margin totals of a group of price list details.
+    """
+    location_id = graphene.ID()
+    vendor_id = graphene.ID()
+    department_id = graphene.ID()
+    category_id = graphene.ID()
+    rows = graphene.Int()
+    revenue = graphene.Float(description="Store retail times store movement.")
+    cost = graphene.Float(description="Net cost times store movement.")
+    gross_profit = graphene.Float()
+    gp_pct = graphene.Float(description="Gross profit over revenue.")
+    avg_store_gp_pct = graphene.Float()
+    avg_base_gp_pct = graphene.Float()
+    min_store_gp_pct = graphene.Float()
+    max_store_gp_pct = graphene.Float()
+
+    def resolve_location_id(self, info):
+        return to_global_id("LocationType", self.location_id) if self.location_id else None
+
+    def resolve_vendor_id(self, info):
+        return to_global_id("VendorType", self.vendor_id) if self.vendor_id else None
+
+    def resolve_department_id(self, info):
+        return to_global_id("DepartmentType", self.department_id) if self.department_id else None
+
+    def resolve_category_id(self, info):
+        return to_global_id("CategoryType", self.category_id) if self.category_id else None
+
+
+class MarginSummaryType(graphene.ObjectType):
+    """
+    ObjectType for the margins of price list details grouped by some dimensions.
+    """
+    from_rollups = graphene.Boolean(description="Read from the pre-aggregated rollups instead of the details.")
+    groups = graphene.List(MarginGroupType)
+
+
+class Query(graphene.ObjectType):
+    """
+    Query class for GraphQL queries summarizing margins.
+    """
+    margin_summary = graphene.Field(
+        MarginSummaryType,
+        group_by=graphene.List(graphene.NonNull(graphene.String),
+                               description="location, vendor, department and/or category."),
+        filters=MarginFilterInput(),
+    )
+
+    def resolve_margin_summary(self, info, group_by=None, filters=None):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
+        filters = {name: get_integer_id(value) for name, value in (filters or {}).items() if value}
+        groups, from_rollups = get_margin_summary(group_by or (), filters)
+        return MarginSummaryType(from_rollups=from_rollups, groups=groups)
+
+
+margins_schema = graphene.Schema(query=Query)
@@ -1,17 +1,29 @@
 from django_filters import FilterSet, CharFilter, BooleanFilter
 from graphene_django.filter import DjangoFilterConnectionField
 from graphene_django import DjangoObjectType
-from django.db import connections
+from django.db import connections, transaction
 from django.db.models import Q
 from graphene import relay
 import graphene
 from graphql import GraphQLError
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import get_integer_id, CountedConnection, CountedConnectionField
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 from products.models import PriceList, PriceListDetail, Location
 from products.models import Vendor, UnitOfMeasure, Product
 from products.schemas.locations import LocationType
 from products.schemas.vendors import VendorType
 from products.schemas.price_list_details import PriceListDetailType
+from products.price_lists import PriceDetailError, bulk_create_price_details, validate_price_details
+from products.price_windows import find_price_window_conflicts
+from products.repricing import get_reprice_queryset, reprice_price_details
+from products.scheduling import get_dated_status
+from products.signals import price_details_changed
+from products.utils import get_price_list_scope
+from jobs.registry import enqueue
+from outbox.events import record_events
+from outbox.models import OutboxEvent
+from jobs.schemas.jobs import JobType
 
 
 class PriceListFilterSet(FilterSet):
@@ -23,6 +35,8 @@ class PriceListFilterSet(FilterSet):
         fields = {
             'name': ['exact', "icontains"],
             'description': ['exact', "icontains"],
+            'vendor__vendor_no': ['exact'],
+            'vendor__name': ['exact', "icontains"],
         }
     
     search = CharFilter(method='search_filter')
@@ -50,33 +64,33 @@ class PriceListType(DjangoObjectType):
         connection_class = CountedConnection
     
     def resolve_price_list_details(self, info):
-        return PriceListDetail.objects.filter(price_list_id = self.id)
+        return self.price_list_details.all()
     
     def resolve_location_details(self, info):
-            return self.location
+        return load_related(info, self, "location")
     
     def resolve_vendor_details(self, info):
-        return self.vendor
+        return load_related(info, self, "vendor")
     
 class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to price lists.
     """
-    price_lists = DjangoFilterConnectionField(PriceListType)
+    price_lists = CountedConnectionField(PriceListType)
     price_list = graphene.Field(PriceListType, id=graphene.String())
 
     def resolve_price_lists(self, info, **kwargs):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager", "staff"]:
             raise GraphQLError("You don't have permission to read Price Lists.", extensions={'code': 403})
-        return PriceList.objects.all()
+        return optimize_queryset(PriceList.objects.all(), info)
 
     def resolve_price_list(self, info, id):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager", "staff"]:
             raise GraphQLError("You don't have permission to read Price List.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
-        return PriceList.objects.get(pk=numeric_id)
+        return optimize_queryset(PriceList.objects.all(), info).get(pk=numeric_id)
     
 
 class PriceDetailInput(graphene.InputObjectType):
@@ -95,12 +109,12 @@ class PriceDetailInput(graphene.InputObjectType):
     pack = graphene.String(required=True)
     size = graphene.String(required=True)
     net_cost = graphene.Float(required=True)
-    base_retail = graphene.String(required=True)
-    store_retail = graphene.String(required=True)
-    base_gp_pct = graphene.String(required=True)
-    store_gp_pct = graphene.String(required=True)
-    vendor_movement = graphene.String(required=True)
-    store_movement = graphene.String(required=True)
+    base_retail = graphene.Decimal(required=True)
+    store_retail = graphene.Decimal(required=True)
+    base_gp_pct = graphene.Decimal(required=True)
+    store_gp_pct = graphene.Decimal(required=True)
+    vendor_movement = graphene.Int(required=True)
+    store_movement = graphene.Int(required=True)
     name = graphene.String(required=True)
     description = graphene.String(required=True)
     status = graphene.String(required=True)
@@ -108,6 +122,16 @@ class PriceDetailInput(graphene.InputObjectType):
     effective_end_date = graphene.Date()
 
 
+class PriceDetailErrorType(graphene.ObjectType):
+    """
+    ObjectType for a problem found in one row of a price list.
+    """
+    row = graphene.Int()
+    field = graphene.String()
+    value = graphene.String()
+    message = graphene.String()
+
+
 class CreatePriceList(graphene.Mutation):
     """
     Mutation class to create a new PriceList.
@@ -118,70 +142,63 @@ class CreatePriceList(graphene.Mutation):
         name = graphene.String(required=True)
         description = graphene.String()
         status = graphene.String(required=True)
+        effective_start_date = graphene.Date()
+        effective_end_date = graphene.Date()
         price_list_details = graphene.List(PriceDetailInput, required=True)
+        background = graphene.Boolean(description="Create the price list in a background job and return the job.")
         
 
     price_list = graphene.Field(PriceListType)
+    errors = graphene.List(PriceDetailErrorType)
+    job = graphene.Field(JobType)
 
     def mutate(self, info, location_id, vendor_id,  name, status, price_list_details, description=None, effective_start_date=None, 
-               effective_end_date=None):
+               effective_end_date=None, background=False):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager"]:
             raise GraphQLError("You don't have permission to create Price List.", extensions={'code': 403})
-        if status not in ["active", "inactive"]:
-            raise ValueError("status value must be active or inactive.")
+        status = get_dated_status(PriceList, status, effective_start_date, effective_end_date)
         
         if not Vendor.objects.filter(id = get_integer_id(vendor_id)).exists():
             raise ValueError(f"Vendor not found. with this id {vendor_id}")
         if not Location.objects.filter(id = get_integer_id(location_id)).exists():
             raise ValueError(f"Location not found. with this id {location_id}")
-        for price_list_detail in price_list_details:
-            if not Vendor.objects.filter(id = get_integer_id(price_list_detail.get("vendor_id"))).exists():
-                raise ValueError(f"Vendor not found. with this id {price_list_detail.get("vendor_id")}")
-            if not Location.objects.filter(id = get_integer_id(price_list_detail.get("location_id"))).exists():
-                raise ValueError(f"Location not found. with this id {price_list_detail.get("location_id")}")
-            if not Product.objects.filter(id = get_integer_id(price_list_detail.get("product_id"))).exists():
-                raise ValueError(f"Product not found. with this id {price_list_detail.get("product_id")}")
-            if not UnitOfMeasure.objects.filter(id = get_integer_id(price_list_detail.get("uom_id"))).exists():
-                raise ValueError(f"Unit Of Measure not found. with this id {price_list_detail.get("uom_id")}")
-            
-        price_list_instance = PriceList.objects.create(
-                                    vendor_id = get_integer_id(vendor_id),
-                                    location_id = get_integer_id(location_id),
-                                    name = name,
-                                    description = description,
-                                    status = status,
-                                    effective_start_date = effective_start_date,
-                                    effective_end_date = effective_end_date
-                                )
-        for price_list_detail in price_list_details:
-            price_list_details = PriceListDetail.objects.create(
-                price_list_id = price_list_instance.id, 
-                product_id = get_integer_id(price_list_detail.get("product_id")), 
-                uom_id = get_integer_id(price_list_detail.get("uom_id")), 
-                vendor_id = get_integer_id(price_list_detail.get("vendor_id")),
-                location_id = get_integer_id(price_list_detail.get("location_id")), 
-                upc = price_list_detail.get("upc"), 
-                item_number = price_list_detail.get("item_number"), 
-                pricing_method = price_list_detail.get("pricing_method"), 
-                quantity = price_list_detail.get("quantity"), 
-                case_qty = price_list_detail.get("case_qty"), 
-                pack = price_list_detail.get("pack"), 
-                size = price_list_detail.get("size"), 
-                net_cost = price_list_detail.get("net_cost"), 
-                base_retail = price_list_detail.get("base_retail"), 
-                store_retail = price_list_detail.get("store_retail"), 
-                base_gp_pct = price_list_detail.get("base_gp_pct"),  
-                store_gp_pct = price_list_detail.get("store_gp_pct"), 
-                vendor_movement = price_list_detail.get("vendor_movement"), 
-                store_movement = price_list_detail.get("store_movement"), 
-                name = price_list_detail.get("name"),
-                description = price_list_detail.get("description"), 
-                status = price_list_detail.get("status"), 
-                effective_start_date = price_list_detail.get("effective_start_date"), 
-                effective_end_date = price_list_detail.get("effective_end_date")
-            )
-        return CreatePriceList(price_list=price_list_instance)
+
+        rows, errors = validate_price_details(price_list_details)
+        if not errors:
+            errors = [PriceDetailError(row["row"], "effective_start_date", str(row["effective_start_date"] or ""), message)
+                      for row, message in find_price_window_conflicts(rows, None, effective_start_date,
+                                                                      effective_end_date)]
+        if errors:
+            return CreatePriceList(price_list=None, errors=errors)
+
+        if background:
+            job = enqueue("products.create_price_list", {
+                "price_list": {
+                    "vendor_id": get_integer_id(vendor_id),
+                    "location_id": get_integer_id(location_id),
+                    "name": name,
+                    "description": description,
+                    "status": status,
+                    "effective_start_date": effective_start_date,
+                    "effective_end_date": effective_end_date,
+                },
+                "rows": rows,
+            }, user=user, max_attempts=3)
+            return CreatePriceList(price_list=None, errors=[], job=job)
+
+        with transaction.atomic():
+            price_list_instance = PriceList.objects.create(
+                                        vendor_id = get_integer_id(vendor_id),
+                                        location_id = get_integer_id(location_id),
+                                        name = name,
+                                        description = description,
+                                        status = status,
+                                        effective_start_date = effective_start_date,
+                                        effective_end_date = effective_end_date
+                                    )
+            bulk_create_price_details(price_list_instance.id, rows)
+        return CreatePriceList(price_list=price_list_instance, errors=[])
 
 class UpdatePriceList(graphene.Mutation):
     """
@@ -214,14 +231,13 @@ class UpdatePriceList(graphene.Mutation):
             price_list.name = name
         if description:
             price_list.description = description
-        if status:
-            if status not in ["active", "inactive"]:
-                raise ValueError("status value must be active or inactive.")
-            price_list.status = status
         if effective_start_date:
             price_list.effective_start_date = effective_start_date
         if effective_end_date:
             price_list.effective_end_date = effective_end_date
+        if status or effective_start_date or effective_end_date:
+            price_list.status = get_dated_status(PriceList, status or price_list.status,
+                                                 price_list.effective_start_date, price_list.effective_end_date)
         price_list.save()
         return UpdatePriceList(price_list=price_list)
 
@@ -232,19 +248,84 @@ class DeletePriceList(graphene.Mutation):
     """
     class Arguments:
         id = graphene.String(required=True)
+        background = graphene.Boolean(description="Delete the price list in a background job and return the job.")
 
     success = graphene.Boolean()
+    job = graphene.Field(JobType)
 
-    def mutate(self, info, id):
+    def mutate(self, info, id, background=False):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager"]:
             raise GraphQLError("You don't have permission to delete Price List.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
         price_list = PriceList.objects.get(id=numeric_id)
+        if background:
+            # Hide the list right away, the job removes it with its details.
+            PriceList.objects.filter(id=price_list.id).update(status=PriceList.INACTIVE)
+            record_events(PriceList.objects.filter(id=price_list.id), OutboxEvent.UPSERT)
+            location_ids, product_ids = get_price_list_scope(price_list)
+            price_details_changed.send(sender=PriceList, location_ids=location_ids, product_ids=product_ids,
+                                       details=PriceListDetail.objects.filter(price_list_id=price_list.id))
+            job = enqueue("products.delete_price_list", {"price_list_id": price_list.id}, user=user)
+            return DeletePriceList(success=True, job=job)
         price_list.delete()
         return DeletePriceList(success=True)
 
 
+class RepriceRuleInput(graphene.InputObjectType):
+    """
+    InputObjectType for one repricing rule: a field and exactly one operation.
+    """
+    field = graphene.String(required=True, description="net_cost, base_retail or store_retail.")
+    percent = graphene.Float(description="Change by this percentage, e.g. 3 for +3%.")
+    amount = graphene.Float(description="Add this amount.")
+    target_gp_pct = graphene.Float(description="Set the retail that yields this gross margin on the net cost.")
+    round_to = graphene.Float(description="Round up to the next price ending in these cents, e.g. 0.99.")
+
+
+class RepriceStepType(graphene.ObjectType):
+    """
+    ObjectType for one UPDATE statement run by a repricing.
+    """
+    field = graphene.String()
+    operation = graphene.String()
+    rows = graphene.Int()
+
+
+class RepricePriceList(graphene.Mutation):
+    """
+    Mutation class to reprice every price list detail in a scope with set-based updates.
+    """
+    class Arguments:
+        rules = graphene.List(graphene.NonNull(RepriceRuleInput), required=True)
+        price_list_id = graphene.String()
+        location_id = graphene.String()
+        vendor_id = graphene.String()
+        department_id = graphene.String()
+        category_id = graphene.String()
+        recompute_margins = graphene.Boolean(default_value=True)
+        dry_run = graphene.Boolean(default_value=False)
+
+    matched = graphene.Int()
+    steps = graphene.List(RepriceStepType)
+    dry_run = graphene.Boolean()
+
+    def mutate(self, info, rules, recompute_margins=True, dry_run=False, **scope):
+        user = info.context.user
+        if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager"]:
+            raise GraphQLError("You don't have permission to update Price List.", extensions={'code': 403})
+        if not scope:
+            raise ValueError("A price list, location, vendor, department or category is required.")
+        queryset = get_reprice_queryset(**{name: get_integer_id(value) for name, value in scope.items()})
+        summary = reprice_price_details(queryset, [dict(rule) for rule in rules],
+                                        recompute_margins=recompute_margins, dry_run=dry_run)
+        return RepricePriceList(
+            matched=summary["matched"],
+            steps=[RepriceStepType(**step) for step in summary["steps"]],
+            dry_run=summary["dry_run"],
+        )
+
+
 class Mutation(graphene.ObjectType):
     """
     Mutation class for GraphQL mutations related to price lists.
@@ -252,6 +333,7 @@ class Mutation(graphene.ObjectType):
     create_price_list = CreatePriceList.Field()
     update_price_list = UpdatePriceList.Field()
     delete_price_list = DeletePriceList.Field()
+    reprice_price_list = RepricePriceList.Field()
 
 
 price_list_schema = graphene.Schema(query=Query, mutation=Mutation)
\ No newline at end of file
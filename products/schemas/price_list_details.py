@@ -7,13 +7,18 @@ from graphene import relay
 import graphene
 from graphql import GraphQLError
 
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import get_integer_id, CountedConnection, CountedConnectionField, KeysetConnection
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 from products.models import PriceList, Location, PriceListDetail
 from products.models import Vendor, UnitOfMeasure, Product
 from products.schemas.unit_of_measure import UnitOfMeasureType
 from products.schemas.products import ProductType
 from products.schemas.locations import LocationType
 from products.schemas.vendors import VendorType
+from products.price_windows import find_price_window_conflicts
+from products.scheduling import get_dated_status
+from products.signals import price_details_changed, price_details_deleting
 
 
 class PriceListDetailFilterSet(FilterSet):
@@ -25,6 +30,16 @@ class PriceListDetailFilterSet(FilterSet):
         fields = {
             'name': ['exact', "icontains"],
             'description': ['exact', "icontains"],
+            'net_cost': ['exact', 'lt', 'lte', 'gt', 'gte'],
+            'base_retail': ['exact', 'lt', 'lte', 'gt', 'gte'],
+            'store_retail': ['exact', 'lt', 'lte', 'gt', 'gte'],
+            'base_gp_pct': ['exact', 'lt', 'lte', 'gt', 'gte'],
+            'store_gp_pct': ['exact', 'lt', 'lte', 'gt', 'gte'],
+            'vendor_movement': ['exact', 'lt', 'lte', 'gt', 'gte'],
+            'store_movement': ['exact', 'lt', 'lte', 'gt', 'gte'],
+            'product__upc': ['exact'],
+            'vendor__vendor_no': ['exact'],
+            'uom__code': ['exact'],
         }
     
     search = CharFilter(method='search_filter')
@@ -51,10 +66,10 @@ class PriceListInnerType(DjangoObjectType):
     
     
     def resolve_location_details(self, info):
-        return self.location
+        return load_related(info, self, "location")
     
     def resolve_vendor_details(self, info):
-        return self.vendor
+        return load_related(info, self, "vendor")
 
 class PriceListDetailType(DjangoObjectType):
     """
@@ -66,6 +81,8 @@ class PriceListDetailType(DjangoObjectType):
     product_details = graphene.Field(ProductType)
     price_lists = graphene.Field(PriceListInnerType)
 
+    optimizer_hints = {"price_lists": "price_list"}
+
     class Meta:
         model = PriceListDetail
         fields = ("id", "upc", "item_number", "pricing_method", "status", "description", "quantity", "case_qty", "pack", "size", "net_cost", 
@@ -73,42 +90,55 @@ class PriceListDetailType(DjangoObjectType):
                   "name",   "effective_start_date", "effective_end_date", "created_at", "updated_at")
         interfaces = (relay.Node,)
         filterset_class = PriceListDetailFilterSet
-        connection_class = CountedConnection
+        connection_class = KeysetConnection
 
     def resolve_price_lists(self, info):
-        return self.price_list
+        return load_related(info, self, "price_list")
     
     def resolve_location_details(self, info):
-        return self.location
+        return load_related(info, self, "location")
     
     def resolve_vendor_details(self, info):
-        return self.vendor
+        return load_related(info, self, "vendor")
     
     def resolve_uom_details(self, info):
-        return self.uom
+        return load_related(info, self, "uom")
     
     def resolve_product_details(self, info):
-        return self.product
+        return load_related(info, self, "product")
     
 class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to price list details.
     """
-    price_list_details = DjangoFilterConnectionField(PriceListDetailType)
+    price_list_details = CountedConnectionField(PriceListDetailType)
     price_list_detail = graphene.Field(PriceListDetailType, id=graphene.String())
 
     def resolve_price_list_details(self, info, **kwargs):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager", "staff"]:
             raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
-        return PriceListDetail.objects.all()
+        return optimize_queryset(PriceListDetail.objects.all(), info)
 
     def resolve_price_list_detail(self, info, id):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager", "staff"]:
             raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
-        return PriceListDetail.objects.get(pk=numeric_id)
+        return optimize_queryset(PriceListDetail.objects.all(), info).get(pk=numeric_id)
+
+def check_price_window(price_list_id, row, exclude_id=None):
+    """
+    Raise a ValueError when a detail would overlap another detail of its price list for the same product.
+    """
+    price_list = PriceList.objects.filter(id=price_list_id).values("effective_start_date", "effective_end_date").first()
+    if price_list is None:
+        return
+    conflicts = find_price_window_conflicts([row], price_list_id, price_list["effective_start_date"],
+                                            price_list["effective_end_date"], exclude_ids={exclude_id})
+    if conflicts:
+        raise ValueError(conflicts[0][1])
+
 
 class CreatePriceListDetail(graphene.Mutation):
     """
@@ -128,12 +158,12 @@ class CreatePriceListDetail(graphene.Mutation):
         pack = graphene.String(required=True)
         size = graphene.String(required=True)
         net_cost = graphene.Float(required=True)
-        base_retail = graphene.String(required=True)
-        store_retail = graphene.String(required=True)
-        base_gp_pct = graphene.String(required=True)
-        store_gp_pct = graphene.String(required=True)
-        vendor_movement = graphene.String(required=True)
-        store_movement = graphene.String(required=True)
+        base_retail = graphene.Decimal(required=True)
+        store_retail = graphene.Decimal(required=True)
+        base_gp_pct = graphene.Decimal(required=True)
+        store_gp_pct = graphene.Decimal(required=True)
+        vendor_movement = graphene.Int(required=True)
+        store_movement = graphene.Int(required=True)
         name = graphene.String(required=True)
         description = graphene.String(required=True)
         status = graphene.String(required=True)
@@ -148,6 +178,11 @@ class CreatePriceListDetail(graphene.Mutation):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "store_manager", "location_manager"]:
             raise GraphQLError("You don't have permission to create Price details.", extensions={'code': 403})
+        status = get_dated_status(PriceListDetail, status, effective_start_date, effective_end_date)
+        check_price_window(get_integer_id(price_list_id), {
+            "location_id": get_integer_id(location_id), "product_id": get_integer_id(product_id), "status": status,
+            "effective_start_date": effective_start_date, "effective_end_date": effective_end_date,
+        })
         price_list_details = PriceListDetail.objects.create(
             price_list_id = get_integer_id(price_list_id), product_id = get_integer_id(product_id), uom_id = get_integer_id(uom_id), vendor_id = get_integer_id(vendor_id),
             location_id = get_integer_id(location_id), upc = upc, item_number = item_number, pricing_method = pricing_method, quantity = quantity, 
@@ -177,12 +212,12 @@ class UpdatePriceListDetail(graphene.Mutation):
         pack = graphene.String()
         size = graphene.String()
         net_cost = graphene.Float()
-        base_retail = graphene.String()
-        store_retail = graphene.String()
-        base_gp_pct = graphene.String()
-        store_gp_pct = graphene.String()
-        vendor_movement = graphene.String()
-        store_movement = graphene.String()
+        base_retail = graphene.Decimal()
+        store_retail = graphene.Decimal()
+        base_gp_pct = graphene.Decimal()
+        store_gp_pct = graphene.Decimal()
+        vendor_movement = graphene.Int()
+        store_movement = graphene.Int()
         name = graphene.String()
         description = graphene.String()
         status = graphene.String()
@@ -224,30 +259,37 @@ class UpdatePriceListDetail(graphene.Mutation):
             price_list_details.pack = pack 
         if size:
             price_list_details.size = size 
-        if net_cost:
+        if net_cost is not None:
             price_list_details.net_cost = net_cost 
-        if base_retail:
+        if base_retail is not None:
             price_list_details.base_retail = base_retail 
-        if store_retail:
-            price_list_details.base_gp_pct = base_gp_pct 
-        if base_gp_pct:
+        if store_retail is not None:
             price_list_details.store_retail = store_retail 
-        if store_gp_pct:
+        if base_gp_pct is not None:
+            price_list_details.base_gp_pct = base_gp_pct 
+        if store_gp_pct is not None:
             price_list_details.store_gp_pct = store_gp_pct 
-        if vendor_movement:
+        if vendor_movement is not None:
             price_list_details.vendor_movement = vendor_movement 
-        if store_movement:
+        if store_movement is not None:
             price_list_details.store_movement = store_movement 
         if name is not None:
             price_list_details.name = name 
         if description is not None:
             price_list_details.description = description 
-        if status is not None:
-            price_list_details.status = status 
         if effective_start_date is not None:
             price_list_details.effective_start_date = effective_start_date 
         if effective_end_date is not None:
             price_list_details.effective_end_date = effective_end_date 
+        if status is not None or effective_start_date is not None or effective_end_date is not None:
+            price_list_details.status = get_dated_status(PriceListDetail, status or price_list_details.status,
+                                                         price_list_details.effective_start_date,
+                                                         price_list_details.effective_end_date)
+        check_price_window(price_list_details.price_list_id, {
+            "location_id": price_list_details.location_id, "product_id": price_list_details.product_id,
+            "status": price_list_details.status, "effective_start_date": price_list_details.effective_start_date,
+            "effective_end_date": price_list_details.effective_end_date,
+        }, exclude_id=price_list_details.id)
         price_list_details.save()
         return UpdatePriceListDetail(price_list_details=price_list_details)
 
@@ -267,7 +309,10 @@ class DeletePriceListDetail(graphene.Mutation):
             raise GraphQLError("You don't have permission to delete Price details.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
         price_list = PriceListDetail.objects.get(id=numeric_id)
+        price_details_deleting.send(sender=PriceListDetail, details=PriceListDetail.objects.filter(id=price_list.id))
         price_list.delete()
+        price_details_changed.send(sender=PriceListDetail, location_ids={price_list.location_id},
+                                   product_ids={price_list.product_id})
         return DeletePriceListDetail(success=True)
 
 
@@ -0,0 +1,86 @@
+from itertools import islice
+
+import graphene
+from graphql import GraphQLError
+from graphql_relay import to_global_id
+from utils.funct import get_integer_id
+from products.models import PriceList
+from products.price_diffs import PriceListDiff
+from products.schemas.effective_prices import PRICE_READ_ROLES
+
+
+DIFF_ROWS = 100
+
+MAX_DIFF_ROWS = 1000
+
+
+class PriceFieldChangeType(graphene.ObjectType):
+    """
+    ObjectType for the old and new value of a changed field.
+    """
+    field = graphene.String()
+    old = graphene.String()
+    new = graphene.String()
+
+
+class PriceListDiffRowType(graphene.ObjectType):
+    """
+    ObjectType for a row added to, removed from or changed between two price lists.
+    """
+    change = graphene.String(description="added, removed or changed.")
+    upc = graphene.String()
+    location_id = graphene.ID()
+    from_id = graphene.ID(description="The detail of the older list, null when added.")
+    to_id = graphene.ID(description="The detail of the newer list, null when removed.")
+    changes = graphene.List(PriceFieldChangeType, description="The changed fields of a changed row.")
+
+    def resolve_location_id(self, info):
+        return to_global_id("LocationType", self.location_id)
+
+    def resolve_from_id(self, info):
+        return to_global_id("PriceListDetailType", self.from_id) if self.from_id else None
+
+    def resolve_to_id(self, info):
+        return to_global_id("PriceListDetailType", self.to_id) if self.to_id else None
+
+    def resolve_changes(self, info):
+        return [PriceFieldChangeType(field=field, old=None if old is None else str(old),
+                                     new=None if new is None else str(new))
+                for field, (old, new) in self.changes.items()]
+
+
+class PriceListDiffType(graphene.ObjectType):
+    """
+    ObjectType for the differences between two price lists.
+    """
+    added = graphene.Int()
+    removed = graphene.Int()
+    changed = graphene.Int()
+    unchanged = graphene.Int()
+    rows = graphene.List(PriceListDiffRowType, description="The first differing rows; the REST API streams them all.")
+
+
+class Query(graphene.ObjectType):
+    """
+    Query class for GraphQL queries comparing price lists.
+    """
+    price_list_diff = graphene.Field(PriceListDiffType, from_id=graphene.String(required=True),
+                                     to_id=graphene.String(required=True), first=graphene.Int())
+
+    def resolve_price_list_diff(self, info, from_id, to_id, first=None):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price Lists.", extensions={'code': 403})
+        from_id, to_id = get_integer_id(from_id), get_integer_id(to_id)
+        if PriceList.objects.filter(id__in=[from_id, to_id]).count() != len({from_id, to_id}):
+            raise ValueError("Price list not found")
+        diff = PriceListDiff(from_id, to_id)
+        rows = iter(diff)
+        first_rows = list(islice(rows, max(0, min(DIFF_ROWS if first is None else first, MAX_DIFF_ROWS))))
+        # The rest is only counted.
+        for _ in rows:
+            pass
+        return PriceListDiffType(rows=first_rows, **diff.counts)
+
+
+price_list_diff_schema = graphene.Schema(query=Query)
@@ -0,0 +1,75 @@
+import graphene
+from graphql import GraphQLError
+from graphql_relay import to_global_id
+from utils.funct import get_integer_id
+from products.repricing import get_reprice_queryset
+from products.schemas.effective_prices import PRICE_READ_ROLES
+from products.schemas.price_list import RepriceRuleInput
+from products.simulations import simulate_price_details
+
+
+class SimulationGroupType(graphene.ObjectType):
+    """
+    ObjectType for the store revenue and gross profit of a group of details before and after a scenario.
+    """
+    id = graphene.ID(description="The department or category, null for the total and for products without one.")
+    name = graphene.String()
+    rows = graphene.Int()
+    revenue = graphene.Float(description="Store retail times store movement.")
+    new_revenue = graphene.Float()
+    revenue_delta = graphene.Float()
+    gross_profit = graphene.Float(description="Store retail less net cost, times store movement.")
+    new_gross_profit = graphene.Float()
+    gross_profit_delta = graphene.Float()
+    gp_pct = graphene.Float()
+    new_gp_pct = graphene.Float()
+    gp_pct_delta = graphene.Float()
+
+
+class PriceSimulationType(graphene.ObjectType):
+    """
+    ObjectType for the outcome of repricing rules that were not applied.
+    """
+    rows = graphene.Int()
+    total = graphene.Field(SimulationGroupType)
+    departments = graphene.List(SimulationGroupType)
+    categories = graphene.List(SimulationGroupType)
+
+    def resolve_departments(self, info):
+        return [with_global_id(group, "DepartmentType") for group in self.departments]
+
+    def resolve_categories(self, info):
+        return [with_global_id(group, "CategoryType") for group in self.categories]
+
+
+def with_global_id(group, type_name):
+    if group.id is not None:
+        group.id = to_global_id(type_name, group.id)
+    return group
+
+
+class Query(graphene.ObjectType):
+    """
+    Query class for GraphQL queries simulating price changes.
+    """
+    price_simulation = graphene.Field(
+        PriceSimulationType,
+        rules=graphene.List(graphene.NonNull(RepriceRuleInput), required=True),
+        price_list_id=graphene.String(),
+        location_id=graphene.String(),
+        vendor_id=graphene.String(),
+        department_id=graphene.String(),
+        category_id=graphene.String(),
+    )
+
+    def resolve_price_simulation(self, info, rules, **scope):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price Lists.", extensions={'code': 403})
+        if not scope:
+            raise ValueError("A price list, location, vendor, department or category is required.")
+        queryset = get_reprice_queryset(**{name: get_integer_id(value) for name, value in scope.items()})
+        return PriceSimulationType(**simulate_price_details(queryset, [dict(rule) for rule in rules]))
+
+
+price_simulation_schema = graphene.Schema(query=Query)
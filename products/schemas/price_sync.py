@@ -0,0 +1,51 @@
+import graphene
+from graphql import GraphQLError
+from graphql_relay import to_global_id
+from utils.funct import get_integer_id
+from products.schemas.effective_prices import PRICE_READ_ROLES
+from products.schemas.price_list_details import PriceListDetailType
+from products.schemas.products import ProductType
+from products.sync import get_price_changes, get_sync_location_id
+
+
+class PriceChangesType(graphene.ObjectType):
+    """
+    ObjectType for one page of the price changes of a location since a sync token.
+    """
+    token = graphene.String(description="Pass it back to get the next changes.")
+    has_more = graphene.Boolean(description="More changes are ready, ask again right away.")
+    reset = graphene.Boolean(description="Drop the local copy and download everything before syncing from token.")
+    price_list_details = graphene.List(PriceListDetailType)
+    products = graphene.List(ProductType)
+    deleted_price_list_detail_ids = graphene.List(graphene.ID)
+    deleted_product_ids = graphene.List(graphene.ID)
+
+    def resolve_deleted_price_list_detail_ids(self, info):
+        return [to_global_id("PriceListDetailType", id) for id in self.deleted_price_list_detail_ids]
+
+    def resolve_deleted_product_ids(self, info):
+        return [to_global_id("ProductType", id) for id in self.deleted_product_ids]
+
+
+class Query(graphene.ObjectType):
+    """
+    Query class for GraphQL queries syncing the prices of store devices.
+    """
+    price_changes = graphene.Field(PriceChangesType, location_id=graphene.String(), store_id=graphene.String(),
+                                   token=graphene.String(), first=graphene.Int())
+
+    def resolve_price_changes(self, info, location_id=None, store_id=None, token=None, first=None):
+        user = info.context.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            raise GraphQLError("You don't have permission to read Price details.", extensions={'code': 403})
+        try:
+            location_id = get_sync_location_id(
+                user, get_integer_id(location_id) if location_id else None,
+                get_integer_id(store_id) if store_id else None,
+            )
+        except PermissionError as exc:
+            raise GraphQLError(str(exc), extensions={'code': 403})
+        return get_price_changes(location_id, token, first)
+
+
+price_sync_schema = graphene.Schema(query=Query)
@@ -6,7 +6,9 @@ from django.db.models import Q
 from graphene import relay
 import graphene
 from graphql import GraphQLError
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import delete_instance, get_integer_id, CountedConnection, CountedConnectionField
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 
 from products.models import Product, UnitOfMeasure, Category, Department
 from products.schemas.departments import DepartmentType
@@ -49,34 +51,34 @@ class ProductType(DjangoObjectType):
         connection_class = CountedConnection
     
     def resolve_uom_details(self, info):
-        return self.uom
+        return load_related(info, self, "uom")
     
     def resolve_category_details(self, info):
-        return self.category
+        return load_related(info, self, "category")
         
     def resolve_department_details(self, info):
-        return self.department
+        return load_related(info, self, "department")
 
 
 class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to products.
     """
-    products = DjangoFilterConnectionField(ProductType)
+    products = CountedConnectionField(ProductType)
     product = graphene.Field(ProductType, id=graphene.String())
 
     def resolve_products(self, info, **kwargs):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "master_data_manager"]:
             raise GraphQLError("You don't have permission to read Product.", extensions={'code': 403})
-        return Product.objects.all()
+        return optimize_queryset(Product.objects.all(), info)
 
     def resolve_product(self, info, id):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "master_data_manager"]:
             raise GraphQLError("You don't have permission to read Product.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
-        return Product.objects.get(pk=numeric_id)
+        return optimize_queryset(Product.objects.all(), info).get(pk=numeric_id)
 
 class CreateProduct(graphene.Mutation):
     """
@@ -191,7 +193,7 @@ class DeleteProduct(graphene.Mutation):
             raise GraphQLError("You don't have permission to delete Product.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
         product = Product.objects.get(id=numeric_id)
-        product.delete()
+        delete_instance(product)
         return DeleteProduct(success=True)
     
     
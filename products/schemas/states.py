@@ -7,7 +7,9 @@ from graphene import relay
 import graphene
 from graphql import GraphQLError
 
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import delete_instance, get_integer_id, CountedConnection, CountedConnectionField
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 from products.models import State
 from products.schemas.countries import CountryType
 
@@ -42,22 +44,22 @@ class StateType(DjangoObjectType):
         connection_class = CountedConnection
     
     def resolve_country_details(self, info):
-        return self.country
+        return load_related(info, self, "country")
         
 
 class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to states.
     """
-    states = DjangoFilterConnectionField(StateType)
+    states = CountedConnectionField(StateType)
     state = graphene.Field(StateType, id=graphene.String())
     
     def resolve_states(self, info, *args, **kwargs):
-        return State.objects.all()
+        return optimize_queryset(State.objects.all(), info)
     
     def resolve_state(self, info, id):
         numeric_id = get_integer_id(id)
-        return State.objects.get(id = numeric_id)
+        return optimize_queryset(State.objects.all(), info).get(id = numeric_id)
 
 
 class CreateState(graphene.Mutation):
@@ -118,7 +120,7 @@ class DeleteState(graphene.Mutation):
     def mutate(root, info, id):
         numeric_id = get_integer_id(id)
         state_instance = State.objects.get(id=numeric_id)
-        state_instance.delete()
+        delete_instance(state_instance)
         return DeleteState(success=True)
 
 
@@ -10,8 +10,10 @@ from graphql import GraphQLError
 
 from accounts.models import User
 from accounts.schemas.user import UserType
-from products.utils import get_all_store_ids
-from utils.funct import get_integer_id, CountedConnection
+from products.utils import can_access_store, get_user_stores
+from utils.funct import get_integer_id, CountedConnection, CountedConnectionField
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 from products.models import Country, State, Location, Store
 from products.schemas.locations import LocationType
 from products.schemas.states import CountryType, StateType
@@ -52,16 +54,16 @@ class StoreType(DjangoObjectType):
         connection_class = CountedConnection
         
     def resolve_manager_details(self, info):
-        return self.manager
+        return load_related(info, self, "manager")
     
     def resolve_state_details(self, info):
-        return self.state
+        return load_related(info, self, "state")
     
     def resolve_country_details(self, info):
-        return self.country
+        return load_related(info, self, "country")
     
     def resolve_location_details(self, info):
-        return self.location
+        return load_related(info, self, "location")
 
 
 class CreateStore(graphene.Mutation):
@@ -210,28 +212,19 @@ class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to stores.
     """
-    stores = DjangoFilterConnectionField(StoreType)
+    stores = CountedConnectionField(StoreType)
     store = graphene.Field(StoreType, id=graphene.String())
     
     def resolve_stores(self, info, **kwargs):
         user = info.context.user
-        store_ids = get_all_store_ids(user.id)
-        if user.is_superuser:
-            return Store.objects.all()
-        else:
-            return Store.objects.filter(id__in = store_ids)
+        return optimize_queryset(get_user_stores(user), info)
     
     def resolve_store(self, info, id):
         numeric_id = get_integer_id(id)
         user = info.context.user
-        store_ids = get_all_store_ids(user.id)
-        
-        if user.is_superuser:
-            return Store.objects.get(pk=numeric_id)
-        else:
-            if numeric_id not in store_ids:
-                raise ValueError("Store not found")
-            return Store.objects.get(pk=numeric_id)
+        if not can_access_store(user, numeric_id):
+            raise ValueError("Store not found")
+        return optimize_queryset(Store.objects.all(), info).get(pk=numeric_id)
 
 class Mutation(graphene.ObjectType):
     """
@@ -5,8 +5,11 @@ from django.db import connections
 from django.db.models import Q
 from graphene import relay
 import graphene
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import delete_instance, get_integer_id, CountedConnection, CountedConnectionField
+from utils.planner import optimize_queryset
 from products.models import UnitOfMeasure
+from jobs.registry import enqueue
+from jobs.schemas.jobs import JobType
 from django.core.exceptions import PermissionDenied
 from graphql import GraphQLError
 
@@ -45,21 +48,21 @@ class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to unit of measures.
     """
-    unit_of_measures = DjangoFilterConnectionField(UnitOfMeasureType)
+    unit_of_measures = CountedConnectionField(UnitOfMeasureType)
     unit_of_measure = graphene.Field(UnitOfMeasureType, id=graphene.String(required=True))
 
     def resolve_unit_of_measures(self, info, **kwargs):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "master_data_manager"]:
             raise GraphQLError("You don't have permission to read Unit of Measure.", extensions={'code': 403})
-        return UnitOfMeasure.objects.all()
+        return optimize_queryset(UnitOfMeasure.objects.all(), info)
 
     def resolve_unit_of_measure(self, info, id):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "master_data_manager"]:
             raise GraphQLError("You don't have permission to read Unit of Measure.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
-        return UnitOfMeasure.objects.get(id=numeric_id)
+        return optimize_queryset(UnitOfMeasure.objects.all(), info).get(id=numeric_id)
     
 
 
@@ -75,13 +78,21 @@ class BulkCreateUnitOfMeasure(graphene.Mutation):
     """
     class Arguments:
         uoms = graphene.List(UOMsInput, required=True)
+        background = graphene.Boolean(description="Create the unit of measures in a background job and return the job.")
 
-    unit_of_measure = DjangoFilterConnectionField(UnitOfMeasureType)
+    unit_of_measure = CountedConnectionField(UnitOfMeasureType)
+    job = graphene.Field(JobType)
     
-    def mutate(self, info, uoms):
+    def mutate(self, info, uoms, background=False):
         user = info.context.user
         if not user.is_superuser and user.role not in ["admin", "master_data_manager"]:
             raise GraphQLError("You don't have permission to create Unit of Measure.", extensions={'code': 403})
+        if background:
+            job = enqueue("products.bulk_create_unit_of_measures", {
+                "uoms": [{"code": uom.get("code"), "name": uom.get("name"), "description": uom.get("description")}
+                         for uom in uoms],
+            }, user=user, max_attempts=3)
+            return BulkCreateUnitOfMeasure(unit_of_measure=UnitOfMeasure.objects.none(), job=job)
         ids_list = []
         for uom in uoms:
             unit_of_measure = UnitOfMeasure.objects.create(code=uom.get("code"), name=uom.get("name"), description=uom.get("description"))
@@ -153,7 +164,7 @@ class DeleteUnitOfMeasure(graphene.Mutation):
             raise GraphQLError("You don't have permission to delete Unit of Measure.", extensions={'code': 403})
         numeric_id = get_integer_id(id)
         unit_of_measure = UnitOfMeasure.objects.get(id=numeric_id)
-        unit_of_measure.delete()
+        delete_instance(unit_of_measure)
         return DeleteUnitOfMeasure(success=True)
 
 
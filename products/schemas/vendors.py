@@ -7,7 +7,9 @@ from django.db.models import Q
 from graphene import relay
 import graphene
 from graphql import GraphQLError
-from utils.funct import get_integer_id, CountedConnection
+from utils.funct import delete_instance, get_integer_id, CountedConnection, CountedConnectionField
+from utils.loaders import load_related
+from utils.planner import optimize_queryset
 
 # local files
 from products.models import Country, State, Vendor
@@ -46,24 +48,24 @@ class VendorType(DjangoObjectType):
         connection_class = CountedConnection
     
     def resolve_state_details(self, info):
-        return self.state
+        return load_related(info, self, "state")
     
     def resolve_country_details(self, info):
-        return self.country
+        return load_related(info, self, "country")
 
 class Query(graphene.ObjectType):
     """
     Query class for GraphQL queries related to vendors.
     """
-    vendors = DjangoFilterConnectionField(VendorType)
+    vendors = CountedConnectionField(VendorType)
     vendor = graphene.Field(VendorType, id=graphene.String(required=True))
     
     def resolve_vendors(self, info, *args, **kwargs):
-        return Vendor.objects.all()
+        return optimize_queryset(Vendor.objects.all(), info)
     
     def resolve_vendor(self, info, id):
         numeric_id = get_integer_id(id)
-        return Vendor.objects.get(id=numeric_id)
+        return optimize_queryset(Vendor.objects.all(), info).get(id=numeric_id)
 
 class CreateVendor(graphene.Mutation):
     """
@@ -195,7 +197,7 @@ class DeleteVendor(graphene.Mutation):
     def mutate(self, info, id):
         numeric_id = get_integer_id(id)
         vendor = Vendor.objects.get(id=numeric_id)
-        vendor.delete()
+        delete_instance(vendor)
         return DeleteVendor(success=True)
     
     
@@ -0,0 +1,87 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from products.models import Location, PriceList, PriceListDetail, Store
+from products.utils import get_price_list_scope, invalidate_store_access
+
+
+# Sent with the `location_ids` and `product_ids` whose price list details were
+# created, changed or deleted; `product_ids` is None when every product of the
+# locations may have changed. Bulk writes, which skip the model signals, send
+# it themselves, and may pass the written rows as a `details` queryset.
+price_details_changed = Signal()
+
+# Sent with a `details` queryset of price list details about to be deleted in
+# bulk, which the model signals do not report either.
+price_details_deleting = Signal()
+
+
+STORE_ACCESS_FIELDS = {
+    Store: ("manager_id", "location_id"),
+    Location: ("location_manager_id",),
+}
+
+
+@receiver(pre_save, sender=Store)
+@receiver(pre_save, sender=Location)
+def detect_store_access_change(sender, instance, **kwargs):
+    """
+    Flag saves that change who can access a store.
+    """
+    fields = STORE_ACCESS_FIELDS[sender]
+    if instance.pk is None:
+        instance._store_access_changed = True
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).values(*fields).first()
+    instance._store_access_changed = previous is None or any(
+        previous[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_save, sender=Location)
+def invalidate_store_access_on_save(sender, instance, **kwargs):
+    if getattr(instance, "_store_access_changed", True):
+        invalidate_store_access()
+
+
+@receiver(post_delete, sender=Store)
+@receiver(post_delete, sender=Location)
+def invalidate_store_access_on_delete(sender, instance, **kwargs):
+    invalidate_store_access()
+
+
+@receiver(pre_save, sender=PriceListDetail)
+def detect_price_detail_move(sender, instance, **kwargs):
+    """
+    Remember the location and product a saved detail is moved away from.
+    """
+    previous = None
+    if instance.pk is not None:
+        previous = sender._base_manager.filter(pk=instance.pk).values_list("location_id", "product_id").first()
+    instance._previous_scope = previous or (None, None)
+
+
+@receiver(post_save, sender=PriceListDetail)
+def price_detail_saved(sender, instance, **kwargs):
+    previous_location_id, previous_product_id = getattr(instance, "_previous_scope", (None, None))
+    price_details_changed.send(sender=PriceListDetail, location_ids={instance.location_id, previous_location_id},
+                               product_ids={instance.product_id, previous_product_id} - {None})
+
+
+@receiver(post_save, sender=PriceList)
+def price_list_saved(sender, instance, **kwargs):
+    # Its status and dates decide whether its details are in effect.
+    location_ids, product_ids = get_price_list_scope(instance)
+    price_details_changed.send(sender=PriceList, location_ids=location_ids, product_ids=product_ids)
+
+
+@receiver(pre_delete, sender=PriceList)
+def detect_price_list_scope(sender, instance, **kwargs):
+    instance._price_scope = get_price_list_scope(instance)
+
+
+@receiver(post_delete, sender=PriceList)
+def price_list_deleted(sender, instance, **kwargs):
+    location_ids, product_ids = getattr(instance, "_price_scope", (set(), set()))
+    price_details_changed.send(sender=PriceList, location_ids=location_ids, product_ids=product_ids)
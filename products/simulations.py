@@ -0,0 +1,170 @@
+from django.db import connections, models
+from django.db.models import F
+from django.db.models.functions import Cast
+
+from products.models import Category, Department
+from products.repricing import REPRICE_FIELDS, validate_reprice_rule
+
+
+# Columns loaded for a simulation, in the order of the arrays.
+SIMULATION_COLUMNS = ("net_cost", "base_retail", "store_retail", "store_movement")
+
+
+class SimulationGroup:
+    """
+    The store revenue and gross profit of a group of details before and after a scenario.
+
+    Revenue and profit are the store retail and its margin over the net cost,
+    times the store movement.
+    """
+    def __init__(self, id, name, rows, revenue, new_revenue, gross_profit, new_gross_profit):
+        self.id = id
+        self.name = name
+        self.rows = rows
+        self.revenue = revenue
+        self.new_revenue = new_revenue
+        self.gross_profit = gross_profit
+        self.new_gross_profit = new_gross_profit
+        self.gp_pct = get_gp_pct(gross_profit, revenue)
+        self.new_gp_pct = get_gp_pct(new_gross_profit, new_revenue)
+
+    @property
+    def revenue_delta(self):
+        return round(self.new_revenue - self.revenue, 2)
+
+    @property
+    def gross_profit_delta(self):
+        return round(self.new_gross_profit - self.gross_profit, 2)
+
+    @property
+    def gp_pct_delta(self):
+        if self.gp_pct is None or self.new_gp_pct is None:
+            return None
+        return round(self.new_gp_pct - self.gp_pct, 2)
+
+
+def get_gp_pct(gross_profit, revenue):
+    return round(gross_profit * 100 / revenue, 2) if revenue else None
+
+
+def load_simulation_arrays(queryset):
+    """
+    Read the numeric columns of `queryset` into NumPy arrays with one query.
+
+    The rows go straight from the cursor into the arrays, with the decimals
+    cast to floats by the database, so no model or Decimal is built per row.
+
+    Returns:
+        dict: A float array per `SIMULATION_COLUMNS` entry, and integer
+        `department_id` and `category_id` arrays, -1 for none.
+    """
+    import numpy as np
+
+    # Only expressions, which keep their order in the SELECT.
+    rows = queryset.order_by().values_list(*(
+        Cast(F(column), models.FloatField())
+        for column in SIMULATION_COLUMNS + ("product__department_id", "product__category_id")
+    ))
+    sql, params = rows.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        data = np.array(cursor.fetchall(), dtype=float).reshape(-1, len(SIMULATION_COLUMNS) + 2)
+    arrays = {column: data[:, index] for index, column in enumerate(SIMULATION_COLUMNS)}
+    for index, column in enumerate(("department_id", "category_id"), start=len(SIMULATION_COLUMNS)):
+        arrays[column] = np.nan_to_num(data[:, index], nan=-1).astype(np.int64)
+    return arrays
+
+
+def apply_rule(np, values, rule, operation):
+    """
+    Return the new values of the rule's field, computed as `products.repricing` would store them.
+    """
+    field = rule["field"]
+    value = float(rule[operation])
+    current = values[field]
+    if operation == "round_to":
+        # Rounded first so that float noise does not push a price already ending in `value` up.
+        return np.ceil(np.round(current - value, REPRICE_FIELDS[field])) + value
+    if operation == "percent":
+        result = current * (1 + value / 100)
+    elif operation == "amount":
+        result = current + value
+    else:
+        result = values["net_cost"] / (1 - value / 100)
+    # Half away from zero, as the database rounds; the float noise is rounded off first so that
+    # a decimal tie such as 6.51 * 1.035 = 6.73785 is not read as 6.737849... and rounded down.
+    scale = 10 ** REPRICE_FIELDS[field]
+    return np.sign(result) * np.floor(np.round(np.abs(result) * scale, 6) + 0.5) / scale
+
+
+def get_group_totals(np, keys, weights_by_name):
+    """
+    Sum every weight array per distinct key.
+
+    Returns:
+        tuple: The distinct keys, the rows per key and a dict of sums per weight name.
+    """
+    groups, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return groups, counts, {name: np.bincount(inverse, weights=weights, minlength=len(groups))
+                            for name, weights in weights_by_name.items()}
+
+
+def simulate_price_details(queryset, rules):
+    """
+    Compute the revenue and gross profit of `queryset` if `rules` were applied, without writing anything.
+
+    The rules are the repricing rules of `products.repricing`, applied in
+    order over NumPy arrays of the scope's columns instead of UPDATEs, e.g.
+    a net cost increase followed by rounding the retails to price points.
+
+    Args:
+        queryset (QuerySet): The details to simulate, see `get_reprice_queryset`.
+        rules (list): Dicts with a `field` and one operation.
+
+    Returns:
+        dict: The `rows` of the scope, the `total` `SimulationGroup` and the
+        `departments` and `categories` groups, by decreasing revenue.
+
+    Raises:
+        ValueError: If a rule is invalid or NumPy is not installed.
+    """
+    if not rules:
+        raise ValueError("At least one rule is required.")
+    operations = [validate_reprice_rule(rule) for rule in rules]
+    try:
+        import numpy as np
+    except ImportError:
+        raise ValueError("What-if simulations require numpy.")
+
+    arrays = load_simulation_arrays(queryset)
+    values = {field: arrays[field] for field in REPRICE_FIELDS}
+    for rule, operation in zip(rules, operations):
+        values[rule["field"]] = apply_rule(np, values, rule, operation)
+
+    movement = arrays["store_movement"]
+    weights = {
+        "revenue": arrays["store_retail"] * movement,
+        "new_revenue": values["store_retail"] * movement,
+    }
+    weights["gross_profit"] = weights["revenue"] - arrays["net_cost"] * movement
+    weights["new_gross_profit"] = weights["new_revenue"] - values["net_cost"] * movement
+
+    def get_groups(key, model, name_field):
+        groups, counts, sums = get_group_totals(np, arrays[key], weights)
+        names = dict(model.objects.filter(id__in=[int(group) for group in groups if group >= 0]).values_list(
+            "id", name_field))
+        result = [
+            SimulationGroup(int(group) if group >= 0 else None, names.get(int(group)), int(count),
+                            **{name: round(float(sums[name][index]), 2) for name in weights})
+            for index, (group, count) in enumerate(zip(groups, counts))
+        ]
+        return sorted(result, key=lambda group: -group.revenue)
+
+    total = SimulationGroup(None, None, len(movement),
+                            **{name: round(float(weights[name].sum()), 2) for name in weights})
+    return {
+        "rows": len(movement),
+        "total": total,
+        "departments": get_groups("department_id", Department, "department_name"),
+        "categories": get_groups("category_id", Category, "category"),
+    }
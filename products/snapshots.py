@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.utils import timezone
+
+from products.models import Location, PriceListDetail, PriceSnapshot, Product
+from products.price_lists import chunked
+from products.pricing import FIRST_DAY, LAST_DAY, build_price_timelines
+from products.sync import get_settled_head, has_changes_since
+
+
+SNAPSHOT_FORMAT = 1
+
+SNAPSHOT_PRODUCT_FIELDS = ("id", "upc", "item_code", "full_description", "abbrivated_description",
+                           "department_id", "category_id", "uom_id", "pack", "size", "tax")
+
+SNAPSHOT_PRICE_FIELDS = ("product_id", "price_list_detail_id", "upc", "effective_start_date", "effective_end_date",
+                         "store_retail", "base_retail", "net_cost")
+
+
+def get_snapshot_content(location_id, day):
+    """
+    Return the snapshot of a location as columns, in a stable order.
+
+    `prices` holds the segments of every product's timeline that end on or
+    after `day`, so a device keeps pricing right across the coming price
+    changes until it syncs; `products` holds the products those prices are for.
+    Values are the same whenever the prices are, so equal inputs give equal files.
+    """
+    segments = []
+    for product_id, timeline in sorted(build_price_timelines(location_id).items()):
+        for start, end, detail_id in zip(timeline.starts, timeline.ends, timeline.detail_ids):
+            if end >= day:
+                segments.append((product_id, detail_id, start, end))
+    details = {}
+    for chunk in chunked({detail_id for _, detail_id, _, _ in segments}, 1000):
+        details.update((detail_id, values) for detail_id, *values in PriceListDetail.objects.order_by().filter(
+            id__in=chunk).values_list("id", "upc", "store_retail", "base_retail", "net_cost"))
+
+    prices = {field: [] for field in SNAPSHOT_PRICE_FIELDS}
+    for product_id, detail_id, start, end in segments:
+        upc, store_retail, base_retail, net_cost = details[detail_id]
+        for field, value in zip(SNAPSHOT_PRICE_FIELDS, (
+                product_id, detail_id, upc, start.isoformat() if start != FIRST_DAY else None,
+                end.isoformat() if end != LAST_DAY else None, str(store_retail), str(base_retail), net_cost)):
+            prices[field].append(value)
+
+    products = {field: [] for field in SNAPSHOT_PRODUCT_FIELDS}
+    product_ids = sorted(set(prices["product_id"]))
+    for chunk in chunked(product_ids, 1000):
+        for row in Product.objects.filter(id__in=chunk).order_by("id").values_list(*SNAPSHOT_PRODUCT_FIELDS):
+            for field, value in zip(SNAPSHOT_PRODUCT_FIELDS, row):
+                products[field].append(value)
+    return {"format": SNAPSHOT_FORMAT, "location_id": location_id, "products": products, "prices": prices}
+
+
+def build_price_snapshot(location_id, force=False):
+    """
+    Write the snapshot file of a location when its inputs changed.
+
+    Nothing is read when no price of the location nor any product changed
+    since the last snapshot on the same day. Otherwise the content is rebuilt,
+    and only written to a new file when its hash differs from the current one.
+
+    Returns:
+        tuple: The `PriceSnapshot` and whether a new file was written.
+    """
+    day = timezone.localdate()
+    snapshot = PriceSnapshot.objects.filter(location_id=location_id).first()
+    if (snapshot is not None and not force and snapshot.built_on == day
+            and not has_changes_since(location_id, snapshot.sync_change_id)):
+        return snapshot, False
+
+    # Taken before reading: changes after it may be in the file too, replaying them is harmless.
+    sync_change_id = get_settled_head()
+    content = get_snapshot_content(location_id, day)
+    data = json.dumps(content, separators=(",", ":"), sort_keys=True).encode()
+    etag = hashlib.sha256(data).hexdigest()
+    values = {"sync_change_id": sync_change_id, "built_on": day,
+              "products": len(content["products"]["id"]), "prices": len(content["prices"]["product_id"])}
+    if snapshot is not None and snapshot.etag == etag and os.path.exists(snapshot.file_path):
+        PriceSnapshot.objects.filter(id=snapshot.id).update(updated_at=timezone.now(), **values)
+        snapshot.sync_change_id, snapshot.built_on = sync_change_id, day
+        return snapshot, False
+
+    directory = settings.PRICE_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, f"{location_id}-{etag[:16]}.json.gz")
+    temporary_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        # A fixed mtime keeps the compressed bytes a function of the content.
+        snapshot_file.write(gzip.compress(data, mtime=0))
+    os.replace(temporary_path, file_path)
+    previous_path = snapshot.file_path if snapshot is not None else None
+    snapshot, _ = PriceSnapshot.objects.update_or_create(
+        location_id=location_id,
+        defaults={"file_path": file_path, "etag": etag, "size": os.path.getsize(file_path), **values},
+    )
+    if previous_path and previous_path != file_path and os.path.exists(previous_path):
+        # Readers that opened it keep their handle.
+        os.remove(previous_path)
+    return snapshot, True
+
+
+def build_price_snapshots(location_ids=None, force=False):
+    """
+    Refresh the snapshots of `location_ids`, by default of every location with a store.
+
+    Returns:
+        int: The number of snapshot files written.
+    """
+    if location_ids is None:
+        location_ids = Location.objects.filter(stores__isnull=False).order_by("id").values_list(
+            "id", flat=True).distinct()
+    written = 0
+    for location_id in location_ids:
+        written += build_price_snapshot(location_id, force)[1]
+    return written
@@ -0,0 +1,282 @@
+from datetime import timedelta
+import heapq
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.models import Max, Min
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import PriceList, PriceListDetail, Product, Store, SyncChange
+from products.signals import price_details_changed, price_details_deleting
+from products.utils import can_access_location, can_access_store
+
+
+SYNC_TOKEN_SALT = "products.sync"
+
+
+def record_changes(model, action, queryset, location_field=None):
+    """
+    Record a change of every row of `queryset` with one INSERT ... SELECT.
+
+    The rows are never loaded: the change log grows by a statement per write
+    whatever the number of rows written.
+
+    Args:
+        model (str): `SyncChange.PRICE_LIST_DETAIL` or `SyncChange.PRODUCT`.
+        action (str): `SyncChange.UPSERT` or `SyncChange.DELETE`.
+        queryset (QuerySet): The changed rows.
+        location_field (str): The field holding the location of a row, None
+            for rows shared by every location.
+    """
+    connection = connections[queryset.db]
+    if location_field is None:
+        rows = queryset.order_by().values_list("id")
+        location = "NULL"
+    else:
+        rows = queryset.order_by().values_list("id", location_field)
+        location = f"sub.{connection.ops.quote_name(location_field)}"
+    sql, params = rows.query.sql_with_params()
+    table = connection.ops.quote_name(SyncChange._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (location_id, model, object_id, action, created_at) "
+            f"SELECT {location}, %s, sub.id, %s, %s FROM ({sql}) sub",
+            [model, action, connection.ops.adapt_datetimefield_value(timezone.now()), *params],
+        )
+
+
+@receiver(post_save, sender=PriceListDetail)
+def record_price_detail_saved(sender, instance, **kwargs):
+    record_changes(SyncChange.PRICE_LIST_DETAIL, SyncChange.UPSERT,
+                   PriceListDetail.objects.filter(pk=instance.pk), "location_id")
+    previous_location_id, _ = getattr(instance, "_previous_scope", (None, None))
+    if previous_location_id is not None and previous_location_id != instance.location_id:
+        # Moved away: the devices of its previous location must drop it.
+        SyncChange.objects.create(location_id=previous_location_id, model=SyncChange.PRICE_LIST_DETAIL,
+                                  object_id=instance.pk, action=SyncChange.DELETE)
+
+
+@receiver(post_save, sender=PriceList)
+def record_price_list_saved(sender, instance, created, **kwargs):
+    # Devices decide from the list's status and dates whether a detail applies.
+    if not created:
+        record_changes(SyncChange.PRICE_LIST_DETAIL, SyncChange.UPSERT,
+                       PriceListDetail.objects.filter(price_list_id=instance.pk), "location_id")
+
+
+@receiver(post_save, sender=Product)
+def record_product_saved(sender, instance, **kwargs):
+    SyncChange.objects.create(model=SyncChange.PRODUCT, object_id=instance.pk, action=SyncChange.UPSERT)
+
+
+@receiver(pre_delete, sender=Product)
+def record_product_deleted(sender, instance, **kwargs):
+    SyncChange.objects.create(model=SyncChange.PRODUCT, object_id=instance.pk, action=SyncChange.DELETE)
+
+
+def record_price_details_cascade(sender, instance, **kwargs):
+    # No signal is sent for the details the cascade deletes; tombstone them beforehand.
+    for field in PriceListDetail._meta.concrete_fields:
+        if field.is_relation and field.related_model is sender:
+            record_changes(SyncChange.PRICE_LIST_DETAIL, SyncChange.DELETE,
+                           PriceListDetail.objects.filter(**{field.attname: instance.pk}), "location_id")
+
+
+for field in PriceListDetail._meta.concrete_fields:
+    if field.is_relation:
+        pre_delete.connect(record_price_details_cascade, sender=field.related_model,
+                           dispatch_uid=f"sync_cascade_{field.related_model._meta.label_lower}")
+
+
+@receiver(price_details_changed)
+def record_price_details_changed(sender, details=None, **kwargs):
+    if details is not None:
+        record_changes(SyncChange.PRICE_LIST_DETAIL, SyncChange.UPSERT, details, "location_id")
+
+
+@receiver(price_details_deleting)
+def record_price_details_deleting(sender, details, **kwargs):
+    record_changes(SyncChange.PRICE_LIST_DETAIL, SyncChange.DELETE, details, "location_id")
+
+
+def make_sync_token(location_id, change_id):
+    return signing.dumps({"l": location_id, "c": change_id}, salt=SYNC_TOKEN_SALT, compress=True)
+
+
+def read_sync_token(location_id, token):
+    """
+    Return the id of the last change a token was issued after.
+
+    Raises:
+        ValueError: If the token is forged or was issued for another location.
+    """
+    try:
+        payload = signing.loads(token, salt=SYNC_TOKEN_SALT)
+    except signing.BadSignature:
+        raise ValueError("Invalid sync token.")
+    if payload.get("l") != location_id:
+        raise ValueError("This sync token was issued for another location.")
+    return payload["c"]
+
+
+class PriceChanges:
+    """
+    One page of the changes of a location's price list details and of the products.
+
+    `reset` tells the device to drop its copy and download everything again
+    before syncing from `token`: it had no token, or the changes since its
+    token were compacted away.
+    """
+    def __init__(self, token, has_more=False, reset=False, price_list_details=(), products=(),
+                 deleted_price_list_detail_ids=(), deleted_product_ids=()):
+        self.token = token
+        self.has_more = has_more
+        self.reset = reset
+        self.price_list_details = list(price_list_details)
+        self.products = list(products)
+        self.deleted_price_list_detail_ids = list(deleted_price_list_detail_ids)
+        self.deleted_product_ids = list(deleted_product_ids)
+
+
+def get_settled_cutoff():
+    """
+    Return the time after which changes are not served yet.
+
+    A change id is taken when the row is written, not when its transaction
+    commits; waiting `SYNC_SETTLE_SECONDS` lets a slower transaction holding
+    a lower id commit before a device moves its token past it.
+    """
+    return timezone.now() - timedelta(seconds=getattr(settings, "SYNC_SETTLE_SECONDS", 30))
+
+
+def get_settled_head(cutoff=None):
+    """
+    Return the id of the latest change old enough to be served, 0 when there is none.
+    """
+    return SyncChange.objects.filter(created_at__lte=cutoff or get_settled_cutoff()).order_by(
+        "-created_at").values_list("id", flat=True).first() or 0
+
+
+def get_location_changes(location_id, change_id):
+    """
+    Return the changes recorded after `change_id` of a location's details, and of the products.
+
+    They are two querysets so that each walks the (location, id) index.
+    """
+    changes = SyncChange.objects.filter(id__gt=change_id).order_by("id")
+    return changes.filter(location_id=location_id), changes.filter(location__isnull=True)
+
+
+def has_changes_since(location_id, change_id):
+    """
+    Tell whether a change of a location's details or of a product was recorded after `change_id`.
+    """
+    return any(changes.exists() for changes in get_location_changes(location_id, change_id))
+
+
+def get_price_changes(location_id, token=None, limit=None):
+    """
+    Return the changes of the rows a location's devices keep since `token`.
+
+    Args:
+        location_id (int): The location the devices sell at.
+        token (str): The token of the previous page, None for the first sync.
+        limit (int): The number of changes per page, capped at `SYNC_PAGE_SIZE`.
+
+    Returns:
+        PriceChanges: The rows upserted and the ids deleted, the latest change
+        of a row winning; fetch the next page with its `token` while `has_more`.
+    """
+    max_limit = getattr(settings, "SYNC_PAGE_SIZE", 1000)
+    limit = min(limit or max_limit, max_limit)
+    cutoff = get_settled_cutoff()
+    settled_head = get_settled_head(cutoff)
+    if token is None:
+        return PriceChanges(make_sync_token(location_id, settled_head), reset=True)
+    after = read_sync_token(location_id, token)
+    oldest = SyncChange.objects.aggregate(oldest=Min("id"))["oldest"]
+    if oldest is not None and after < oldest - 1:
+        return PriceChanges(make_sync_token(location_id, settled_head), reset=True)
+
+    # Merging the two reads keeps the id order.
+    merged = heapq.merge(*(changes.only("id", "model", "object_id", "action", "created_at")[:limit + 1]
+                           for changes in get_location_changes(location_id, after)),
+                         key=lambda change: change.id)
+    page, has_more, settled = [], False, True
+    for change in merged:
+        if change.created_at > cutoff:
+            settled = False
+            break
+        if len(page) == limit:
+            has_more = True
+            break
+        page.append(change)
+
+    latest = {}
+    for change in page:
+        latest[change.model, change.object_id] = change.action
+    upserted = {model: [object_id for (change_model, object_id), action in latest.items()
+                        if change_model == model and action == SyncChange.UPSERT]
+                for model in (SyncChange.PRICE_LIST_DETAIL, SyncChange.PRODUCT)}
+    details = PriceListDetail.objects.order_by().select_related("price_list").filter(
+        location_id=location_id).in_bulk(upserted[SyncChange.PRICE_LIST_DETAIL])
+    products = Product.objects.order_by().in_bulk(upserted[SyncChange.PRODUCT])
+    # A row deleted since its change was recorded is a tombstone as well.
+    deleted = {model: [object_id for (change_model, object_id), action in latest.items()
+                       if change_model == model and object_id not in found]
+               for model, found in ((SyncChange.PRICE_LIST_DETAIL, details), (SyncChange.PRODUCT, products))}
+
+    last = page[-1].id if page else after
+    if settled and not has_more:
+        # Nothing of this location is pending up to the head, skip the other locations' changes.
+        last = max(last, settled_head)
+    return PriceChanges(
+        make_sync_token(location_id, last),
+        has_more=has_more,
+        price_list_details=(details[object_id] for object_id in upserted[SyncChange.PRICE_LIST_DETAIL]
+                            if object_id in details),
+        products=(products[object_id] for object_id in upserted[SyncChange.PRODUCT] if object_id in products),
+        deleted_price_list_detail_ids=deleted[SyncChange.PRICE_LIST_DETAIL],
+        deleted_product_ids=deleted[SyncChange.PRODUCT],
+    )
+
+
+def compact_sync_changes(keep_days):
+    """
+    Delete the changes older than `keep_days` days, always keeping the latest one.
+
+    Devices whose token is older than the oldest change left are told to reset.
+
+    Returns:
+        int: The number of changes deleted.
+    """
+    head = SyncChange.objects.aggregate(head=Max("id"))["head"]
+    if head is None:
+        return 0
+    return SyncChange.objects.filter(created_at__lt=timezone.now() - timedelta(days=keep_days),
+                                     id__lt=head).delete()[0]
+
+
+def get_sync_location_id(user, location_id=None, store_id=None):
+    """
+    Return the location a store's devices sync, checking that `user` may access it.
+
+    Raises:
+        PermissionError: If `user` may not access the store or location.
+        ValueError: If neither id is given or the store does not exist.
+    """
+    if store_id is not None:
+        store = Store.objects.filter(id=store_id).values("location_id").first()
+        if store is None or store["location_id"] is None:
+            raise ValueError("Store not found")
+        if not can_access_store(user, store_id):
+            raise PermissionError("You don't have permission to sync this store.")
+        return store["location_id"]
+    if location_id is None:
+        raise ValueError("A location or store id is required.")
+    if not can_access_location(user, location_id):
+        raise PermissionError("You don't have permission to sync this location.")
+    return location_id
@@ -0,0 +1,111 @@
+from django.db import transaction
+from graphql_relay import to_global_id
+
+from jobs.registry import task
+from outbox.events import record_events
+from outbox.models import OutboxEvent
+from products.importers import PriceFileError, PriceFileImporter
+from products.models import PriceImport, PriceList, PriceListDetail, UnitOfMeasure
+from products.price_lists import BULK_BATCH_SIZE, bulk_create_price_details, chunked
+from products.signals import price_details_changed, price_details_deleting
+from products.utils import get_price_list_scope
+
+
+@task("products.create_price_list")
+def create_price_list(job, price_list, rows):
+    """
+    Create a price list and its validated detail rows, reporting progress per batch.
+
+    The list is created inactive and only gets its requested status once every
+    detail is written. Each batch commits with the job's checkpoint, so a
+    retried job writes the remaining rows into the same list; the last failed
+    attempt removes it again.
+    """
+    status = price_list.pop("status")
+    checkpoint = job.checkpoint or {}
+    price_list_instance = PriceList.objects.filter(id=checkpoint.get("price_list_id")).first()
+    if price_list_instance is None:
+        with transaction.atomic():
+            price_list_instance = PriceList.objects.create(status=PriceList.INACTIVE, **price_list)
+            checkpoint = {"price_list_id": price_list_instance.id, "rows": 0}
+            job.set_progress(0, len(rows), checkpoint=checkpoint)
+    done = checkpoint["rows"]
+    try:
+        for chunk in chunked(rows[done:], BULK_BATCH_SIZE):
+            with transaction.atomic():
+                bulk_create_price_details(price_list_instance.id, chunk)
+                done += len(chunk)
+                job.set_progress(done, checkpoint={"price_list_id": price_list_instance.id, "rows": done})
+    except Exception:
+        if job.attempts >= job.max_attempts:
+            price_list_instance.delete()
+        raise
+    price_list_instance.status = status
+    price_list_instance.save(update_fields=["status", "updated_at"])
+    return {"price_list_id": to_global_id("PriceListType", price_list_instance.id), "created": done}
+
+
+@task("products.delete_price_list")
+def delete_price_list(job, price_list_id):
+    """
+    Delete a price list, removing its details in batches first.
+    """
+    price_list = PriceList.objects.filter(id=price_list_id).first()
+    location_ids, product_ids = get_price_list_scope(price_list) if price_list else (set(), set())
+    details = PriceListDetail.objects.filter(price_list_id=price_list_id).order_by()
+    job.set_progress(0, details.count())
+    deleted = 0
+    while True:
+        ids = list(details.values_list("id", flat=True)[:BULK_BATCH_SIZE])
+        if not ids:
+            break
+        price_details_deleting.send(sender=PriceListDetail, details=PriceListDetail.objects.filter(id__in=ids))
+        PriceListDetail.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        job.set_progress(deleted)
+    price_details_changed.send(sender=PriceListDetail, location_ids=location_ids, product_ids=product_ids)
+    PriceList.objects.filter(id=price_list_id).delete()
+    return {"price_list_id": to_global_id("PriceListType", price_list_id), "deleted": deleted}
+
+
+@task("products.import_price_file")
+def import_price_file(job, price_import_id):
+    """
+    Import an uploaded price file, resuming after its checkpoint when the job is retried.
+
+    A file that cannot be read fails the import, not the job; the import
+    records why.
+    """
+    price_import = PriceImport.objects.get(id=price_import_id)
+    if price_import.status != PriceImport.COMPLETED:
+        job.set_progress(price_import.checkpoint_row)
+        try:
+            PriceFileImporter(price_import, on_chunk=lambda price_import: job.set_progress(
+                price_import.checkpoint_row)).run()
+        except PriceFileError:
+            pass
+    return {
+        "price_import_id": price_import.id,
+        "status": price_import.status,
+        "rows_imported": price_import.rows_imported,
+        "rows_failed": price_import.rows_failed,
+    }
+
+
+@task("products.bulk_create_unit_of_measures")
+def bulk_create_unit_of_measures(job, uoms):
+    """
+    Create unit of measures in batches, resuming after the last committed one when the job is retried.
+    """
+    ids = (job.checkpoint or {}).get("unit_of_measure_ids", [])
+    job.set_progress(len(ids), len(uoms))
+    for chunk in chunked(uoms[len(ids):], BULK_BATCH_SIZE):
+        with transaction.atomic():
+            created = UnitOfMeasure.objects.bulk_create([
+                UnitOfMeasure(code=uom["code"], name=uom["name"], description=uom.get("description"))
+                for uom in chunk
+            ])
+            record_events(UnitOfMeasure.objects.filter(id__in=[uom.id for uom in created]), OutboxEvent.UPSERT)
+            ids = ids + [unit_of_measure.id for unit_of_measure in created]
+            job.set_progress(len(ids), checkpoint={"unit_of_measure_ids": ids})
+    return {"unit_of_measure_ids": [to_global_id("UnitOfMeasureType", id) for id in ids]}
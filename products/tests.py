@@ -1,3 +1,602 @@
-from django.test import TestCase
+import os
+import random
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from accounts.models import User
+from jobs.models import Job
+from jobs.registry import enqueue
+from jobs.worker import claim_job, execute_job, run_worker
+from products.current_prices import get_current_prices, rebuild_current_prices
+from products.importers import PriceFileImporter, normalize_upc
+from products.margins import get_margin_summary, rebuild_margin_rollups
+from products.models import (
+    Category, CurrentPrice, Department, Location, PriceImport, PriceList, PriceListDetail, Product, SyncChange,
+    UnitOfMeasure, Vendor,
+)
+from products.price_book import build_price_book, lookup_prices_by_upc
+from products.price_diffs import ADDED, CHANGED, REMOVED, PriceListDiff
+from products.price_lists import bulk_create_price_details
+from products.price_windows import IntervalTree, audit_price_windows, find_price_window_conflicts
+from products.pricing import build_price_timelines, resolve_effective_prices
+from products.repricing import get_reprice_queryset, reprice_price_details
+from products.scheduling import run_price_schedule
+from products.simulations import simulate_price_details
+from products.sync import get_price_changes, make_sync_token, read_sync_token
+
+
+PRICE_FILE = (
+    "upc,item_number,pricing_method,quantity,case_qty,pack,size,net_cost,base_retail,store_retail,"
+    "base_gp_pct,store_gp_pct,vendor_movement,store_movement,name,description\n"
+    "000000000001,1,unit,1,12,1,1,1.25,2.99,2.99,30,30,5,5,Milk,Whole milk\n"
+)
+
+
+class PricingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(email="admin@example.com", password="x", name="admin", role="admin")
+        self.vendor = Vendor.objects.create(name="Dairy Co", vendor_no="100")
+        self.location = Location.objects.create(location_name="Main", location_code="1", email="main@example.com")
+        self.uom = UnitOfMeasure.objects.create(code="EA", name="Each")
+        self.department = Department.objects.create(department_no="1", department_name="Dairy")
+        self.category = Category.objects.create(category="Milk")
+        self.product = self.make_product("000000000001")
+
+    def make_product(self, upc):
+        return Product.objects.create(
+            department=self.department, category=self.category, uom=self.uom, upc=upc,
+            full_description="Whole milk", pack="1", size="1",
+        )
+
+    def make_price_list(self, name, status=PriceList.ACTIVE, **fields):
+        return PriceList.objects.create(name=name, vendor=self.vendor, location=self.location, status=status, **fields)
+
+    def make_detail(self, price_list, product=None, retail="2.50", **fields):
+        product = product or self.product
+        values = dict(
+            price_list=price_list, product=product, location=self.location, vendor=self.vendor, uom=self.uom,
+            upc=product.upc, item_number=1, pricing_method="unit", quantity=1, case_qty=1, pack="1", size="1",
+            net_cost=1.0, base_retail=retail, store_retail=retail, base_gp_pct="30", store_gp_pct="30",
+            vendor_movement=1, store_movement=1, name="Milk", description="Whole milk", status=PriceListDetail.ACTIVE,
+        )
+        values.update(fields)
+        return PriceListDetail.objects.create(**values)
+
+
+class PriceImportTests(PricingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # A list of another vendor the imported one overlaps.
+        self.other_detail = self.make_detail(self.make_price_list("Other"))
+
+    def write_price_file(self):
+        path = os.path.join(self.directory, "prices.csv")
+        with open(path, "w") as price_file:
+            price_file.write(PRICE_FILE)
+        return path
+
+    def test_upload_with_list_start_date(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(PRICE_IMPORT_DIR=self.directory):
+            response = client.post("/api/price-imports/", {
+                "file": SimpleUploadedFile("prices.csv", PRICE_FILE.encode(), content_type="text/csv"),
+                "vendor_id": self.vendor.id,
+                "location_id": self.location.id,
+                "effective_start_date": "2026-01-01",
+            }, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        run_worker(once=True)
+
+        price_import = PriceImport.objects.get(id=response.json()["id"])
+        self.assertEqual(price_import.status, PriceImport.COMPLETED, price_import.message)
+        self.assertEqual(price_import.rows_imported, 1)
+        self.assertEqual(price_import.price_list.effective_start_date, date(2026, 1, 1))
+        detail = PriceListDetail.objects.get(price_list=price_import.price_list)
+        self.assertEqual(detail.effective_start_date, date(2026, 1, 1))
+        self.assertEqual(len(price_import.warnings), 1)
+        self.assertIn(f"price list detail {self.other_detail.id}", price_import.warnings[0]["message"])
+
+    def test_upload_with_invalid_date(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/price-imports/", {
+            "file": SimpleUploadedFile("prices.csv", PRICE_FILE.encode(), content_type="text/csv"),
+            "vendor_id": self.vendor.id,
+            "location_id": self.location.id,
+            "effective_start_date": "2026-02-30",
+        }, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PriceImport.objects.exists())
+
+    def test_import_with_unsaved_text_dates(self):
+        price_import = PriceImport.objects.create(
+            file_path=self.write_price_file(), name="prices.csv", vendor=self.vendor, location=self.location,
+            effective_start_date="2026-01-01", effective_end_date="2026-12-31",
+        )
+        PriceFileImporter(price_import).run()
+        self.assertEqual(price_import.status, PriceImport.COMPLETED)
+        self.assertEqual(price_import.rows_imported, 1)
+
+    def test_import_records_each_row_once(self):
+        price_import = PriceImport.objects.create(
+            file_path=self.write_price_file(), name="prices.csv", vendor=self.vendor, location=self.location,
+        )
+        before = list(SyncChange.objects.values_list("id", flat=True))
+        PriceFileImporter(price_import).run()
+        detail = PriceListDetail.objects.get(price_list=price_import.price_list)
+        self.assertEqual(list(SyncChange.objects.exclude(id__in=before).values_list("object_id", flat=True)),
+                         [detail.id])
+
+
+class CurrentPriceTests(PricingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_product = self.make_product("000000000002")
+        self.make_detail(self.make_price_list("Base"), retail="2.50")
+        self.make_detail(self.make_price_list("Base 2"), product=self.other_product, retail="3.50")
+        # The rows the signals wrote are lost, as if the products were priced before the table existed.
+        CurrentPrice.objects.all().delete()
+
+    def assert_matches_dated(self):
+        product_ids = [self.product.id, self.other_product.id]
+        current = get_current_prices(self.location.id, product_ids)
+        dated = resolve_effective_prices(self.location.id, product_ids, timezone.localdate())
+        self.assertEqual(
+            {product_id: price.price_list_detail_id for product_id, price in current.items()},
+            {product_id: price.price_list_detail_id for product_id, price in dated.items()},
+        )
+
+    def test_current_prices_without_rebuild(self):
+        self.assert_matches_dated()
+
+    def test_current_prices_after_rebuild(self):
+        rebuild = rebuild_current_prices()
+        self.assertEqual(rebuild.written, 2)
+        self.assertEqual(CurrentPrice.objects.count(), 2)
+        self.assert_matches_dated()
+
+
+class EffectivePriceTests(PricingTestCase):
+    def assert_matches_timeline(self, first, last):
+        timeline = build_price_timelines(self.location.id, [self.product.id])[self.product.id]
+        day = first
+        while day <= last:
+            price = resolve_effective_prices(self.location.id, [self.product.id], day)[self.product.id]
+            found = timeline.lookup(day)
+            if found is None:
+                self.assertIsNone(price.price_list_detail_id, day)
+            else:
+                detail_id, start, end = found
+                self.assertEqual(price.price_list_detail_id, detail_id, day)
+                self.assertEqual(price.effective_start_date, start if start != date.min else None, day)
+                self.assertEqual(price.effective_end_date, end if end != date.max else None, day)
+            day += timedelta(days=1)
+
+    def get_price(self, day):
+        return resolve_effective_prices(self.location.id, [self.product.id], day)[self.product.id]
+
+    def test_promotion_over_open_ended_list(self):
+        base = self.make_detail(self.make_price_list("Base"), retail="2.50")
+        promotion = self.make_detail(self.make_price_list("Promotion"), retail="1.99",
+                                     effective_start_date=date(2026, 3, 1), effective_end_date=date(2026, 3, 14))
+        price = self.get_price(date(2026, 3, 5))
+        self.assertEqual(price.price_list_detail_id, promotion.id)
+        self.assertEqual((price.effective_start_date, price.effective_end_date), (date(2026, 3, 1), date(2026, 3, 14)))
+        price = self.get_price(date(2026, 3, 20))
+        self.assertEqual(price.price_list_detail_id, base.id)
+        self.assertEqual((price.effective_start_date, price.effective_end_date), (date(2026, 3, 15), None))
+        price = self.get_price(date(2026, 2, 1))
+        self.assertEqual((price.effective_start_date, price.effective_end_date), (None, date(2026, 2, 28)))
+        self.assert_matches_timeline(date(2026, 2, 25), date(2026, 3, 18))
+
+    def test_overlapping_price_lists(self):
+        self.make_detail(self.make_price_list("Spring", effective_start_date=date(2026, 3, 1),
+                                              effective_end_date=date(2026, 5, 31)), retail="2.40")
+        self.make_detail(self.make_price_list("April", effective_start_date=date(2026, 4, 1)), retail="2.30",
+                         effective_end_date=date(2026, 4, 10))
+        self.make_detail(self.make_price_list("Late"), retail="2.20", effective_start_date=date(2026, 4, 5),
+                         effective_end_date=date(2026, 4, 20))
+        self.assertIsNone(self.get_price(date(2026, 2, 28)).price)
+        self.assertEqual(self.get_price(date(2026, 4, 7)).price, Decimal("2.20"))
+        self.assertEqual(self.get_price(date(2026, 4, 25)).price, Decimal("2.40"))
+        self.assertIsNone(self.get_price(date(2026, 6, 1)).price)
+        self.assert_matches_timeline(date(2026, 2, 27), date(2026, 6, 2))
+
+    def test_ties_go_to_newest_list_then_detail(self):
+        start = date(2026, 3, 1)
+        self.make_detail(self.make_price_list("Older"), retail="2.50", effective_start_date=start)
+        newer = self.make_price_list("Newer")
+        self.make_detail(newer, retail="2.40", effective_start_date=start)
+        newest = self.make_detail(newer, retail="2.30", effective_start_date=start)
+        self.assertEqual(self.get_price(start).price_list_detail_id, newest.id)
+        self.assert_matches_timeline(start - timedelta(days=1), start + timedelta(days=1))
+
+    def test_switched_off_details_are_ignored(self):
+        base = self.make_detail(self.make_price_list("Base"), retail="2.50")
+        self.make_detail(self.make_price_list("Draft", status=PriceList.INACTIVE), retail="1.00")
+        self.assertEqual(self.get_price(date(2026, 3, 1)).price_list_detail_id, base.id)
+
+
+@override_settings(MARGIN_ROLLUPS=True)
+class MarginTests(PricingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.make_detail(self.make_price_list("Base"), retail="2.50")
+        self.make_detail(self.make_price_list("Expired", status=PriceList.EXPIRED,
+                                              effective_end_date=self.today - timedelta(days=1)), retail="2.00")
+        self.make_detail(self.make_price_list("Next week", status=PriceList.SCHEDULED,
+                                              effective_start_date=self.today + timedelta(days=7)), retail="3.00")
+
+    def test_only_prices_in_effect_are_summed(self):
+        summary, from_rollups = get_margin_summary()
+        self.assertFalse(from_rollups)
+        self.assertEqual((summary[0].rows, summary[0].revenue), (1, 2.5))
+
+    def test_rollups_follow_the_price_schedule(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_margin_rollups()
+        with self.captureOnCommitCallbacks(execute=True):
+            run_price_schedule(self.today + timedelta(days=7))
+        summary, from_rollups = get_margin_summary()
+        self.assertTrue(from_rollups)
+        self.assertEqual((summary[0].rows, summary[0].revenue), (2, 5.5))
+
+
+class PriceBookTests(PricingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.price_list = self.make_price_list("Base")
+
+    def test_normalize_upc(self):
+        self.assertEqual(normalize_upc("012345678905"), "00012345678905")
+        self.assertEqual(normalize_upc("12345678905"), "00012345678905")
+        self.assertEqual(normalize_upc(" 0-12345-67890-5 "), "00012345678905")
+        self.assertEqual(normalize_upc("04252614"), normalize_upc("042100005264"))
+        self.assertNotEqual(normalize_upc("0ABC1"), normalize_upc("ABC1"))
+
+    def test_book_is_keyed_by_product(self):
+        upc_a = self.make_product("012345678905")
+        self.make_detail(self.price_list, product=upc_a, retail="1.00")
+        # Details keep the UPC as imported; the product's decides the lookup.
+        self.make_detail(self.make_price_list("Promotion"), product=upc_a, retail="0.90", upc="12345678905")
+        self.make_detail(self.price_list, product=self.make_product("ABC1"), retail="2.00")
+        self.make_detail(self.price_list, product=self.make_product("0ABC1"), retail="3.00")
+        book = build_price_book(self.location.id)
+        self.assertEqual(len(book), 3)
+        day = date(2026, 3, 1)
+        for upc in ("012345678905", "12345678905", "0-12345-67890-5"):
+            price = book.lookup(upc, day)
+            self.assertEqual((price.product_id, price.price), (upc_a.id, Decimal("0.90")))
+        self.assertEqual(book.lookup("ABC1", day).price, Decimal("2.00"))
+        self.assertEqual(book.lookup("0ABC1", day).price, Decimal("3.00"))
+        self.assertIsNone(book.lookup("999", day))
+
+    def test_upc_change_outdates_book(self):
+        self.make_detail(self.price_list, retail="1.00")
+        day = date(2026, 3, 1)
+        self.assertIsNotNone(lookup_prices_by_upc(self.location.id, ["000000000001"], day)[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.upc = "000000000002"
+            self.product.save()
+        self.assertEqual(
+            [price and price.product_id for price in
+             lookup_prices_by_upc(self.location.id, ["000000000001", "000000000002"], day)],
+            [None, self.product.id],
+        )
+
+
+@mock.patch("products.tasks.BULK_BATCH_SIZE", 1)
+class RetriedTaskTests(PricingTestCase):
+    def make_row(self, product):
+        return {
+            "product_id": product.id, "uom_id": self.uom.id, "vendor_id": self.vendor.id,
+            "location_id": self.location.id, "upc": product.upc, "item_number": 1, "pricing_method": "unit",
+            "quantity": 1, "case_qty": 1, "pack": "1", "size": "1", "net_cost": 1.0, "base_retail": "2.50",
+            "store_retail": "2.50", "base_gp_pct": "30", "store_gp_pct": "30", "vendor_movement": 1,
+            "store_movement": 1, "name": "Milk", "description": "Whole milk", "status": PriceListDetail.ACTIVE,
+            "effective_start_date": None, "effective_end_date": None,
+        }
+
+    def run_failing_once(self, calls, failing_call):
+        def fail_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == failing_call:
+                raise RuntimeError("connection lost")
+            return bulk_create_price_details(*args, **kwargs)
+        return fail_once
+
+    def test_create_price_list_resumes_in_same_list(self):
+        rows = [self.make_row(self.product), self.make_row(self.make_product("000000000002")),
+                self.make_row(self.make_product("000000000003"))]
+        job = enqueue("products.create_price_list", {
+            "price_list": {"vendor_id": self.vendor.id, "location_id": self.location.id, "name": "Weekly",
+                           "status": PriceList.ACTIVE},
+            "rows": rows,
+        }, max_attempts=2)
+        calls = []
+        with mock.patch("products.tasks.bulk_create_price_details", self.run_failing_once(calls, 2)):
+            with self.assertLogs("jobs.worker", "ERROR"):
+                execute_job(claim_job("worker-1"))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.progress), (Job.QUEUED, 1))
+            execute_job(claim_job("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED, job.message)
+        self.assertEqual(job.result["created"], 3)
+        price_list = PriceList.objects.get(name="Weekly")
+        self.assertEqual(price_list.status, PriceList.ACTIVE)
+        self.assertEqual(PriceListDetail.objects.filter(price_list=price_list).count(), 3)
+
+    def test_last_failed_attempt_removes_price_list(self):
+        job = enqueue("products.create_price_list", {
+            "price_list": {"vendor_id": self.vendor.id, "location_id": self.location.id, "name": "Weekly",
+                           "status": PriceList.ACTIVE},
+            "rows": [self.make_row(self.product)],
+        })
+        with mock.patch("products.tasks.bulk_create_price_details", self.run_failing_once([], 1)):
+            with self.assertLogs("jobs.worker", "ERROR"):
+                execute_job(claim_job("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertFalse(PriceList.objects.filter(name="Weekly").exists())
+
+    def test_bulk_create_unit_of_measures_resumes(self):
+        uoms = [{"code": code, "name": code} for code in ("CS", "PK", "LB")]
+        job = enqueue("products.bulk_create_unit_of_measures", {"uoms": uoms}, max_attempts=2)
+        create = UnitOfMeasure.objects.bulk_create
+        calls = []
+
+        def fail_once(objects):
+            calls.append(objects)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return create(objects)
+
+        with mock.patch.object(UnitOfMeasure.objects, "bulk_create", fail_once):
+            with self.assertLogs("jobs.worker", "ERROR"):
+                execute_job(claim_job("worker-1"))
+            execute_job(claim_job("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED, job.message)
+        self.assertEqual(sorted(UnitOfMeasure.objects.exclude(id=self.uom.id).values_list("code", flat=True)),
+                         ["CS", "LB", "PK"])
+        self.assertEqual(len(job.result["unit_of_measure_ids"]), 3)
+
+
+class PriceWindowTests(PricingTestCase):
+    def test_interval_tree_counts_touching_days(self):
+        tree = IntervalTree([(date(2026, 3, 1), date(2026, 3, 5), "a"), (date(2026, 3, 6), date(2026, 3, 9), "b"),
+                             (date(2026, 3, 9), date(2026, 3, 12), "c")])
+        self.assertEqual(sorted(tree.overlapping(date(2026, 3, 5), date(2026, 3, 5))), ["a"])
+        self.assertEqual(sorted(tree.overlapping(date(2026, 3, 5), date(2026, 3, 6))), ["a", "b"])
+        self.assertEqual(sorted(tree.overlapping(date(2026, 3, 9), date(2026, 3, 9))), ["b", "c"])
+        self.assertEqual(tree.overlapping(date(2026, 3, 13), date(2026, 3, 20)), [])
+
+    def test_interval_tree_matches_scan(self):
+        generator = random.Random(7)
+        first = date(2026, 1, 1).toordinal()
+        ranges = []
+        for index in range(200):
+            start = first + generator.randrange(100)
+            ranges.append((date.fromordinal(start), date.fromordinal(start + generator.randrange(10)), index))
+        tree = IntervalTree(ranges)
+        for _ in range(100):
+            start = first + generator.randrange(110)
+            start, end = date.fromordinal(start), date.fromordinal(start + generator.randrange(5))
+            self.assertEqual(sorted(tree.overlapping(start, end)),
+                             [index for range_start, range_end, index in ranges
+                              if range_start <= end and range_end >= start])
+
+    def test_audit_reports_each_pair_once(self):
+        price_list = self.make_price_list("Base")
+        first = self.make_detail(price_list, effective_start_date=date(2026, 3, 1),
+                                 effective_end_date=date(2026, 3, 5))
+        touching = self.make_detail(price_list, effective_start_date=date(2026, 3, 5),
+                                    effective_end_date=date(2026, 3, 9))
+        # The day after is no overlap.
+        last = self.make_detail(price_list, effective_start_date=date(2026, 3, 10),
+                                effective_end_date=date(2026, 3, 12))
+        promotion = self.make_detail(self.make_price_list("Promotion"), effective_start_date=date(2026, 3, 12))
+        self.assertEqual(sorted(audit_price_windows()), [
+            (self.location.id, self.product.id, first.id, touching.id, True),
+            (self.location.id, self.product.id, last.id, promotion.id, False),
+        ])
+
+    def test_rows_touching_stored_detail_conflict(self):
+        price_list = self.make_price_list("Base")
+        stored = self.make_detail(price_list, effective_start_date=date(2026, 3, 1),
+                                  effective_end_date=date(2026, 3, 5))
+        rows = [
+            {"row": 2, "location_id": self.location.id, "product_id": self.product.id, "status": "active",
+             "effective_start_date": date(2026, 3, 5), "effective_end_date": date(2026, 3, 7)},
+            {"row": 3, "location_id": self.location.id, "product_id": self.product.id, "status": "active",
+             "effective_start_date": date(2026, 3, 8), "effective_end_date": None},
+        ]
+        self.assertEqual(find_price_window_conflicts(rows, price_list.id), [
+            (rows[0], f"Overlaps price list detail {stored.id} of the same price list."),
+        ])
+
+
+class PriceListDiffTests(PricingTestCase):
+    def test_counts_and_changes(self):
+        kept, changed, removed, added = (self.product, self.make_product("000000000002"),
+                                         self.make_product("000000000003"), self.make_product("000000000004"))
+        old, new = self.make_price_list("January"), self.make_price_list("February")
+        for product in (kept, changed, removed):
+            self.make_detail(old, product=product, retail="2.50")
+        self.make_detail(new, product=kept, retail="2.50")
+        changed_detail = self.make_detail(new, product=changed, retail="2.75")
+        added_detail = self.make_detail(new, product=added, retail="1.25")
+
+        diff = PriceListDiff(old.id, new.id)
+        rows = {row.upc: row for row in diff}
+        self.assertEqual(diff.counts, {ADDED: 1, REMOVED: 1, CHANGED: 1, "unchanged": 1})
+        self.assertEqual(set(rows), {changed.upc, removed.upc, added.upc})
+        self.assertEqual((rows[changed.upc].change, rows[changed.upc].to_id), (CHANGED, changed_detail.id))
+        self.assertEqual(rows[changed.upc].changes, {"base_retail": (Decimal("2.50"), Decimal("2.75")),
+                                                     "store_retail": (Decimal("2.50"), Decimal("2.75"))})
+        self.assertEqual(rows[removed.upc].change, REMOVED)
+        self.assertEqual((rows[added.upc].change, rows[added.upc].to_id), (ADDED, added_detail.id))
+
+    def test_rows_of_one_key_pair_by_start_date(self):
+        old, new = self.make_price_list("January"), self.make_price_list("February")
+        self.make_detail(old, retail="2.50", effective_start_date=date(2026, 1, 1))
+        self.make_detail(old, retail="1.99", effective_start_date=date(2026, 1, 15))
+        # Written in the other order; each row still meets its own start date.
+        self.make_detail(new, retail="1.99", effective_start_date=date(2026, 1, 15))
+        self.make_detail(new, retail="2.50", effective_start_date=date(2026, 1, 1))
+        diff = PriceListDiff(old.id, new.id)
+        self.assertEqual(list(diff), [])
+        self.assertEqual(diff.counts, {ADDED: 0, REMOVED: 0, CHANGED: 0, "unchanged": 2})
+
+
+@override_settings(SYNC_SETTLE_SECONDS=60)
+class PriceSyncTests(PricingTestCase):
+    def settle(self):
+        SyncChange.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+
+    def test_token_round_trip(self):
+        token = make_sync_token(self.location.id, 42)
+        self.assertEqual(read_sync_token(self.location.id, token), 42)
+        other = Location.objects.create(location_name="Other", location_code="2", email="other@example.com")
+        with self.assertRaises(ValueError):
+            read_sync_token(other.id, token)
+        with self.assertRaises(ValueError):
+            read_sync_token(self.location.id, make_sync_token(self.location.id, 43).split(":")[0]
+                            + token[token.index(":"):])
+
+    def test_changes_wait_for_settle_window(self):
+        self.settle()
+        first = get_price_changes(self.location.id)
+        self.assertTrue(first.reset)
+        detail = self.make_detail(self.make_price_list("Base"))
+
+        pending = get_price_changes(self.location.id, first.token)
+        self.assertEqual((pending.price_list_details, pending.token), ([], first.token))
+        self.settle()
+        page = get_price_changes(self.location.id, first.token)
+        self.assertEqual([row.id for row in page.price_list_details], [detail.id])
+        self.assertFalse(page.reset)
+        self.assertEqual(get_price_changes(self.location.id, page.token).price_list_details, [])
+
+    def test_latest_change_of_a_row_wins(self):
+        self.settle()
+        token = get_price_changes(self.location.id).token
+        detail = self.make_detail(self.make_price_list("Base"))
+        detail_id = detail.id
+        detail.delete()
+        self.settle()
+        page = get_price_changes(self.location.id, token)
+        self.assertEqual((page.price_list_details, page.deleted_price_list_detail_ids), ([], [detail_id]))
+
+
+class RepricingTests(PricingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.detail = self.make_detail(self.make_price_list("Base"), retail="2.50")
+
+    def reprice(self, *rules, **options):
+        result = reprice_price_details(get_reprice_queryset(location_id=self.location.id), list(rules), **options)
+        self.detail.refresh_from_db()
+        return result
+
+    def test_percent(self):
+        result = self.reprice({"field": "store_retail", "percent": 10})
+        self.assertEqual(result["steps"], [{"field": "store_retail", "operation": "percent", "rows": 1},
+                                           {"field": "store_gp_pct", "operation": "recompute", "rows": 1}])
+        self.assertEqual((self.detail.store_retail, self.detail.store_gp_pct), (Decimal("2.75"), Decimal("63.64")))
+        self.assertEqual(self.detail.base_retail, Decimal("2.50"))
+
+    def test_amount(self):
+        self.reprice({"field": "base_retail", "amount": "-0.51"})
+        self.assertEqual((self.detail.base_retail, self.detail.base_gp_pct), (Decimal("1.99"), Decimal("49.75")))
+
+    def test_target_gp_pct(self):
+        self.reprice({"field": "store_retail", "target_gp_pct": 60})
+        self.assertEqual((self.detail.store_retail, self.detail.store_gp_pct), (Decimal("2.50"), Decimal("60.00")))
+
+    def test_round_to_keeps_prices_already_ending_there(self):
+        self.reprice({"field": "store_retail", "round_to": "0.99"})
+        self.assertEqual(self.detail.store_retail, Decimal("2.99"))
+        self.reprice({"field": "store_retail", "round_to": "0.99"})
+        self.assertEqual(self.detail.store_retail, Decimal("2.99"))
+
+    def test_cost_change_recomputes_both_margins(self):
+        result = self.reprice({"field": "net_cost", "percent": 20}, {"field": "store_retail", "round_to": "0.49"})
+        self.assertEqual([step["field"] for step in result["steps"]],
+                         ["net_cost", "store_retail", "base_gp_pct", "store_gp_pct"])
+        self.assertEqual(self.detail.net_cost, 1.2)
+        self.assertEqual((self.detail.store_retail, self.detail.store_gp_pct), (Decimal("3.49"), Decimal("65.62")))
+        self.assertEqual(self.detail.base_gp_pct, Decimal("52.00"))
+
+    def test_dry_run_rolls_back(self):
+        before = list(SyncChange.objects.values_list("id", flat=True))
+        result = self.reprice({"field": "store_retail", "percent": 10}, dry_run=True)
+        self.assertEqual((result["matched"], result["dry_run"]), (1, True))
+        self.assertEqual(result["steps"][0]["rows"], 1)
+        self.assertEqual((self.detail.store_retail, self.detail.store_gp_pct), (Decimal("2.50"), Decimal("30.00")))
+        self.assertFalse(SyncChange.objects.exclude(id__in=before).exists())
+
+    def test_scope_and_invalid_rules(self):
+        other = self.make_detail(self.make_price_list("Other"), product=self.make_product("000000000002"))
+        department = Department.objects.create(department_no="2", department_name="Bakery")
+        Product.objects.filter(id=other.product_id).update(department=department)
+        self.assertEqual(list(get_reprice_queryset(department_id=department.id).values_list("id", flat=True)),
+                         [other.id])
+        for rule in ({"field": "name", "percent": 1}, {"field": "store_retail"},
+                     {"field": "store_retail", "percent": 1, "amount": 1}, {"field": "net_cost", "target_gp_pct": 10},
+                     {"field": "store_retail", "round_to": 1}, {"field": "store_retail", "percent": -100}):
+            with self.assertRaises(ValueError):
+                self.reprice(rule)
+
+
+@skipIf(numpy is None, "What-if simulations require numpy.")
+class SimulationTests(PricingTestCase):
+    def test_simulation_matches_repricing(self):
+        bakery = Department.objects.create(department_no="2", department_name="Bakery")
+        price_list = self.make_price_list("Base")
+        generator = random.Random(11)
+        for index in range(40):
+            product = self.make_product(f"{index + 2:012d}")
+            if index % 3 == 0:
+                Product.objects.filter(id=product.id).update(department=bakery)
+            self.make_detail(price_list, product=product, retail=f"{generator.randint(100, 2000) / 100:.2f}",
+                             net_cost=generator.randint(50, 900) / 100, store_movement=generator.randint(0, 50))
+        rules = [{"field": "net_cost", "percent": "3.5"}, {"field": "store_retail", "target_gp_pct": 35},
+                 {"field": "store_retail", "round_to": "0.99"}, {"field": "store_retail", "amount": "-0.10"}]
+        queryset = get_reprice_queryset(price_list_id=price_list.id)
+
+        simulation = simulate_price_details(queryset, rules)
+        reprice_price_details(queryset, rules)
+        departments = {}
+        for department_id, retail, net_cost, movement in queryset.values_list(
+                "product__department_id", "store_retail", "net_cost", "store_movement"):
+            totals = departments.setdefault(department_id, [0.0, 0.0])
+            totals[0] += float(retail) * movement
+            totals[1] += (float(retail) - net_cost) * movement
+        self.assertEqual(simulation["rows"], 40)
+        self.assertAlmostEqual(simulation["total"].new_revenue, sum(revenue for revenue, _ in departments.values()),
+                               places=2)
+        self.assertAlmostEqual(simulation["total"].new_gross_profit, sum(profit for _, profit in departments.values()),
+                               places=2)
+        for group in simulation["departments"]:
+            self.assertAlmostEqual(group.new_revenue, departments[group.id][0], places=2)
+            self.assertAlmostEqual(group.new_gross_profit, departments[group.id][1], places=2)
 
-# Create your tests here.
@@ -1,14 +1,110 @@
-from .models import Store, Location
-from accounts.models import User
-
-def get_all_store_ids(user_id):
-    user = User.objects.get(id = user_id)
-    stores_ids = []
-        
-    user_locations = Location.objects.filter(location_manager = user.id).values_list("id", flat=True)
-    user_stores = Store.objects.filter(store_manager = user.id).values_list("id", flat=True)
-    location_stores = Store.objects.filter(store_location_id__in = user_locations).values_list("id", flat=True)
-    stores_ids = list(stores_ids) + list(location_stores) + list(user_stores)
-    stores_ids = set(stores_ids)
-    stores_ids = list(stores_ids)
-    return stores_ids
\ No newline at end of file
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import PriceListDetail, Store
+
+
+STORE_ACCESS_VERSION_KEY = "store-access:version"
+
+
+def get_store_scope(user):
+    """
+    Return the filter selecting the stores `user` may access.
+
+    A user reaches the stores they manage and every store at a location they
+    manage. The scope is a join on the store's manager and location manager,
+    so it stays a single query however many stores the user oversees.
+
+    Args:
+        user: The requesting user.
+
+    Returns:
+        Q: The filter for `Store` querysets, or None when the user is not restricted.
+    """
+    if user.is_superuser:
+        return None
+    return Q(manager_id=user.id) | Q(location__location_manager_id=user.id)
+
+
+def get_user_stores(user, queryset=None):
+    """
+    Restrict `queryset` (all stores by default) to the stores `user` may access.
+    """
+    if queryset is None:
+        queryset = Store.objects.all()
+    scope = get_store_scope(user)
+    if scope is None:
+        return queryset
+    return queryset.filter(scope)
+
+
+def get_store_access_version():
+    """
+    Return the current version of the cached store access indexes.
+    """
+    version = cache.get(STORE_ACCESS_VERSION_KEY)
+    if version is None:
+        cache.add(STORE_ACCESS_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(STORE_ACCESS_VERSION_KEY)
+    return version
+
+
+def invalidate_store_access():
+    """
+    Drop every cached store access index.
+
+    Called by the signals in `products.signals` whenever a store's manager or
+    location, or a location's manager, changes.
+    """
+    cache.set(STORE_ACCESS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_accessible_store_ids(user):
+    """
+    Return the ids of the stores `user` may access, computed once and cached.
+
+    Args:
+        user: The requesting user.
+
+    Returns:
+        frozenset: The store ids, or None when the user is not restricted.
+    """
+    if user.is_superuser:
+        return None
+    key = f"store-access:{get_store_access_version()}:{user.id}"
+    store_ids = cache.get(key)
+    if store_ids is None:
+        store_ids = frozenset(get_user_stores(user).values_list("id", flat=True))
+        cache.set(key, store_ids, getattr(settings, "STORE_ACCESS_CACHE_TTL", 300))
+    return store_ids
+
+
+def can_access_store(user, store_id):
+    """
+    Tell whether `user` may access the store with id `store_id`.
+    """
+    store_ids = get_accessible_store_ids(user)
+    return store_ids is None or store_id in store_ids
+
+
+def can_access_location(user, location_id):
+    """
+    Tell whether `user` may access a store of the location with id `location_id`.
+    """
+    store_ids = get_accessible_store_ids(user)
+    return store_ids is None or Store.objects.filter(id__in=store_ids, location_id=location_id).exists()
+
+
+def get_price_list_scope(price_list):
+    """
+    Return the ids of the locations and products whose prices depend on `price_list`.
+    """
+    location_ids, product_ids = {price_list.location_id}, set()
+    for location_id, product_id in (PriceListDetail.objects.filter(price_list_id=price_list.id).order_by()
+                                    .values_list("location_id", "product_id").distinct()):
+        location_ids.add(location_id)
+        product_ids.add(product_id)
+    return location_ids, product_ids
@@ -1,3 +1,300 @@
-from django.shortcuts import render
+import json
+import os
+import uuid
 
-# Create your views here.
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from jobs.registry import enqueue
+from products.models import Location, PriceImport, PriceList, PriceSnapshot, Vendor
+from products.price_diffs import PriceListDiff
+from products.schemas.effective_prices import PRICE_READ_ROLES
+from products.snapshots import build_price_snapshot
+from products.sync import get_price_changes, get_sync_location_id, make_sync_token
+from utils.funct import get_integer_id
+
+
+PRICE_IMPORT_ROLES = ["admin", "store_manager", "location_manager"]
+
+
+def serialize_price_import(price_import):
+    return {
+        "id": price_import.id,
+        "name": price_import.name,
+        "status": price_import.status,
+        "price_list_id": price_import.price_list_id,
+        "rows_imported": price_import.rows_imported,
+        "rows_failed": price_import.rows_failed,
+        "checkpoint_row": price_import.checkpoint_row,
+        "errors": price_import.errors,
+        "warnings": price_import.warnings,
+        "message": price_import.message,
+    }
+
+
+def serialize_price_list_detail(detail):
+    price_list = detail.price_list
+    return {
+        "id": detail.id,
+        "price_list_id": detail.price_list_id,
+        "product_id": detail.product_id,
+        "vendor_id": detail.vendor_id,
+        "uom_id": detail.uom_id,
+        "upc": detail.upc,
+        "item_number": detail.item_number,
+        "pack": detail.pack,
+        "size": detail.size,
+        "net_cost": detail.net_cost,
+        "base_retail": str(detail.base_retail),
+        "store_retail": str(detail.store_retail),
+        "status": detail.status,
+        "effective_start_date": detail.effective_start_date,
+        "effective_end_date": detail.effective_end_date,
+        "price_list_status": price_list.status,
+        "price_list_effective_start_date": price_list.effective_start_date,
+        "price_list_effective_end_date": price_list.effective_end_date,
+        "updated_at": detail.updated_at,
+    }
+
+
+def serialize_product(product):
+    return {
+        "id": product.id,
+        "department_id": product.department_id,
+        "category_id": product.category_id,
+        "uom_id": product.uom_id,
+        "upc": product.upc,
+        "item_code": product.item_code,
+        "full_description": product.full_description,
+        "abbrivated_description": product.abbrivated_description,
+        "pack": product.pack,
+        "size": product.size,
+        "tax": product.tax,
+        "updated_at": product.updated_at,
+    }
+
+
+class PriceImportAPIView(APIView):
+    """
+    API view for uploading a vendor price file and importing it into a new price list.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Handle POST request with a multipart `file` and the price list's `vendor_id` and `location_id`.
+
+        The file is imported by a background job; the import is returned right
+        away and its progress read from `PriceImportDetailAPIView`.
+        """
+        user = request.user
+        if not user.is_superuser and user.role not in PRICE_IMPORT_ROLES:
+            return Response({"detail": "You don't have permission to import Price Lists."},
+                            status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "file is required."}, status=status.HTTP_400_BAD_REQUEST)
+        extension = os.path.splitext(upload.name)[1].lower()
+        if extension not in (".csv", ".xlsx", ".xlsm"):
+            return Response({"detail": "file must be a .csv or .xlsx file."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            vendor_id = get_integer_id(request.data.get("vendor_id"))
+            location_id = get_integer_id(request.data.get("location_id"))
+        except Exception:
+            return Response({"detail": "vendor_id and location_id are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if not Vendor.objects.filter(id=vendor_id).exists():
+            return Response({"detail": f"Vendor not found. with this id {vendor_id}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not Location.objects.filter(id=location_id).exists():
+            return Response({"detail": f"Location not found. with this id {location_id}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        price_list_status = request.data.get("status") or PriceList.ACTIVE
+        statuses = [choice for choice, _ in PriceList.STATUS_CHOICES]
+        if price_list_status not in statuses:
+            return Response({"detail": f"status value must be one of {', '.join(statuses)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        dates = {}
+        for field in ("effective_start_date", "effective_end_date"):
+            value = request.data.get(field) or None
+            try:
+                dates[field] = parse_date(value) if value else None
+            except ValueError:
+                dates[field] = None
+            if value and dates[field] is None:
+                return Response({"detail": f"{field} must be a date (YYYY-MM-DD)."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        # Spool the upload to disk chunk by chunk so the importer can stream it and resume from it.
+        directory = settings.PRICE_IMPORT_DIR
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f"{uuid.uuid4().hex}{extension}")
+        with open(file_path, "wb") as price_file:
+            for chunk in upload.chunks():
+                price_file.write(chunk)
+
+        price_import = PriceImport.objects.create(
+            file_path=file_path,
+            name=request.data.get("name") or upload.name,
+            vendor_id=vendor_id,
+            location_id=location_id,
+            price_list_status=price_list_status,
+            created_by=user,
+            **dates,
+        )
+        # Retried jobs resume after the last committed chunk.
+        job = enqueue("products.import_price_file", {"price_import_id": price_import.id}, user=user, max_attempts=3)
+        return Response(dict(serialize_price_import(price_import), job_id=job.id), status=status.HTTP_202_ACCEPTED)
+
+
+class PriceImportDetailAPIView(APIView):
+    """
+    API view for reading the progress of a price file import.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Handle GET request for one price import.
+        """
+        user = request.user
+        if not user.is_superuser and user.role not in PRICE_IMPORT_ROLES:
+            return Response({"detail": "You don't have permission to read Price Imports."},
+                            status=status.HTTP_403_FORBIDDEN)
+        price_import = PriceImport.objects.filter(id=pk).first()
+        if price_import is None:
+            return Response({"detail": "Price import not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_price_import(price_import), status=status.HTTP_200_OK)
+
+
+class PriceChangesAPIView(APIView):
+    """
+    API view for store devices syncing the price list details and products changed since their last sync.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Handle GET request with a `store` or `location` id, the last `token` and an optional `limit`.
+        """
+        user = request.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            return Response({"detail": "You don't have permission to read Price details."},
+                            status=status.HTTP_403_FORBIDDEN)
+        try:
+            store_id = request.query_params.get("store")
+            location_id = request.query_params.get("location")
+            limit = request.query_params.get("limit")
+            location_id = get_sync_location_id(user, get_integer_id(location_id) if location_id else None,
+                                               get_integer_id(store_id) if store_id else None)
+            changes = get_price_changes(location_id, request.query_params.get("token"), int(limit) if limit else None)
+        except PermissionError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "token": changes.token,
+            "has_more": changes.has_more,
+            "reset": changes.reset,
+            "price_list_details": [serialize_price_list_detail(detail) for detail in changes.price_list_details],
+            "products": [serialize_product(product) for product in changes.products],
+            "deleted_price_list_detail_ids": changes.deleted_price_list_detail_ids,
+            "deleted_product_ids": changes.deleted_product_ids,
+        }, status=status.HTTP_200_OK)
+
+
+class PriceSnapshotAPIView(APIView):
+    """
+    API view for downloading the price snapshot a store device starts from.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Handle GET request with a `store` or `location` id.
+
+        The gzipped snapshot is served with its ETag, or 304 when `If-None-Match`
+        already names it. `X-Sync-Token` is the change feed token to sync from.
+        """
+        user = request.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            return Response({"detail": "You don't have permission to read Price details."},
+                            status=status.HTTP_403_FORBIDDEN)
+        try:
+            store_id = request.query_params.get("store")
+            location_id = request.query_params.get("location")
+            location_id = get_sync_location_id(user, get_integer_id(location_id) if location_id else None,
+                                               get_integer_id(store_id) if store_id else None)
+        except PermissionError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        snapshot = PriceSnapshot.objects.filter(location_id=location_id).first()
+        if snapshot is None or not os.path.exists(snapshot.file_path):
+            snapshot, _ = build_price_snapshot(location_id, force=True)
+        etag = quote_etag(snapshot.etag)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache",
+                   "X-Sync-Token": make_sync_token(location_id, snapshot.sync_change_id)}
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or any(
+                tag.removeprefix("W/") == etag for tag in parse_etags(if_none_match))):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(snapshot.file_path, "rb"), content_type="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+
+
+def serialize_price_list_diff_row(row):
+    return {
+        "change": row.change,
+        "upc": row.upc,
+        "location_id": row.location_id,
+        "from_id": row.from_id,
+        "to_id": row.to_id,
+        "values": row.values,
+        "changes": {field: {"old": old, "new": new} for field, (old, new) in row.changes.items()},
+    }
+
+
+class PriceListDiffAPIView(APIView):
+    """
+    API view streaming the differences between two price lists as newline-delimited JSON.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Handle GET request with the `from` and `to` price list ids.
+
+        Each line is a differing row; the last line holds the counts, under `summary`.
+        """
+        user = request.user
+        if not user.is_superuser and user.role not in PRICE_READ_ROLES:
+            return Response({"detail": "You don't have permission to read Price Lists."},
+                            status=status.HTTP_403_FORBIDDEN)
+        from_id, to_id = request.query_params.get("from"), request.query_params.get("to")
+        if not from_id or not to_id:
+            return Response({"detail": "The from and to price list ids are required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            from_id, to_id = get_integer_id(from_id), get_integer_id(to_id)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if PriceList.objects.filter(id__in=[from_id, to_id]).count() != len({from_id, to_id}):
+            return Response({"detail": "Price list not found."}, status=status.HTTP_404_NOT_FOUND)
+        diff = PriceListDiff(from_id, to_id)
+
+        def lines():
+            for row in diff:
+                yield json.dumps(serialize_price_list_diff_row(row), cls=DjangoJSONEncoder) + "\n"
+            yield json.dumps({"summary": diff.counts}) + "\n"
+
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
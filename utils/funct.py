@@ -1,10 +1,20 @@
 from graphene import Int
-from base64 import b64decode
+from base64 import b64decode, b64encode
+from datetime import datetime
+import hashlib
+import json
 from graphene import relay
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+from graphql import GraphQLError
+from graphql_relay import cursor_to_offset, get_offset_with_default, offset_to_cursor
 
 
 
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, models
+from django.db.models import ProtectedError, Q, QuerySet
 
 class CustomManager(models.Manager):
     def get_queryset(self):
@@ -43,6 +53,34 @@ def get_integer_id(id):
 
 
 
+def delete_instance(instance):
+    """
+    Delete `instance` and the rows cascading from it.
+
+    Raises:
+        ValueError: If rows that are never deleted with it, such as price list
+        details, still refer to it or to a row of its cascade.
+    """
+    try:
+        instance.delete()
+    except ProtectedError as exc:
+        names = sorted({str(obj._meta.verbose_name_plural) for obj in exc.protected_objects})
+        raise ValueError(f"{str(instance._meta.verbose_name).capitalize()} cannot be deleted while "
+                         f"{' and '.join(names)} refer to it.")
+
+
+def get_default_ordering(model):
+    """
+    Return the ordering of connections over `model` that do not order themselves.
+
+    Newest rows come first, with the primary key breaking ties, which is what
+    the `(created_at, id)` indexes of the listed models are built for.
+    """
+    if any(field.name == "created_at" for field in model._meta.concrete_fields):
+        return ("-created_at", "-pk")
+    return ("-pk",)
+
+
 class CountedConnection(relay.Connection):
     """
     A custom GraphQL connection class that includes a total count of items in the connection.
@@ -58,6 +96,11 @@ class CountedConnection(relay.Connection):
     class Meta:
         abstract = True
 
+    # Connections of large tables can opt into keyset pagination, see `KeysetConnection`.
+    keyset = False
+    # Answer `totalCount` of unfiltered lists from the table statistics instead of COUNT(*).
+    estimate_total_count = False
+
     total_count = Int()
 
     def resolve_total_count(self, info, **kwargs):
@@ -71,5 +114,261 @@ class CountedConnection(relay.Connection):
         Returns:
             int: The total number of items in the connection.
         """
+        # Pages built by `CountedConnectionField` do not count the rows up front,
+        # they are only counted when `totalCount` is selected
+        if self.length is None:
+            return count_queryset(self.iterable, estimate=self.estimate_total_count)
         # Return the length of the edge list which represents the total count of items
-        return self.length
\ No newline at end of file
+        return self.length
+
+    @classmethod
+    def connection_from_offset(cls, queryset, args, max_limit=None):
+        """
+        Build a page of the connection from relay's offset cursors without counting the rows.
+
+        One extra row is fetched to tell whether there is a next page, which is
+        all the page info needs when paginating forward.
+
+        Args:
+            queryset (QuerySet): The filtered queryset of the connection.
+            args (dict): The pagination arguments (`first`, `after`, `offset`).
+            max_limit (int): Page size used when `first` is not given.
+
+        Returns:
+            CountedConnection: The requested page.
+        """
+        offset = args.pop("offset", None)
+        after = args.get("after")
+        if offset:
+            if after:
+                offset += cursor_to_offset(after) + 1
+            # input offset starts at 1 while the graphene offset starts at 0
+            after = offset_to_cursor(offset - 1)
+        start = get_offset_with_default(after, -1) + 1
+        first = args.get("first")
+        if first is None:
+            first = max_limit
+
+        if first is None:
+            rows = list(queryset[start:])
+            has_next_page = False
+        else:
+            rows = list(queryset[start:start + first + 1])
+            has_next_page = len(rows) > first
+            rows = rows[:first]
+
+        edges = [cls.Edge(node=row, cursor=offset_to_cursor(start + index)) for index, row in enumerate(rows)]
+        connection = cls(
+            edges=edges,
+            page_info=relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=False,
+                has_next_page=has_next_page,
+            ),
+        )
+        connection.iterable = queryset
+        connection.length = None
+        return connection
+
+    @classmethod
+    def connection_from_keyset(cls, queryset, args, max_limit=None):
+        """
+        Build a page of the connection by seeking on the `(created_at, id)` sort key.
+
+        Cursors encode the sort key of their row instead of a position, so the
+        database seeks straight to the page with an indexed range condition
+        rather than skipping `OFFSET n` rows; page N costs the same as page 1.
+
+        Args:
+            queryset (QuerySet): The filtered queryset of the connection.
+            args (dict): The pagination arguments (`first`, `last`, `after`, `before`).
+            max_limit (int): Page size used when neither `first` nor `last` is given.
+
+        Returns:
+            CountedConnection: The requested page.
+        """
+        if args.get("offset"):
+            raise GraphQLError("offset is not supported by this connection, use after/before cursors.")
+        first = args.get("first")
+        last = args.get("last")
+        after = args.get("after")
+        before = args.get("before")
+        if first is None and last is None:
+            first = max_limit
+
+        page = queryset.order_by("-created_at", "-pk")
+        loaded_fields, deferred = page.query.deferred_loading
+        if loaded_fields and not deferred:
+            # The cursors read the sort key, keep it loaded next to the only() columns.
+            page = page.only(*loaded_fields, "created_at")
+        if after:
+            created_at, pk = decode_keyset_cursor(after)
+            page = page.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        if before:
+            created_at, pk = decode_keyset_cursor(before)
+            page = page.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+
+        if first is None:
+            # Paginating backwards: read the rows just before `before` in reverse order.
+            rows = list(page.reverse()[:last + 1])
+            has_previous_page = len(rows) > last
+            rows = rows[:last][::-1]
+            has_next_page = bool(before)
+        else:
+            rows = list(page[:first + 1])
+            has_next_page = len(rows) > first
+            rows = rows[:first]
+            if last is not None:
+                rows = rows[-last:] if last else []
+            has_previous_page = bool(after)
+
+        edges = [cls.Edge(node=row, cursor=encode_keyset_cursor(row)) for row in rows]
+        connection = cls(
+            edges=edges,
+            page_info=relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous_page,
+                has_next_page=has_next_page,
+            ),
+        )
+        connection.iterable = queryset
+        connection.length = None
+        return connection
+
+
+class KeysetConnection(CountedConnection):
+    """
+    A `CountedConnection` paginated by `(created_at, id)` keyset cursors.
+
+    Use it as the `connection_class` of a type listed through a
+    `CountedConnectionField` when its table is too large for offset paging.
+    Such tables are also too large to count for an unfiltered `totalCount`,
+    which is estimated from the table statistics instead.
+    """
+
+    class Meta:
+        abstract = True
+
+    keyset = True
+    estimate_total_count = True
+
+
+def encode_keyset_cursor(instance):
+    """Encode the `(created_at, id)` sort key of `instance` into an opaque cursor."""
+    key = json.dumps([instance.created_at.isoformat(), instance.pk])
+    return b64encode(f"keyset:{key}".encode("utf-8")).decode("utf-8")
+
+
+def decode_keyset_cursor(cursor):
+    """Decode a cursor made by `encode_keyset_cursor` into `(created_at, id)`."""
+    try:
+        prefix, key = b64decode(cursor).decode("utf-8").split(":", 1)
+        created_at, pk = json.loads(key)
+        if prefix != "keyset":
+            raise ValueError(prefix)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError):
+        raise GraphQLError(f"Invalid cursor: {cursor}")
+
+
+def estimate_row_count(model, using="default"):
+    """
+    Return the row count of `model`'s table from the database statistics.
+
+    Args:
+        model: The Django model whose table is estimated.
+        using (str): The database alias.
+
+    Returns:
+        int: The estimated number of rows, or None when the database has no
+        statistics for the table yet.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == "mysql":
+                cursor.execute("SELECT table_rows FROM information_schema.tables "
+                               "WHERE table_schema = DATABASE() AND table_name = %s", [table])
+            elif connection.vendor == "sqlite":
+                # sqlite_stat1 only exists once ANALYZE has been run
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    # postgres reports -1 for tables that were never analyzed
+    return count if count >= 0 else None
+
+
+def count_queryset(queryset, estimate=False):
+    """
+    Count the rows of `queryset`, caching the result per filter signature.
+
+    The cache key is the SQL of the count query and its parameters, so every
+    distinct combination of filters (and of access scope) has its own entry
+    which lives for `GRAPHQL_COUNT_CACHE_TTL` seconds.
+
+    Args:
+        queryset (QuerySet): The queryset to count.
+        estimate (bool): Use `estimate_row_count` when the queryset is not filtered.
+
+    Returns:
+        int: The number of rows.
+    """
+    if not isinstance(queryset, QuerySet):
+        return len(queryset)
+    queryset = queryset.order_by()
+    if estimate and not queryset.query.where:
+        estimated = estimate_row_count(queryset.model, using=queryset.db)
+        if estimated is not None:
+            return estimated
+
+    ttl = getattr(settings, "GRAPHQL_COUNT_CACHE_TTL", 60)
+    if not ttl:
+        return queryset.count()
+    sql, params = queryset.values("pk").query.sql_with_params()
+    signature = hashlib.sha256(f"{queryset.db}:{sql}:{params!r}".encode("utf-8")).hexdigest()
+    key = f"graphql-count:{signature}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, ttl)
+    return count
+
+
+class CountedConnectionField(DjangoFilterConnectionField):
+    """
+    A `DjangoFilterConnectionField` for `CountedConnection` types that never
+    counts the rows just to build a page.
+
+    Types whose connection class is a `KeysetConnection` are paged with
+    `CountedConnection.connection_from_keyset`, forward offset paging uses
+    `CountedConnection.connection_from_offset`. Only backward offset paging
+    (`last`/`before`) needs the length of the list and keeps relay's slicing.
+    """
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        if getattr(connection, "keyset", False):
+            return connection.connection_from_keyset(iterable, args, max_limit=max_limit)
+        iterable = maybe_queryset(iterable)
+        if isinstance(iterable, QuerySet) and not iterable.ordered:
+            # Offsets are only stable over a deterministic order.
+            iterable = iterable.order_by(*get_default_ordering(iterable.model))
+        if (
+            isinstance(iterable, QuerySet)
+            and issubclass(connection, CountedConnection)
+            and args.get("last") is None
+            and args.get("before") is None
+        ):
+            return connection.connection_from_offset(iterable, args, max_limit=max_limit)
+        return super().resolve_connection(connection, args, iterable, max_limit=max_limit)
\ No newline at end of file
@@ -7,15 +7,85 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.settings import api_settings
 
-from graphene_django.views import GraphQLView
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponseNotAllowed
+from django.http.response import HttpResponseBadRequest
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, parse, validate_schema
+from graphql.validation import validate
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
 from graphene_django.registry import get_global_registry
 import sentry_sdk
 
+from utils.persisted import persisted_queries
+
 
 registry = get_global_registry()
 SUPPORTED_FIELDS = ["title", "requirement"]
 
 
+class DocumentCache:
+    """
+    A bounded LRU cache of parsed and validated GraphQL documents.
+
+    Entries are keyed by the sha256 of the query text and hold the parsed
+    document together with its validation errors, so a repeated operation
+    skips lexing, parsing and validation entirely.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def get_key(query):
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Return the hit, miss and eviction counters and the current size.
+        """
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+document_cache = DocumentCache(getattr(settings, "GRAPHQL_DOCUMENT_CACHE_SIZE", 256))
+
+
 class DRFAuthenticatedGraphQLView(GraphQLView):
     def parse_body(self, request):
         if isinstance(request, Request):
@@ -33,13 +103,151 @@ class DRFAuthenticatedGraphQLView(GraphQLView):
     
     
 class SentryGraphQLView(DRFAuthenticatedGraphQLView):
+    document_cache = document_cache
+    persisted_queries = persisted_queries
+
+    def get_response(self, request, data, show_graphiql=False):
+        """
+        Resolve automatic persisted queries before running the request.
+
+        A client sends ``extensions.persistedQuery.sha256Hash`` alone; when the
+        hash is unknown it gets a ``PERSISTED_QUERY_NOT_FOUND`` error and retries
+        with the full query text, which is then registered under that hash once
+        it parses and validates. Queries over the length limit run without
+        being registered.
+        """
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted_query = (extensions or {}).get("persistedQuery")
+        if not persisted_query:
+            return super().get_response(request, data, show_graphiql)
+
+        sha256_hash = persisted_query.get("sha256Hash")
+        query = request.GET.get("query") or data.get("query")
+        if query:
+            if self.persisted_queries.get_hash(query) != sha256_hash:
+                return self._persisted_query_error(request, "provided sha does not match query", "PERSISTED_QUERY_HASH_MISMATCH")
+            if self.persisted_queries.can_persist(query) and self._is_valid_query(query):
+                self.persisted_queries.set(sha256_hash, query)
+        else:
+            query = self.persisted_queries.get(sha256_hash)
+            if query is None:
+                return self._persisted_query_error(request, "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+            data = dict(data.items(), query=query)
+        return super().get_response(request, data, show_graphiql)
+
+    def _is_valid_query(self, query):
+        try:
+            document, validation_errors = self.get_document(self.schema.graphql_schema, query)
+        except Exception:
+            return False
+        return not validation_errors
+
+    def _persisted_query_error(self, request, message, code):
+        response = {"errors": [{"message": message, "extensions": {"code": code}}]}
+        return self.json_encode(request, response), 200
+
     def execute_graphql_request(self, *args, **kwargs):
         """Extract any exceptions and send them to Sentry"""
-        result = super().execute_graphql_request(*args, **kwargs)
-        if result.errors:
+        result = self._execute_cached_request(*args, **kwargs)
+        if result and result.errors:
             self._capture_sentry_exceptions(result.errors)
         return result
 
+    def get_document(self, schema, query):
+        """
+        Return the parsed document and validation errors of `query`, from the
+        document cache when the same query text was seen before.
+
+        Syntax errors are not cached and raise like `graphql.parse` does.
+        """
+        key = self.document_cache.get_key(query)
+        entry = self.document_cache.get(key)
+        if entry is None:
+            document = parse(query)
+            validation_errors = validate(
+                schema,
+                document,
+                self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+            entry = (document, validation_errors)
+            self.document_cache.set(key, entry)
+        return entry
+
+    def _execute_cached_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        """
+        Same flow as `GraphQLView.execute_graphql_request` with parsing and
+        validation served by `get_document`.
+        """
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = self.get_document(schema, query)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(operation_ast.operation.value),
+                )
+            )
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
     def _capture_sentry_exceptions(self, errors):
         for error in errors:
             try:
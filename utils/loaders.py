@@ -0,0 +1,154 @@
+from django.db import models
+from django.db.models import QuerySet
+
+
+def get_level_key(path):
+    """
+    Return the response path of a field with the list indices removed.
+
+    Every node of a list shares the same level key, e.g. the ``node`` objects of
+    ``stores.edges.0.node`` and ``stores.edges.1.node`` are both at
+    ``("stores", "edges", "node")``.
+    """
+    keys = []
+    while path is not None:
+        if isinstance(path.key, str):
+            keys.append(path.key)
+        path = path.prev
+    return tuple(reversed(keys))
+
+
+class ModelLoader:
+    """
+    Per-request loader that fetches instances of one model by primary key.
+
+    Keys are collected with `prime` and fetched in a single ``pk__in`` query;
+    every instance that was loaded once is served from the cache afterwards.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.cache = {}
+
+    def prime(self, keys):
+        """
+        Fetch every key that is not cached yet with one query.
+        """
+        missing = {key for key in keys if key is not None and key not in self.cache}
+        if not missing:
+            return
+        for instance in self.model._default_manager.filter(pk__in=missing).order_by():
+            self.cache[instance.pk] = instance
+        for key in missing:
+            self.cache.setdefault(key, None)
+
+    def load(self, key):
+        """
+        Return the instance for `key`, or None if it does not exist.
+        """
+        if key is None:
+            return None
+        if key not in self.cache:
+            self.prime([key])
+        return self.cache[key]
+
+    def load_many(self, keys):
+        """
+        Return the instances for `keys`, in the same order.
+        """
+        keys = list(keys)
+        self.prime(keys)
+        return [self.cache.get(key) for key in keys]
+
+
+class LoaderRegistry:
+    """
+    Loaders and resolved rows of one GraphQL request.
+
+    `levels` maps a level key to the model instances resolved at that level so
+    that the first `*_details` resolver of a level can load the related rows of
+    all its siblings at once.
+    """
+    def __init__(self):
+        self.loaders = {}
+        self.levels = {}
+        self.primed = {}
+
+    def loader_for(self, model):
+        if model not in self.loaders:
+            self.loaders[model] = ModelLoader(model)
+        return self.loaders[model]
+
+    def register(self, path, items):
+        """
+        Remember the model instances returned by a list field.
+        """
+        first = items[0]
+        if isinstance(first, models.Model):
+            self.levels.setdefault(get_level_key(path), []).extend(items)
+        elif isinstance(getattr(first, "node", None), models.Model):
+            # Connection edges, the instances are resolved one level deeper.
+            level = get_level_key(path) + ("node",)
+            self.levels.setdefault(level, []).extend(item.node for item in items)
+
+
+def get_registry(info):
+    """
+    Return the loader registry of the current request, creating it if needed.
+    """
+    registry = getattr(info.context, "_loader_registry", None)
+    if registry is None:
+        registry = LoaderRegistry()
+        setattr(info.context, "_loader_registry", registry)
+    return registry
+
+
+def load_related(info, instance, field_name, model=None):
+    """
+    Load the object `instance` points to through the request's loaders.
+
+    Args:
+        info: The GraphQL resolution information.
+        instance: The model instance being resolved.
+        field_name (str): A foreign key name (``"manager"``) or, together with
+            `model`, a plain integer id attribute (``"<name>_id"``).
+        model: Target model for plain integer id attributes.
+
+    Returns:
+        The related instance, or None.
+    """
+    field = None
+    if model is None:
+        field = instance._meta.get_field(field_name)
+        if field.is_cached(instance):
+            return getattr(instance, field.name)
+        model, attname = field.related_model, field.attname
+    else:
+        attname = field_name
+
+    registry = get_registry(info)
+    loader = registry.loader_for(model)
+    level = get_level_key(info.path.prev)
+    siblings = registry.levels.get(level, ())
+    primed = registry.primed.get((level, attname), 0)
+    if primed < len(siblings):
+        loader.prime(getattr(sibling, attname, None) for sibling in siblings[primed:])
+        registry.primed[(level, attname)] = len(siblings)
+
+    related = loader.load(getattr(instance, attname))
+    if field is not None and related is not None:
+        field.set_cached_value(instance, related)
+    return related
+
+
+class LoaderMiddleware:
+    """
+    Graphene middleware that records the rows of every list field so that
+    `load_related` can batch the foreign keys of a whole level.
+    """
+    def resolve(self, next, root, info, **args):
+        result = next(root, info, **args)
+        if isinstance(result, QuerySet):
+            result = list(result)
+        if isinstance(result, (list, tuple)) and result:
+            get_registry(info).register(info.path, result)
+        return result
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from django.conf import settings
+
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PersistedQueryStore:
+    """
+    Storage for automatic persisted queries (APQ).
+
+    Queries are kept in a bounded in-memory LRU tier in front of a durable
+    directory holding one ``<sha256>.graphql`` file per query, so every worker
+    process can serve a hash registered by any other one, also after restarts.
+    The directory keeps at most `maxfiles` queries, the least recently
+    registered or loaded ones are removed first.
+    """
+    def __init__(self, directory=None, maxsize=1024, maxfiles=10000, max_length=20000):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.maxfiles = maxfiles
+        self.max_length = max_length
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_hash(query):
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_valid_hash(sha256_hash):
+        return isinstance(sha256_hash, str) and bool(SHA256_PATTERN.match(sha256_hash))
+
+    def _path(self, sha256_hash):
+        return os.path.join(self.directory, f"{sha256_hash}.graphql")
+
+    def _remember(self, sha256_hash, query):
+        with self.lock:
+            self.entries[sha256_hash] = query
+            self.entries.move_to_end(sha256_hash)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def _evict_files(self):
+        paths = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".graphql"):
+                    try:
+                        paths.append((entry.stat().st_mtime, entry.path))
+                    except FileNotFoundError:
+                        pass
+        if len(paths) <= self.maxfiles:
+            return
+        paths.sort()
+        for _, path in paths[:len(paths) - self.maxfiles]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process evicted it first.
+                pass
+
+    def can_persist(self, query):
+        return isinstance(query, str) and len(query) <= self.max_length
+
+    def get(self, sha256_hash):
+        """
+        Return the query text registered for `sha256_hash`, or None.
+        """
+        if not self.is_valid_hash(sha256_hash):
+            return None
+        with self.lock:
+            query = self.entries.get(sha256_hash)
+            if query is not None:
+                self.entries.move_to_end(sha256_hash)
+                return query
+        if not self.directory:
+            return None
+        path = self._path(sha256_hash)
+        try:
+            with open(path, encoding="utf-8") as query_file:
+                query = query_file.read()
+            # Used queries are evicted last.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self._remember(sha256_hash, query)
+        return query
+
+    def set(self, sha256_hash, query):
+        """
+        Register `query` under `sha256_hash` in both tiers.
+
+        Callers register valid queries only; see `SentryGraphQLView.get_response`.
+        """
+        if not self.is_valid_hash(sha256_hash):
+            raise ValueError("Invalid persisted query hash.")
+        if not self.can_persist(query):
+            raise ValueError("The persisted query is too long.")
+        self._remember(sha256_hash, query)
+        if not self.directory or os.path.exists(self._path(sha256_hash)):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial query.
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as query_file:
+            query_file.write(query)
+        os.replace(temp_path, self._path(sha256_hash))
+        self._evict_files()
+
+
+persisted_queries = PersistedQueryStore(
+    directory=getattr(settings, "GRAPHQL_PERSISTED_QUERIES_DIR", None),
+    maxsize=getattr(settings, "GRAPHQL_PERSISTED_QUERIES_CACHE_SIZE", 1024),
+    maxfiles=getattr(settings, "GRAPHQL_PERSISTED_QUERIES_MAX_FILES", 10000),
+    max_length=getattr(settings, "GRAPHQL_PERSISTED_QUERY_MAX_LENGTH", 20000),
+)
@@ -0,0 +1,174 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene import Dynamic, relay
+from graphene.types.structures import Structure
+from graphene.utils.str_converters import to_camel_case
+from graphene_django import DjangoObjectType
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+def unwrap_type(field_type):
+    """
+    Strip NonNull/List wrappers from a graphene or GraphQL type.
+    """
+    while isinstance(field_type, Structure) or hasattr(field_type, "of_type"):
+        field_type = field_type.of_type
+    return getattr(field_type, "graphene_type", field_type)
+
+
+def get_selected_fields(info, selection_set):
+    """
+    Yield the field nodes of a selection set with fragments expanded.
+    """
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, FragmentSpreadNode):
+            yield from get_selected_fields(info, info.fragments[selection.name.value].selection_set)
+        elif isinstance(selection, InlineFragmentNode):
+            yield from get_selected_fields(info, selection.selection_set)
+
+
+def get_node_selection(info, graphene_type, selection_sets):
+    """
+    Return the object type and the selections the client asked for on it.
+
+    Connection types are unwrapped to the ``edges { node { ... } }`` selections
+    of their node type.
+    """
+    if isinstance(graphene_type, type) and issubclass(graphene_type, relay.Connection):
+        edges = [node.selection_set for selection_set in selection_sets
+                 for node in get_selected_fields(info, selection_set) if node.name.value == "edges"]
+        nodes = [node.selection_set for selection_set in edges
+                 for node in get_selected_fields(info, selection_set) if node.name.value == "node"]
+        return graphene_type._meta.node, nodes
+    return graphene_type, selection_sets
+
+
+def get_type_fields(graphene_type):
+    """
+    Map the GraphQL names of a type's fields to their graphene name and field.
+    """
+    fields = {}
+    for name, field in graphene_type._meta.fields.items():
+        if isinstance(field, Dynamic):
+            field = field.get_type()
+            if field is None:
+                continue
+        fields[getattr(field, "name", None) or to_camel_case(name)] = (name, field)
+    return fields
+
+
+def get_model_field(graphene_type, model, name):
+    """
+    Map a graphene field name to the model field it reads.
+
+    A type can point a field at a relation explicitly through an
+    ``optimizer_hints`` dict; otherwise the field name itself or, for the
+    ``*_details`` fields, the name without the suffix is used.
+    """
+    hints = getattr(graphene_type, "optimizer_hints", {})
+    candidates = [hints.get(name), name]
+    if name.endswith("_details"):
+        candidates.append(name[:-len("_details")])
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return model._meta.get_field(candidate)
+        except FieldDoesNotExist:
+            continue
+    return None
+
+
+class QueryPlan:
+    """
+    The joins, prefetches and columns needed to resolve one selection set.
+    """
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = set()
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def plan_selection(info, graphene_type, model, selection_sets, plan=None, prefix=""):
+    """
+    Walk the selections made on `graphene_type` and add what they need to `plan`.
+
+    Forward relations become ``select_related`` joins, reverse relations
+    become ``prefetch_related`` lookups planned recursively and selected scalar
+    columns are collected for ``only()``. Fields that are not backed by a model
+    field have a custom resolver that may read any column, so the whole row of
+    that model is loaded in that case.
+    """
+    plan = plan or QueryPlan()
+    fields = get_type_fields(graphene_type)
+    columns = {prefix + model._meta.pk.name}
+    complete = True
+
+    for node in (node for selection_set in selection_sets for node in get_selected_fields(info, selection_set)):
+        if node.name.value not in fields:
+            continue
+        name, field = fields[node.name.value]
+        model_field = get_model_field(graphene_type, model, name)
+        if model_field is None:
+            complete = False
+            continue
+        related_type = unwrap_type(field.type)
+        if model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+            lookup = prefix + model_field.name
+            columns.add(lookup)
+            if lookup not in plan.select_related:
+                plan.select_related.append(lookup)
+            if node.selection_set and _is_model_type(related_type):
+                plan_selection(info, related_type, model_field.related_model, [node.selection_set],
+                               plan, prefix=lookup + "__")
+        elif model_field.is_relation and _is_model_type(related_type):
+            related_model = model_field.related_model
+            inner = plan_selection(info, related_type, related_model, [node.selection_set])
+            if inner.only and model_field.one_to_many:
+                inner.only.add(model_field.field.name)
+            queryset = inner.apply(related_model._default_manager.all())
+            plan.prefetch_related.append(Prefetch(prefix + model_field.get_accessor_name(), queryset=queryset))
+        elif model_field.concrete:
+            columns.add(prefix + model_field.attname)
+
+    if not complete:
+        columns = {prefix + field.name for field in model._meta.concrete_fields}
+    plan.only.update(columns)
+    return plan
+
+
+def _is_model_type(graphene_type):
+    return isinstance(graphene_type, type) and issubclass(graphene_type, DjangoObjectType)
+
+
+def optimize_queryset(queryset, info):
+    """
+    Apply ``select_related``, ``prefetch_related`` and ``only`` to `queryset`
+    according to the fields selected in the current GraphQL query.
+
+    Args:
+        queryset (QuerySet): The queryset returned by a root resolver.
+        info: The GraphQL resolution information of that resolver.
+
+    Returns:
+        QuerySet: The optimized queryset.
+    """
+    graphene_type, selection_sets = get_node_selection(
+        info, unwrap_type(info.return_type), [node.selection_set for node in info.field_nodes]
+    )
+    if not _is_model_type(graphene_type) or graphene_type._meta.model is not queryset.model:
+        return queryset
+    return plan_selection(info, graphene_type, queryset.model, selection_sets).apply(queryset)